@@ -1,77 +1,295 @@
+import hashlib
+import logging
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .classifier import BackendMetrics, ClassifierPool, Prediction
+from .config import get_settings
+from .lexicon import DEFAULT_LEXICON_PATH, Lexicon
+from .lru import LRUCache
 from .models import IncidentType, IncidentSeverity
 
+logger = logging.getLogger("aegis.triage")
+
 
 class AIEngine:
-    def __init__(self):
-        # Keywords for Severity (Ordered by priority) includes Amharic terms
-        self.critical_keywords = ["explosion", "bomb", "mass casualty", "terror", "flood", "earthquake", "war", "gunfire", "shooter", "dead", "fatality", "bomb", "ሙቀት", "ጦር"]
-        self.high_keywords = ["fire", "accident", "crash", "robbery", "riot", "protest", "attack", "burning", "bleeding", "unconscious", "ፍንዳታ", "ድርቅ", "እሳት", "ግጭት"]
-        self.medium_keywords = ["fight", "injury", "blocked", "traffic", "theft", "break-in", "argument", "ትራፊክ", "መከላከያ"]
-        
-        # Keywords for Type
-        self.type_map = {
-            IncidentType.FIRE: ["fire", "smoke", "flame", "burn", "ash", "esat", "chid", "እሳት", "ጭስ", "ቃጠሎ"],
-            IncidentType.ACCIDENT: ["crash", "collision", "hit", "car", "vehicle", "truck", "bus", "motorcycle", "mekina", "adega", "አደጋ", "መኪና"],
-            IncidentType.CRIME: ["robbery", "theft", "gun", "knife", "attack", "stolen", "assault", "thief", "leba", "wunjel", "ስርቆት", "ግድያ"],
-            IncidentType.MEDICAL: ["injured", "blood", "heart", "breath", "unconscious", "sick", "pain", "ambulance", "hemem", "hospital", "ህመም", "አስቸኳይ", "ደም"],
-            IncidentType.UNREST: ["protest", "riot", "crowd", "march", "chanting", "demonstration", "fukera", "gored", "ሰልፍ", "ተቃውሞ"],
-            IncidentType.HAZARD: ["leak", "wire", "pole", "collapse", "hole", "landslide", "adega", "ስርየት", "መፍሰስ"],
-            IncidentType.FLOOD: ["flood", "water", "rain", "river", "drowning", "orf", "ጎርፍ", "ዝናብ", "ውሃ"],
-            IncidentType.INFRASTRUCTURE: ["power", "electric", "blackout", "water", "pipe", "road", "bridge", "mebrat", "እልባት", "መንገድ"],
-            IncidentType.CROWD: ["gathering", "festival", "concert", "meeting", "sewb", "ብዛት", "ሕዝብ"],
-            IncidentType.SUSPICIOUS: ["bomb", "package", "weird", "strange", "terror", "shibir", "እገርጋሪ", "ጥርጣሬ"],
-            IncidentType.PUBLIC_DISTURBANCE if hasattr(IncidentType, "PUBLIC_DISTURBANCE") else IncidentType.OTHER: ["noise", "disturbance", "loud", "ውይይት"],
-        }
+    def __init__(self, cache_size: Optional[int] = None, lexicon_path: Optional[str] = None):
+        # Memo of analyze() results keyed by lexicon digest + normalized text
+        self.cache = LRUCache(get_settings().triage_cache_size if cache_size is None else cache_size)
+        # Optional model-based type classifier; keyword matching is the fallback
+        self.classifier: Optional[ClassifierPool] = None
+        self.metrics = BackendMetrics()
+        # Keywords for severity (ordered by priority) and type, including
+        # Amharic terms, live in a versioned JSON file
+        self.lexicon_path = lexicon_path or get_settings().lexicon_path or DEFAULT_LEXICON_PATH
+        self._swap(Lexicon.from_file(self.lexicon_path))
 
-    def analyze(self, text: str) -> dict:
+    def _swap(self, lexicon: Lexicon) -> None:
+        # Editable copies; requests only ever read the immutable snapshot
+        self.critical_keywords = list(lexicon.critical_keywords)
+        self.high_keywords = list(lexicon.high_keywords)
+        self.medium_keywords = list(lexicon.medium_keywords)
+        self.type_map = {t: list(k) for t, k in lexicon.type_map.items()}
+        # Single reference assignment: in-flight requests keep the old snapshot
+        self._lexicon = lexicon
+        self.cache.clear()
+
+    @property
+    def lexicon(self) -> Lexicon:
+        return self._lexicon
+
+    @property
+    def lexicon_version(self) -> str:
+        return self._lexicon.version
+
+    def compile(self, version: Optional[str] = None) -> None:
         """
-        Analyzes the incident text to determine severity and type.
-        Returns a dictionary with severity/type plus confidence and risk cues.
+        Compile the (edited) keyword lists into a new snapshot and swap it in.
+        Memoized results are keyed by content digest, so results from the old
+        lexicon are never served.
         """
-        text = text.lower()
-        
-        result = {
-            "severity": IncidentSeverity.LOW,  # Default
-            "incident_type": IncidentType.OTHER,  # Default
-            "confidence": 0.3,
+        self._swap(Lexicon(self.critical_keywords, self.high_keywords, self.medium_keywords, self.type_map, version))
+
+    def reload(self) -> bool:
+        """
+        Load and compile the lexicon file off the request path, then swap it in.
+        Returns False if the content and version are unchanged.
+        """
+        lexicon = Lexicon.from_file(self.lexicon_path)
+        current = self._lexicon
+        if lexicon.digest == current.digest and lexicon.version == current.version:
+            return False
+        self._swap(lexicon)
+        return True
+
+    def use_classifier(self, classifier: Optional[ClassifierPool]) -> None:
+        self.classifier = classifier
+        self.cache.clear()
+
+    @property
+    def model_version(self) -> str:
+        return f"{self.classifier.name}:{self.classifier.version}" if self.classifier else ""
+
+    def _predict(self, texts: Sequence[str], batch: bool = False) -> Optional[List[Optional[Prediction]]]:
+        """
+        Ask the classifier pool for types within the latency budget. Returns
+        None when the keyword result should stand (budget exceeded, error);
+        unknown labels come back as None entries.
+        """
+        start = time.perf_counter()
+        try:
+            predictions = self.classifier.predict_batch(texts) if batch else self.classifier.predict(texts)
+        except Exception:
+            logger.exception("Classifier failed, falling back to keyword triage")
+            self.metrics.fallback(error=True)
+            return None
+        if predictions is None:
+            self.metrics.fallback()
+            return None
+        self.metrics.observe(self.classifier.name + (":batch" if batch else ""), (time.perf_counter() - start) * 1000)
+        return [
+            (label, prob) if label in IncidentType._value2member_map_ else None
+            for label, prob in predictions
+        ]
+
+    @staticmethod
+    def _classify(lexicon: Lexicon, text: str) -> Tuple[IncidentSeverity, Optional[IncidentType]]:
+        """
+        Severity and matched type (None if no type keyword) for one text.
+        """
+        # One pass over the text finds every severity and type keyword
+        hits = lexicon.matcher.find(text.lower())
+        severity = next((s for s in SEVERITY_PRIORITY if s in hits), IncidentSeverity.LOW)
+        # First matching entry in type_map order
+        type_ranks = [h for h in hits if isinstance(h, int)]
+        return severity, (lexicon.type_order[min(type_ranks)] if type_ranks else None)
+
+    @staticmethod
+    def risk_cues(incident_type: IncidentType, severity: IncidentSeverity) -> dict:
+        """
+        Simple risk heuristics for a classified report.
+        """
+        cues = {
             "escalation_probability": 0.1,
             "spread_risk": 0.1,
             "casualty_likelihood": 0.1,
             "crowd_size_estimate": 0
         }
-        
-        # 1. Determine Severity
-        if any(k in text for k in self.critical_keywords):
-            result["severity"] = IncidentSeverity.CRITICAL
-            result["confidence"] = 0.85
-        elif any(k in text for k in self.high_keywords):
-            result["severity"] = IncidentSeverity.HIGH
-            result["confidence"] = 0.7
-        elif any(k in text for k in self.medium_keywords):
-            result["severity"] = IncidentSeverity.MEDIUM
-            result["confidence"] = 0.5
-        
-        # 2. Determine Type
-        for type_, keywords in self.type_map.items():
-            if any(k in text for k in keywords):
-                result["incident_type"] = type_
-                result["confidence"] = max(result["confidence"], 0.6)
-                break
-
-        # 3. Simple risk heuristics
-        if result["incident_type"] in [IncidentType.FIRE, IncidentType.FLOOD, IncidentType.UNREST]:
-            result["escalation_probability"] = 0.6 if result["severity"] in [IncidentSeverity.MEDIUM, IncidentSeverity.HIGH] else 0.8
-            result["spread_risk"] = 0.7 if result["severity"] in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 0.4
-        if result["incident_type"] in [IncidentType.MEDICAL, IncidentType.CRIME, IncidentType.ACCIDENT]:
-            result["casualty_likelihood"] = 0.6 if result["severity"] in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 0.3
-        if result["incident_type"] in [IncidentType.CROWD, IncidentType.UNREST]:
-            result["crowd_size_estimate"] = 50 if result["severity"] in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 20
-        if result["severity"] == IncidentSeverity.CRITICAL:
-            result["escalation_probability"] = max(result["escalation_probability"], 0.85)
-            result["spread_risk"] = max(result["spread_risk"], 0.8)
-            result["casualty_likelihood"] = max(result["casualty_likelihood"], 0.7)
-
-        return result
+        if incident_type in [IncidentType.FIRE, IncidentType.FLOOD, IncidentType.UNREST]:
+            cues["escalation_probability"] = 0.6 if severity in [IncidentSeverity.MEDIUM, IncidentSeverity.HIGH] else 0.8
+            cues["spread_risk"] = 0.7 if severity in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 0.4
+        if incident_type in [IncidentType.MEDICAL, IncidentType.CRIME, IncidentType.ACCIDENT]:
+            cues["casualty_likelihood"] = 0.6 if severity in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 0.3
+        if incident_type in [IncidentType.CROWD, IncidentType.UNREST]:
+            cues["crowd_size_estimate"] = 50 if severity in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 20
+        if severity == IncidentSeverity.CRITICAL:
+            cues["escalation_probability"] = max(cues["escalation_probability"], 0.85)
+            cues["spread_risk"] = max(cues["spread_risk"], 0.8)
+            cues["casualty_likelihood"] = max(cues["casualty_likelihood"], 0.7)
+        return cues
+
+    def cache_key(self, text: str, lexicon: Optional[Lexicon] = None) -> Tuple[str, str, bytes]:
+        # Lowercasing and trimming never change which keywords match
+        normalized = text.lower().strip()
+        digest = (lexicon or self._lexicon).digest
+        return digest, self.model_version, hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+    def analyze(self, text: str) -> dict:
+        """
+        Analyzes the incident text to determine severity and type.
+        Returns a dictionary with severity/type plus confidence, risk cues and
+        the lexicon version used.
+        """
+        lexicon = self._lexicon
+        key = self.cache_key(text, lexicon)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        result, complete = self._analyze(lexicon, text)
+        # Keyword fallbacks are not memoized so the model gets another chance
+        if complete:
+            self.cache.put(key, result)
+        return dict(result)
+
+    def _analyze(self, lexicon: Lexicon, text: str) -> Tuple[dict, bool]:
+        start = time.perf_counter()
+        severity, matched_type = self._classify(lexicon, text)
+        self.metrics.observe("keyword", (time.perf_counter() - start) * 1000)
+        incident_type = matched_type or IncidentType.OTHER
+        confidence = SEVERITY_CONFIDENCE[severity]
+        if matched_type is not None:
+            confidence = max(confidence, 0.6)
+
+        complete = True
+        if self.classifier is not None:
+            predictions = self._predict([text])
+            complete = predictions is not None
+            if predictions and predictions[0]:
+                label, prob = predictions[0]
+                self.metrics.compare([label], [incident_type.value])
+                incident_type = IncidentType(label)
+                confidence = max(SEVERITY_CONFIDENCE[severity], prob)
+
+        result = {
+            "severity": severity,
+            "incident_type": incident_type,
+            "confidence": confidence,
+        }
+        result.update(self.risk_cues(incident_type, severity))
+        result["lexicon_version"] = lexicon.version
+        return result, complete
+
+    def analyze_batch(self, texts: Sequence[str]) -> "TriageBatch":
+        """
+        Triage many texts in one call. Identical texts (after lowercasing) are
+        matched once and sent to the classifier (if any) in one request;
+        confidence and risk cues are gathered from per (type, severity) tables
+        as array operations.
+        """
+        lexicon = self._lexicon
+        unique: Dict[str, int] = {}
+        inverse = np.empty(len(texts), dtype=np.intp)
+        for i, text in enumerate(texts):
+            inverse[i] = unique.setdefault(text.lower(), len(unique))
+        keys = list(unique)
+
+        start = time.perf_counter()
+        classified = [self._classify(lexicon, key) for key in keys]
+        if keys:
+            self.metrics.observe("keyword:batch", (time.perf_counter() - start) * 1000)
+        severity_code = np.array([SEVERITIES.index(s) for s, _ in classified], dtype=np.intp)
+        type_code = np.array([TYPES.index(t or IncidentType.OTHER) for _, t in classified], dtype=np.intp)
+        typed = np.array([t is not None for _, t in classified], dtype=bool)
+
+        severity_confidence = _SEVERITY_CONFIDENCE_TABLE[severity_code]
+        confidence = np.where(typed, np.maximum(severity_confidence, 0.6), severity_confidence)
+
+        if self.classifier is not None and keys:
+            predictions = self._predict(keys, batch=True)
+            answered = [i for i, p in enumerate(predictions or []) if p]
+            if answered:
+                labels = [predictions[i][0] for i in answered]
+                self.metrics.compare(labels, [TYPES[type_code[i]].value for i in answered])
+                type_code[answered] = [TYPES.index(IncidentType(label)) for label in labels]
+                confidence[answered] = np.maximum(
+                    severity_confidence[answered], [predictions[i][1] for i in answered]
+                )
+
+        cues = _RISK_CUE_TABLE[type_code, severity_code]
+        return TriageBatch(severity_code[inverse], type_code[inverse], confidence[inverse], cues[inverse], lexicon.version)
+
+
+SEVERITIES: List[IncidentSeverity] = list(IncidentSeverity)
+TYPES: List[IncidentType] = list(IncidentType)
+SEVERITY_PRIORITY = (IncidentSeverity.CRITICAL, IncidentSeverity.HIGH, IncidentSeverity.MEDIUM)
+SEVERITY_CONFIDENCE = {
+    IncidentSeverity.LOW: 0.3,
+    IncidentSeverity.MEDIUM: 0.5,
+    IncidentSeverity.HIGH: 0.7,
+    IncidentSeverity.CRITICAL: 0.85,
+}
+RISK_CUES = ("escalation_probability", "spread_risk", "casualty_likelihood", "crowd_size_estimate")
+
+_SEVERITY_CONFIDENCE_TABLE = np.array([SEVERITY_CONFIDENCE[s] for s in SEVERITIES])
+# [type, severity, cue] lookup built from the scalar heuristics
+_RISK_CUE_TABLE = np.array([
+    [[AIEngine.risk_cues(t, s)[cue] for cue in RISK_CUES] for s in SEVERITIES]
+    for t in TYPES
+], dtype=float)
+
+
+class TriageBatch:
+    """
+    Columnar results of AIEngine.analyze_batch; position i holds texts[i].
+    """
+
+    def __init__(self, severity_code: np.ndarray, type_code: np.ndarray, confidence: np.ndarray, cues: np.ndarray, lexicon_version: str = ""):
+        self.lexicon_version = lexicon_version
+        self.severity_code = severity_code
+        self.type_code = type_code
+        self.confidence = confidence
+        self.escalation_probability = cues[:, 0]
+        self.spread_risk = cues[:, 1]
+        self.casualty_likelihood = cues[:, 2]
+        self.crowd_size_estimate = cues[:, 3].astype(int)
+
+    def __len__(self) -> int:
+        return len(self.severity_code)
+
+    def relabel(self, severities: Sequence[IncidentSeverity], types: Sequence[IncidentType]) -> "TriageBatch":
+        """
+        The batch with the given severities/types (e.g. the stored ones) in
+        place of the triaged ones; risk cues are looked up for the new labels.
+        """
+        severity_code = np.array([SEVERITIES.index(s or IncidentSeverity.LOW) for s in severities], dtype=np.intp)
+        type_code = np.array([TYPES.index(t or IncidentType.OTHER) for t in types], dtype=np.intp)
+        cues = _RISK_CUE_TABLE[type_code, severity_code]
+        return TriageBatch(severity_code, type_code, self.confidence, cues, self.lexicon_version)
+
+    @property
+    def severity(self) -> np.ndarray:
+        return np.array(SEVERITIES, dtype=object)[self.severity_code]
+
+    @property
+    def incident_type(self) -> np.ndarray:
+        return np.array(TYPES, dtype=object)[self.type_code]
+
+    def rows(self) -> List[dict]:
+        """
+        Per-text dicts in the same shape as AIEngine.analyze.
+        """
+        columns = {
+            "severity": self.severity.tolist(),
+            "incident_type": self.incident_type.tolist(),
+            "confidence": self.confidence.tolist(),
+            "escalation_probability": self.escalation_probability.tolist(),
+            "spread_risk": self.spread_risk.tolist(),
+            "casualty_likelihood": self.casualty_likelihood.tolist(),
+            "crowd_size_estimate": self.crowd_size_estimate.tolist(),
+        }
+        return [dict(zip(columns, values), lexicon_version=self.lexicon_version) for values in zip(*columns.values())]
 
 
 # Singleton instance
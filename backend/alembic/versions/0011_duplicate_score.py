@@ -0,0 +1,17 @@
+"""Add duplicate similarity score to incidents"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0011_duplicate_score"
+down_revision = "0010_mission_threads_annotations"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("incidents", sa.Column("duplicate_score", sa.Float(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("incidents", "duplicate_score")
@@ -0,0 +1,46 @@
+"""Add intake tickets for asynchronous report processing"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0012_intake_tickets"
+down_revision = "0011_duplicate_score"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        ticket_status = postgresql.ENUM("queued", "processing", "done", "failed", name="ticketstatus")
+        ticket_status.create(bind, checkfirst=True)
+        ticket_status = postgresql.ENUM(name="ticketstatus", create_type=False)
+        incident_source = postgresql.ENUM(name="incidentsource", create_type=False)
+    else:
+        ticket_status = sa.Enum("queued", "processing", "done", "failed", name="ticketstatus")
+        incident_source = sa.Enum(
+            "citizen", "responder", "ops_center", "sensor", "weather", "other", name="incidentsource"
+        )
+
+    op.create_table(
+        "intake_tickets",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("status", ticket_status, nullable=False, server_default="queued"),
+        sa.Column("payload", sa.String(), nullable=False),
+        sa.Column("source", incident_source, nullable=True),
+        sa.Column("reporter_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("incident_id", sa.Integer(), sa.ForeignKey("incidents.id"), nullable=True),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_intake_tickets_status", "intake_tickets", ["status"])
+
+
+def downgrade():
+    op.drop_index("ix_intake_tickets_status", table_name="intake_tickets")
+    op.drop_table("intake_tickets")
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS ticketstatus")
@@ -0,0 +1,19 @@
+"""Record the triage lexicon version on incidents"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0014_incident_lexicon_version"
+down_revision = "0013_idempotency_keys"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("incidents", sa.Column("lexicon_version", sa.String(), nullable=True))
+    op.create_index("ix_incidents_lexicon_version", "incidents", ["lexicon_version"])
+
+
+def downgrade():
+    op.drop_index("ix_incidents_lexicon_version", table_name="incidents")
+    op.drop_column("incidents", "lexicon_version")
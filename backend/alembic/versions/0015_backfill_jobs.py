@@ -0,0 +1,48 @@
+"""Add backfill job cursors for resumable re-triage"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "0015_backfill_jobs"
+down_revision = "0014_incident_lexicon_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        job_status = postgresql.ENUM("running", "done", "failed", name="jobstatus")
+        job_status.create(bind, checkfirst=True)
+        job_status = postgresql.ENUM(name="jobstatus", create_type=False)
+    else:
+        job_status = sa.Enum("running", "done", "failed", name="jobstatus")
+
+    op.create_table(
+        "backfill_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("status", job_status, nullable=False, server_default="running"),
+        sa.Column("stale_only", sa.Integer(), server_default="0"),
+        sa.Column("last_id", sa.Integer(), server_default="0"),
+        sa.Column("max_id", sa.Integer(), nullable=True),
+        sa.Column("processed", sa.Integer(), server_default="0"),
+        sa.Column("error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_backfill_jobs_id", "backfill_jobs", ["id"])
+    op.create_index("ix_backfill_jobs_name", "backfill_jobs", ["name"])
+    op.create_index("ix_backfill_jobs_status", "backfill_jobs", ["status"])
+
+
+def downgrade():
+    op.drop_index("ix_backfill_jobs_status", table_name="backfill_jobs")
+    op.drop_index("ix_backfill_jobs_name", table_name="backfill_jobs")
+    op.drop_index("ix_backfill_jobs_id", table_name="backfill_jobs")
+    op.drop_table("backfill_jobs")
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP TYPE IF EXISTS jobstatus")
@@ -0,0 +1,23 @@
+"""Store resolved admin/police/fire districts on incidents"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0016_incident_districts"
+down_revision = "0015_backfill_jobs"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("admin_district", "police_district", "fire_district")
+
+
+def upgrade():
+    for column in COLUMNS:
+        op.add_column("incidents", sa.Column(column, sa.String(), nullable=True))
+        op.create_index(f"ix_incidents_{column}", "incidents", [column])
+
+
+def downgrade():
+    for column in reversed(COLUMNS):
+        op.drop_index(f"ix_incidents_{column}", table_name="incidents")
+        op.drop_column("incidents", column)
@@ -0,0 +1,33 @@
+"""Record which geofences (alert circles, annotations) new incidents land in"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0017_geofence_hits"
+down_revision = "0016_incident_districts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "geofence_hits",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("incident_id", sa.Integer(), sa.ForeignKey("incidents.id"), nullable=False),
+        sa.Column("fence_kind", sa.String(), nullable=False),
+        sa.Column("fence_id", sa.Integer(), nullable=False),
+        sa.Column("fence_type", sa.String(), nullable=True),
+        sa.Column("label", sa.String(), nullable=True),
+        sa.Column("distance_km", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_geofence_hits_id", "geofence_hits", ["id"])
+    op.create_index("ix_geofence_hits_incident_id", "geofence_hits", ["incident_id"])
+    op.create_index("ix_geofence_hits_fence_id", "geofence_hits", ["fence_id"])
+
+
+def downgrade():
+    op.drop_index("ix_geofence_hits_fence_id", table_name="geofence_hits")
+    op.drop_index("ix_geofence_hits_incident_id", table_name="geofence_hits")
+    op.drop_index("ix_geofence_hits_id", table_name="geofence_hits")
+    op.drop_table("geofence_hits")
@@ -0,0 +1,32 @@
+"""Compressed unit movement history, chunked by unit and hour"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0018_unit_track_chunks"
+down_revision = "0017_geofence_hits"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "unit_track_chunks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("unit_id", sa.Integer(), sa.ForeignKey("units.id"), nullable=False),
+        sa.Column("hour", sa.Integer(), nullable=False),
+        sa.Column("resolution_seconds", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("point_count", sa.Integer(), nullable=False),
+        sa.Column("start_ts", sa.Integer(), nullable=False),
+        sa.Column("end_ts", sa.Integer(), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_unit_track_chunks_id", "unit_track_chunks", ["id"])
+    op.create_index("ix_unit_track_chunks_unit_hour", "unit_track_chunks", ["unit_id", "hour"])
+
+
+def downgrade():
+    op.drop_index("ix_unit_track_chunks_unit_hour", table_name="unit_track_chunks")
+    op.drop_index("ix_unit_track_chunks_id", table_name="unit_track_chunks")
+    op.drop_table("unit_track_chunks")
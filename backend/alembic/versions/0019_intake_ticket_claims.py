@@ -0,0 +1,17 @@
+"""Processing lease on intake tickets"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0019_intake_ticket_claims"
+down_revision = "0018_unit_track_chunks"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("intake_tickets", sa.Column("claimed_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column("intake_tickets", "claimed_at")
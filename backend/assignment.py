@@ -0,0 +1,142 @@
+"""
+Batch dispatch planning: assign idle units to open incidents in one solve.
+
+Each incident i gets a priority weight w_i from its severity and
+spatial_risk_index. Leaving an incident unserved costs w_i * max_eta, and
+serving it with unit j costs w_i * eta_ij, so the plan minimises
+sum(w_i * (eta_ij - max_eta)) over served pairs: urgent incidents claim the
+units first, and a pair slower than max_eta (or a unit type the incident's
+agencies do not include) is never worth taking. Adding one zero-cost "unserved"
+column per incident turns this into a square-enough linear assignment that the
+Hungarian method below solves exactly.
+"""
+import time
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from . import geo, models
+from .routing import ROUTING_TABLE
+
+SEVERITY_WEIGHTS = {
+    models.IncidentSeverity.LOW: 1.0,
+    models.IncidentSeverity.MEDIUM: 2.0,
+    models.IncidentSeverity.HIGH: 4.0,
+    models.IncidentSeverity.CRITICAL: 8.0,
+}
+DEFAULT_MAX_ETA_MINUTES = 120.0
+
+
+def linear_sum_assignment(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Minimum-cost assignment of every row to a distinct column (rows <= columns),
+    by the shortest augmenting path Hungarian method with dual potentials.
+    O(n^2 m) overall; the inner scan over columns is vectorized.
+    Returns (row indices, column indices).
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    n, m = cost.shape
+    if n > m:
+        raise ValueError("cost matrix needs at least as many columns as rows")
+    # 1-based bookkeeping; column 0 is the virtual start of each augmenting path
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)  # row assigned to each column (0 = free)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        owner[0] = row
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+    cols = np.flatnonzero(owner[1:])
+    rows = owner[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def priority_weights(severities: Sequence[models.IncidentSeverity], risks: Sequence[float]) -> np.ndarray:
+    base = np.array([SEVERITY_WEIGHTS.get(s, 1.0) for s in severities], dtype=np.float64)
+    return base * (1.0 + np.array([r or 0.0 for r in risks], dtype=np.float64))
+
+
+def eta_matrix(inc_lats: np.ndarray, inc_lngs: np.ndarray, unit_lats: np.ndarray, unit_lngs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (distance km, ETA minutes) for every incident x unit pair.
+    """
+    distances = geo.haversine_km(inc_lats[:, None], inc_lngs[:, None], unit_lats[None, :], unit_lngs[None, :])
+    # Same estimate as the straight-line ETA: 30 km/h, +10% congestion beyond 10 km
+    etas = distances / 0.5 * np.where(distances > 10, 1.1, 1.0)
+    return distances, etas
+
+
+def plan_assignments(incidents: List[models.Incident], units: List[models.Unit],
+                     max_eta_minutes: float = DEFAULT_MAX_ETA_MINUTES) -> dict:
+    """
+    Proposed unit for each incident (nothing is written).
+    """
+    started = time.perf_counter()
+    assignments = []
+    served = set()
+    used_units = set()
+    if incidents and units:
+        inc_lats, inc_lngs = geo.to_arrays([i.latitude for i in incidents], [i.longitude for i in incidents])
+        unit_lats, unit_lngs = geo.to_arrays([u.latitude for u in units], [u.longitude for u in units])
+        distances, etas = eta_matrix(inc_lats, inc_lngs, unit_lats, unit_lngs)
+        weights = priority_weights([i.severity for i in incidents], [i.spatial_risk_index for i in incidents])
+
+        unit_types = np.array([u.unit_type.value if u.unit_type else "" for u in units])
+        allowed = np.zeros(etas.shape, dtype=bool)
+        for row, incident in enumerate(incidents):
+            agencies = [r.value for r in ROUTING_TABLE.get(incident.incident_type, [models.UserRole.POLICE])]
+            allowed[row] = np.isin(unit_types, agencies)
+        allowed &= np.isfinite(etas) & (etas <= max_eta_minutes)
+
+        savings = np.where(allowed, weights[:, None] * (etas - max_eta_minutes), 0.0)
+        # One zero-cost "unserved" column per incident
+        cost = np.hstack([savings, np.zeros((len(incidents), len(incidents)))])
+        rows, cols = linear_sum_assignment(cost)
+        for row, col in zip(rows, cols):
+            if col >= len(units) or not allowed[row, col]:
+                continue
+            incident, unit = incidents[row], units[col]
+            served.add(incident.id)
+            used_units.add(unit.id)
+            assignments.append({
+                "incident_id": incident.id,
+                "unit_id": unit.id,
+                "callsign": unit.callsign,
+                "unit_type": unit.unit_type,
+                "distance_km": float(distances[row, col]),
+                "eta_minutes": float(etas[row, col]),
+                "priority": float(weights[row]),
+            })
+    assignments.sort(key=lambda a: -a["priority"])
+    return {
+        "assignments": assignments,
+        "unassigned_incident_ids": [i.id for i in incidents if i.id not in served],
+        "idle_unit_ids": [u.id for u in units if u.id not in used_units],
+        "total_weighted_eta": round(sum(a["priority"] * a["eta_minutes"] for a in assignments), 4),
+        "solve_ms": round((time.perf_counter() - started) * 1000.0, 2),
+    }
@@ -0,0 +1,345 @@
+"""
+Pluggable incident-type classifiers for AIEngine.
+
+Models are CPU-only and trained locally (see `python -m backend.classifier
+train --help`). They are served from a warm process pool so inference never
+blocks the API threadpool for longer than the per-request latency budget
+(batches get the budget once per chunk per worker, on their own pool);
+AIEngine falls back to the keyword heuristic when the budget is exceeded.
+
+Only the standard library is imported at module level: pool workers are
+spawned fresh and import this module, not the rest of the backend.
+"""
+import abc
+import argparse
+import json
+import math
+import multiprocessing
+import re
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+Prediction = Tuple[str, float]  # (incident type value, probability)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    words = _TOKEN.findall((text or "").lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class TextClassifier(abc.ABC):
+    """
+    Interface for type classifiers. Labels are IncidentType values.
+    """
+
+    name = "base"
+    version = ""
+
+    @abc.abstractmethod
+    def predict(self, texts: Sequence[str]) -> List[Prediction]:
+        ...
+
+    @classmethod
+    def load(cls, path: str) -> "TextClassifier":
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        kind = data.get("kind")
+        if kind != NaiveBayesClassifier.name:
+            raise ValueError(f"Unknown classifier kind: {kind!r}")
+        return NaiveBayesClassifier.from_dict(data)
+
+
+class NaiveBayesClassifier(TextClassifier):
+    """
+    Multinomial naive Bayes over word unigrams and bigrams, Laplace smoothed.
+    """
+
+    name = "naive_bayes"
+
+    def __init__(self, labels: List[str], log_priors: List[float], log_likelihoods: Dict[str, List[float]], version: str = ""):
+        self.labels = labels
+        self.log_priors = log_priors
+        self.log_likelihoods = log_likelihoods
+        self.version = version
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str], alpha: float = 1.0, version: str = "") -> "NaiveBayesClassifier":
+        classes = sorted(set(labels))
+        doc_counts = Counter(labels)
+        token_counts: Dict[str, Counter] = {c: Counter() for c in classes}
+        for text, label in zip(texts, labels):
+            token_counts[label].update(tokenize(text))
+        vocab = set().union(*token_counts.values()) if token_counts else set()
+        totals = {c: sum(token_counts[c].values()) + alpha * len(vocab) for c in classes}
+        log_priors = [math.log(doc_counts[c] / len(labels)) for c in classes]
+        log_likelihoods = {
+            token: [math.log((token_counts[c][token] + alpha) / totals[c]) for c in classes]
+            for token in vocab
+        }
+        return cls(classes, log_priors, log_likelihoods, version or time.strftime("%Y%m%d%H%M%S"))
+
+    def predict(self, texts: Sequence[str]) -> List[Prediction]:
+        predictions = []
+        for text in texts:
+            scores = list(self.log_priors)
+            for token in tokenize(text):
+                # Tokens never seen in training carry no class evidence
+                row = self.log_likelihoods.get(token)
+                if row is not None:
+                    scores = [s + r for s, r in zip(scores, row)]
+            best = max(range(len(scores)), key=scores.__getitem__)
+            norm = sum(math.exp(s - scores[best]) for s in scores)
+            predictions.append((self.labels[best], 1.0 / norm))
+        return predictions
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.name,
+            "version": self.version,
+            "labels": self.labels,
+            "log_priors": self.log_priors,
+            "log_likelihoods": self.log_likelihoods,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NaiveBayesClassifier":
+        return cls(data["labels"], data["log_priors"], data["log_likelihoods"], data.get("version", ""))
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, ensure_ascii=False)
+
+
+# --- Process pool serving ---
+
+_worker_model: Optional[TextClassifier] = None
+
+
+def _init_worker(model_path: str) -> None:
+    global _worker_model
+    _worker_model = TextClassifier.load(model_path)
+
+
+def _worker_predict(texts: Sequence[str]) -> List[Prediction]:
+    return _worker_model.predict(texts)
+
+
+def _worker_ping() -> bool:
+    return _worker_model is not None
+
+
+BATCH_CHUNK_SIZE = 200  # texts per batch job; one worker clears this well within the default budget
+MAX_TEXT_CHARS = 2000  # longer reports are cut before inference so no single job runs away
+
+
+class ClassifierPool:
+    """
+    Warm ProcessPoolExecutors holding one loaded model per worker: one pool
+    for single-report triage and a separate one for batches (bulk intake,
+    retriage), so a large batch never queues ahead of live reports. A job
+    that outlives its budget keeps its worker until it finishes, so live
+    requests arriving while every worker is busy fall back at once instead
+    of queueing behind it.
+    """
+
+    def __init__(self, model_path: str, workers: int = 1, budget_ms: float = 50.0, batch_workers: int = 1):
+        self.model_path = model_path
+        self.workers = workers
+        self.batch_workers = batch_workers
+        self.budget_ms = budget_ms
+        with open(model_path, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        self.name = meta.get("kind", "")
+        self.version = meta.get("version", "")
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._batch_executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0  # live-pool jobs submitted and not finished (or cancelled)
+        self._lock = threading.Lock()
+
+    def _spawn(self, workers: int) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            # Spawn: forking a process that already runs server threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_path,),
+        )
+        # Start the pool and load the model before the first real request
+        for future in [executor.submit(_worker_ping) for _ in range(workers)]:
+            future.result()
+        return executor
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        self._executor = self._spawn(self.workers)
+        self._batch_executor = self._spawn(self.batch_workers)
+
+    def stop(self) -> None:
+        for executor in (self._executor, self._batch_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = self._batch_executor = None
+
+    def _job_done(self, future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _submit(self, fn, *args):
+        """
+        Submit a live-pool job, or None when every worker is still busy.
+        """
+        with self._lock:
+            if self._executor is None or self._in_flight >= self.workers:
+                return None
+            future = self._executor.submit(fn, *args)
+            self._in_flight += 1
+        future.add_done_callback(self._job_done)
+        return future
+
+    def predict(self, texts: Sequence[str]) -> Optional[List[Prediction]]:
+        """
+        Predictions for texts, or None if the budget was exceeded, every
+        worker is busy or the pool is unavailable.
+        """
+        future = self._submit(_worker_predict, [text[:MAX_TEXT_CHARS] for text in texts])
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=self.budget_ms / 1000.0)
+        except FutureTimeout:
+            future.cancel()
+            return None
+
+    def predict_batch(self, texts: Sequence[str]) -> Optional[List[Prediction]]:
+        """
+        Predictions for a batch on the batch pool, split into BATCH_CHUNK_SIZE
+        jobs. The budget grows with the number of jobs per worker; if it runs
+        out, jobs not yet started are cancelled so no abandoned work stays
+        queued, and None is returned.
+        """
+        if self._batch_executor is None:
+            return None
+        texts = [text[:MAX_TEXT_CHARS] for text in texts]
+        futures = [
+            self._batch_executor.submit(_worker_predict, texts[i:i + BATCH_CHUNK_SIZE])
+            for i in range(0, len(texts), BATCH_CHUNK_SIZE)
+        ]
+        rounds = math.ceil(len(futures) / self.batch_workers)
+        deadline = time.monotonic() + rounds * self.budget_ms / 1000.0
+        predictions: List[Prediction] = []
+        try:
+            for future in futures:
+                predictions.extend(future.result(timeout=max(deadline - time.monotonic(), 0.0)))
+        except FutureTimeout:
+            for future in futures:
+                future.cancel()
+            return None
+        return predictions
+
+
+class BackendMetrics:
+    """
+    Per-backend latency and model/keyword agreement for /triage/stats.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._latencies: Dict[str, deque] = {}
+        self._counts: Counter = Counter()
+        self.compared = 0
+        self.agreed = 0
+        self.fallbacks = 0
+        self.errors = 0
+        self._window = window
+        self._lock = threading.Lock()
+
+    def observe(self, backend: str, latency_ms: float) -> None:
+        with self._lock:
+            self._counts[backend] += 1
+            self._latencies.setdefault(backend, deque(maxlen=self._window)).append(latency_ms)
+
+    def compare(self, model_labels: Iterable[str], keyword_labels: Iterable[str]) -> None:
+        pairs = list(zip(model_labels, keyword_labels))
+        with self._lock:
+            self.compared += len(pairs)
+            self.agreed += sum(1 for a, b in pairs if a == b)
+
+    def fallback(self, error: bool = False) -> None:
+        with self._lock:
+            self.fallbacks += 1
+            if error:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            backends = {}
+            for backend, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                backends[backend] = {
+                    "count": self._counts[backend],
+                    "mean_ms": round(sum(ordered) / len(ordered), 3),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                }
+            return {
+                "backends": backends,
+                "agreement": round(self.agreed / self.compared, 4) if self.compared else None,
+                "compared": self.compared,
+                "fallbacks": self.fallbacks,
+                "errors": self.errors,
+            }
+
+
+# --- Training CLI ---
+
+def _load_jsonl(path: str) -> Tuple[List[str], List[str]]:
+    texts, labels = [], []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                row = json.loads(line)
+                texts.append(row["text"])
+                labels.append(row["incident_type"])
+    return texts, labels
+
+
+def _load_db() -> Tuple[List[str], List[str]]:
+    # Verified/resolved incidents carry a human-confirmed type
+    from . import database, models
+
+    db = database.SessionLocal()
+    try:
+        rows = db.query(models.Incident.title, models.Incident.description, models.Incident.incident_type).filter(
+            models.Incident.status.in_([models.IncidentStatus.VERIFIED, models.IncidentStatus.DISPATCHED, models.IncidentStatus.RESOLVED])
+        ).all()
+    finally:
+        db.close()
+    return [f"{t} {d}" for t, d, _ in rows], [k.value for _, _, k in rows]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="train a naive Bayes type classifier")
+    source = train.add_mutually_exclusive_group(required=True)
+    source.add_argument("--data", help='JSONL with {"text": ..., "incident_type": ...} per line')
+    source.add_argument("--from-db", action="store_true", help="train on verified/dispatched/resolved incidents")
+    train.add_argument("--out", required=True, help="model JSON path (CLASSIFIER_MODEL_PATH)")
+    train.add_argument("--alpha", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    texts, labels = _load_jsonl(args.data) if args.data else _load_db()
+    if not texts:
+        raise SystemExit("No training examples found")
+    model = NaiveBayesClassifier.train(texts, labels, alpha=args.alpha)
+    model.save(args.out)
+    accuracy = sum(p == y for (p, _), y in zip(model.predict(texts), labels)) / len(labels)
+    print(f"Trained {model.name} {model.version} on {len(texts)} examples, {len(model.labels)} classes, train accuracy {accuracy:.3f}")
+
+
+if __name__ == "__main__":
+    main()
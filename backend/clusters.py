@@ -0,0 +1,147 @@
+"""
+Multi-level grid cluster index for zoom-aware map queries.
+
+Each zoom level 0..CLUSTER_MAX_ZOOM buckets incidents into Web Mercator cells of
+TILE_SIZE / CELLS_PER_TILE pixels and keeps a running aggregate per cell
+(count, coordinate and id sums, severity and type counts). Cells at zoom z+1 nest
+inside cells at zoom z, so the levels form a hierarchy. Inserts touch one
+cell per level; a bbox query at zoom z reads only that level's cells.
+"""
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .tiles import lnglat_to_world, world_to_cell
+
+CLUSTER_MAX_ZOOM = 14  # coarser zooms are served from the index, finer ones as points
+CELLS_PER_TILE = 4  # 64 px cells on 256 px tiles
+
+Cell = Tuple[int, int]
+
+
+class _Aggregate:
+    __slots__ = ("count", "lat_sum", "lng_sum", "id_sum", "severity", "types")
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lng_sum = 0.0
+        self.id_sum = 0  # the remaining incident's id whenever count == 1
+        self.severity: Counter = Counter()
+        self.types: Counter = Counter()
+
+
+class ClusterIndex:
+    """
+    Thread-safe; `sync()` catches up on rows inserted by other processes since
+    the last seen id.
+    """
+
+    def __init__(self, max_zoom: int = CLUSTER_MAX_ZOOM, cells_per_tile: int = CELLS_PER_TILE):
+        self.max_zoom = max_zoom
+        self.cells_per_tile = cells_per_tile
+        self._levels: List[Dict[Cell, _Aggregate]] = [{} for _ in range(max_zoom + 1)]
+        self._points: Dict[int, Tuple[float, float, str, str]] = {}
+        self._max_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _divisions(self, zoom: int) -> int:
+        return (2 ** zoom) * self.cells_per_tile
+
+    def _apply(self, incident_id: int, point: Tuple[float, float, str, str], sign: int) -> None:
+        latitude, longitude, severity, incident_type = point
+        x, y = lnglat_to_world(longitude, latitude)
+        for zoom, level in enumerate(self._levels):
+            key = world_to_cell(x, y, self._divisions(zoom))
+            agg = level.get(key)
+            if agg is None:
+                agg = level[key] = _Aggregate()
+            agg.count += sign
+            agg.lat_sum += sign * latitude
+            agg.lng_sum += sign * longitude
+            agg.id_sum += sign * incident_id
+            agg.severity[severity] += sign
+            agg.types[incident_type] += sign
+            if agg.count <= 0:
+                del level[key]
+
+    def add(self, incident_id: Optional[int], latitude: Optional[float], longitude: Optional[float], severity, incident_type) -> None:
+        """
+        Insert or replace an incident (upsert by id).
+        """
+        if incident_id is None:
+            return
+        with self._lock:
+            previous = self._points.pop(incident_id, None)
+            if previous is not None:
+                self._apply(incident_id, previous, -1)
+            self._max_id = max(self._max_id, incident_id)
+            if latitude is None or longitude is None:
+                return
+            point = (latitude, longitude, getattr(severity, "value", severity), getattr(incident_type, "value", incident_type))
+            self._points[incident_id] = point
+            self._apply(incident_id, point, 1)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._levels = [{} for _ in range(self.max_zoom + 1)]
+            self._points.clear()
+            self._max_id = 0
+
+    def rebuild(self, db: Session) -> None:
+        self.clear()
+        self.sync(db)
+
+    def sync(self, db: Session) -> None:
+        rows = db.query(
+            models.Incident.id,
+            models.Incident.latitude,
+            models.Incident.longitude,
+            models.Incident.severity,
+            models.Incident.incident_type,
+        ).filter(models.Incident.id > self._max_id).all()
+        for row in rows:
+            self.add(*row)
+
+    def clusters(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float, zoom: int) -> List[dict]:
+        """
+        Clusters at `zoom` whose cell intersects the bbox, largest first.
+        Single-incident cells carry their `incident_id`.
+        """
+        zoom = max(0, min(zoom, self.max_zoom))
+        divisions = self._divisions(zoom)
+        x0, y0 = world_to_cell(*lnglat_to_world(min_lng, max_lat), divisions)
+        x1, y1 = world_to_cell(*lnglat_to_world(max_lng, min_lat), divisions)
+        result = []
+        with self._lock:
+            level = self._levels[zoom]
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > len(level):
+                cells = [(key, agg) for key, agg in level.items() if x0 <= key[0] <= x1 and y0 <= key[1] <= y1]
+            else:
+                cells = [
+                    (key, level[key])
+                    for key in ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+                    if key in level
+                ]
+            for (x, y), agg in cells:
+                result.append({
+                    "cluster_id": f"{zoom}/{x}/{y}",
+                    "count": agg.count,
+                    "latitude": agg.lat_sum / agg.count,
+                    "longitude": agg.lng_sum / agg.count,
+                    "severity_mix": {k: v for k, v in agg.severity.items() if v > 0},
+                    "type_mix": {k: v for k, v in agg.types.items() if v > 0},
+                    "incident_id": agg.id_sum if agg.count == 1 else None,
+                })
+        result.sort(key=lambda c: -c["count"])
+        return result
+
+
+# Singleton instance
+incident_clusters = ClusterIndex()
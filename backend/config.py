@@ -14,6 +14,30 @@ class Settings(BaseSettings):
     jwt_algorithm: str = os.getenv("ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
+    intake_workers: int = int(os.getenv("INTAKE_WORKERS", 2))
+    intake_lease_seconds: float = float(os.getenv("INTAKE_LEASE_SECONDS", 300))
+    idempotency_ttl_hours: int = int(os.getenv("IDEMPOTENCY_TTL_HOURS", 24))
+    triage_cache_size: int = int(os.getenv("TRIAGE_CACHE_SIZE", 4096))
+    lexicon_path: str = os.getenv("LEXICON_PATH", "")
+    lexicon_reload_seconds: float = float(os.getenv("LEXICON_RELOAD_SECONDS", 30))
+    classifier_model_path: str = os.getenv("CLASSIFIER_MODEL_PATH", "")
+    classifier_workers: int = int(os.getenv("CLASSIFIER_WORKERS", 1))
+    classifier_budget_ms: float = float(os.getenv("CLASSIFIER_BUDGET_MS", 50))
+    classifier_batch_workers: int = int(os.getenv("CLASSIFIER_BATCH_WORKERS", 1))
+    tile_cache_size: int = int(os.getenv("TILE_CACHE_SIZE", 2048))
+    tile_cache_ttl_seconds: float = float(os.getenv("TILE_CACHE_TTL_SECONDS", 60))
+    geofence_alert_ttl_hours: float = float(os.getenv("GEOFENCE_ALERT_TTL_HOURS", 24))
+    road_graph_path: str = os.getenv("ROAD_GRAPH_PATH", "")
+    eta_cache_size: int = int(os.getenv("ETA_CACHE_SIZE", 50000))
+    eta_cache_cell_deg: float = float(os.getenv("ETA_CACHE_CELL_DEG", 0.005))
+    telemetry_flush_seconds: float = float(os.getenv("TELEMETRY_FLUSH_SECONDS", 5))
+    track_segment_seconds: float = float(os.getenv("TRACK_SEGMENT_SECONDS", 300))
+    track_raw_retention_hours: float = float(os.getenv("TRACK_RAW_RETENTION_HOURS", 24))
+    track_downsample_seconds: int = int(os.getenv("TRACK_DOWNSAMPLE_SECONDS", 60))
+    coverage_bbox: str = os.getenv("COVERAGE_BBOX", "")  # min_lat,min_lng,max_lat,max_lng; empty = road network extent
+    coverage_cell_deg: float = float(os.getenv("COVERAGE_CELL_DEG", 0.005))
+    coverage_max_minutes: float = float(os.getenv("COVERAGE_MAX_MINUTES", 30))
+    coverage_refresh_seconds: float = float(os.getenv("COVERAGE_REFRESH_SECONDS", 5))
 
     class Config:
         case_sensitive = False
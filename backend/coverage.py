@@ -0,0 +1,429 @@
+"""
+Coverage raster: minutes from the nearest idle unit of each type to every cell
+of a lat/lng grid.
+
+Per unit type, a multi-source Dijkstra from the snapped nodes of all idle
+units labels every road node (within COVERAGE_MAX_MINUTES) with its travel
+time and the unit that reaches it first. Cells take the time of their snapped
+node plus the off-road access leg, or the straight-line estimate when either
+end is off the network, as road ETAs do.
+
+Unit changes are queued by `notify()` and applied by `refresh()` (a background
+worker every COVERAGE_REFRESH_SECONDS, or the next coverage request):
+- A unit that becomes idle grows its own search, pruned wherever it does not
+  beat the current times.
+- A unit that leaves or moves invalidates only the nodes it owned. Those are
+  re-seeded from their still-valid neighbours and the other units inside the
+  region, so the work is proportional to that unit's catchment rather than
+  the whole graph.
+"""
+import heapq
+import logging
+import threading
+from array import array
+from math import inf, sqrt
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from . import geo, models
+from .config import get_settings
+from .lru import LRUCache
+from .road_graph import OFFROAD_SPEED_KMH, RoadGraph, road_router
+
+logger = logging.getLogger("aegis.coverage")
+settings = get_settings()
+
+MAX_COVERAGE_CELLS = 250_000
+GEOJSON_CACHE_SIZE = 64
+FULL_RECOMPUTE_FRACTION = 0.25  # removals beyond this share of a type's units recompute from scratch
+
+UnitSnapshot = Tuple[Optional[models.UserRole], Optional[models.UnitStatus], Optional[float], Optional[float]]
+BBox = Tuple[float, float, float, float]  # (min lat, min lng, max lat, max lng)
+
+
+def parse_bbox(value: str) -> Optional[BBox]:
+    if not value:
+        return None
+    parts = [float(v) for v in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("COVERAGE_BBOX needs min_lat,min_lng,max_lat,max_lng")
+    return parts[0], parts[1], parts[2], parts[3]
+
+
+def _access_minutes(distance_km: float) -> float:
+    return distance_km / OFFROAD_SPEED_KMH * 60.0
+
+
+class _Grid:
+    """
+    Cell centres of the raster and each cell's road node (-1 when off the
+    network) with its access minutes from the centre.
+    """
+
+    def __init__(self, graph: RoadGraph, bbox: Optional[BBox], cell_size_deg: float):
+        if bbox is None:
+            # Extent of the road network, padded by one cell
+            lats, lngs = np.frombuffer(graph.lats, dtype=np.float64), np.frombuffer(graph.lngs, dtype=np.float64)
+            if not len(lats):
+                lats = lngs = np.zeros(1)
+            bbox = (lats.min() - cell_size_deg, lngs.min() - cell_size_deg, lats.max() + cell_size_deg, lngs.max() + cell_size_deg)
+        min_lat, min_lng, max_lat, max_lng = bbox
+        area = max(max_lat - min_lat, cell_size_deg) * max(max_lng - min_lng, cell_size_deg)
+        if area / cell_size_deg ** 2 > MAX_COVERAGE_CELLS:
+            cell_size_deg = sqrt(area / MAX_COVERAGE_CELLS)
+            logger.warning("Coverage grid coarsened to %.4f deg cells", cell_size_deg)
+        self.cell_size = cell_size_deg
+        self.rows = max(1, int(np.ceil((max_lat - min_lat) / cell_size_deg)))
+        self.cols = max(1, int(np.ceil((max_lng - min_lng) / cell_size_deg)))
+        self.min_lat, self.min_lng = min_lat, min_lng
+        row, col = np.divmod(np.arange(self.rows * self.cols), self.cols)
+        self.lats = min_lat + (row + 0.5) * cell_size_deg
+        self.lngs = min_lng + (col + 0.5) * cell_size_deg
+        self.nodes = np.full(len(self.lats), -1, dtype=np.int64)
+        self.access = np.zeros(len(self.lats))
+        # Cells holding road nodes take the one nearest their centre (vectorized)...
+        node_lats = np.frombuffer(graph.lats, dtype=np.float64)
+        node_lngs = np.frombuffer(graph.lngs, dtype=np.float64)
+        node_rows = np.floor((node_lats - min_lat) / cell_size_deg).astype(np.int64)
+        node_cols = np.floor((node_lngs - min_lng) / cell_size_deg).astype(np.int64)
+        inside = np.flatnonzero((node_rows >= 0) & (node_rows < self.rows) & (node_cols >= 0) & (node_cols < self.cols))
+        if len(inside):
+            cells = node_rows[inside] * self.cols + node_cols[inside]
+            km = geo.haversine_km(self.lats[cells], self.lngs[cells], node_lats[inside], node_lngs[inside])
+            order = np.lexsort((km, cells))
+            cells, first = np.unique(cells[order], return_index=True)
+            self.nodes[cells] = inside[order[first]]
+            self.access[cells] = _access_minutes(km[order[first]])
+        # ...the rest snap within SNAP_MAX_KM like any other point
+        for cell in np.flatnonzero(self.nodes < 0).tolist():
+            snapped = graph.snap(float(self.lats[cell]), float(self.lngs[cell]))
+            if snapped is not None:
+                self.nodes[cell] = snapped[0]
+                self.access[cell] = _access_minutes(snapped[1])
+        self.on_network = self.nodes >= 0
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+
+class _TypeCoverage:
+    def __init__(self, node_count: int):
+        self.dist = array("d", [inf]) * node_count
+        self.owner = array("q", [-1]) * node_count
+        self.sources: Dict[int, Tuple[int, float]] = {}  # unit id -> (node, access minutes)
+        self.positions: Dict[int, Tuple[float, float]] = {}  # every idle unit, on or off the network
+        self.version = 0
+
+    def _seed(self, heap: list, unit_id: int, node: int, access: float, max_minutes: float) -> None:
+        if access <= max_minutes and access < self.dist[node]:
+            self.dist[node] = access
+            self.owner[node] = unit_id
+            heap.append((access, node, unit_id))
+
+    def _grow(self, graph: RoadGraph, heap: list, max_minutes: float) -> None:
+        # Forward search: units drive out along their out-edges
+        dist, owner = self.dist, self.owner
+        indptr, indices, weights = graph.indptr, graph.indices, graph.minutes
+        heappush, heappop = heapq.heappush, heapq.heappop
+        heapq.heapify(heap)
+        while heap:
+            cost, node, unit_id = heappop(heap)
+            if cost > dist[node]:
+                continue
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                candidate = cost + weights[edge]
+                if candidate <= max_minutes and candidate < dist[neighbour]:
+                    dist[neighbour] = candidate
+                    owner[neighbour] = unit_id
+                    heappush(heap, (candidate, neighbour, unit_id))
+
+    def recompute(self, graph: RoadGraph, max_minutes: float) -> None:
+        self.dist = array("d", [inf]) * graph.node_count
+        self.owner = array("q", [-1]) * graph.node_count
+        heap: list = []
+        for unit_id, (node, access) in self.sources.items():
+            self._seed(heap, unit_id, node, access, max_minutes)
+        self._grow(graph, heap, max_minutes)
+
+    def insert(self, graph: RoadGraph, additions: Dict[int, Tuple[int, float]], max_minutes: float) -> None:
+        heap: list = []
+        for unit_id, (node, access) in additions.items():
+            self.sources[unit_id] = (node, access)
+            self._seed(heap, unit_id, node, access, max_minutes)
+        self._grow(graph, heap, max_minutes)
+
+    def remove(self, graph: RoadGraph, unit_id: int, max_minutes: float) -> None:
+        if self.sources.pop(unit_id, None) is None:
+            return
+        region = np.flatnonzero(np.frombuffer(self.owner, dtype=np.int64) == unit_id).tolist()
+        if not region:
+            return
+        dist, owner = self.dist, self.owner
+        for node in region:
+            dist[node] = inf
+            owner[node] = -1
+        members = set(region)
+        heap: list = []
+        # Re-seed the invalidated region from its valid in-neighbours...
+        rev_indptr, rev_indices, rev_weights = graph.rev_indptr, graph.rev_indices, graph.rev_minutes
+        for node in region:
+            for edge in range(rev_indptr[node], rev_indptr[node + 1]):
+                neighbour = rev_indices[edge]
+                if neighbour in members or owner[neighbour] < 0:
+                    continue
+                candidate = dist[neighbour] + rev_weights[edge]
+                if candidate <= max_minutes and candidate < dist[node]:
+                    dist[node] = candidate
+                    owner[node] = owner[neighbour]
+                    heap.append((candidate, node, owner[neighbour]))
+        # ...and from other units standing inside it
+        for other, (node, access) in self.sources.items():
+            if node in members:
+                self._seed(heap, other, node, access, max_minutes)
+        self._grow(graph, heap, max_minutes)
+
+
+class CoverageIndex:
+    """
+    Thread-safe. `notify()` is cheap and only queues unit states; `refresh()`
+    applies them and `raster()` reads the current minutes per cell.
+    """
+
+    def __init__(self, bbox: Optional[BBox] = None, cell_size_deg: float = 0.005, max_minutes: float = 30.0):
+        self.bbox = bbox
+        self.cell_size = cell_size_deg
+        self.max_minutes = max_minutes
+        self._graph: Optional[RoadGraph] = None
+        self._grid: Optional[_Grid] = None
+        self._types: Dict[models.UserRole, _TypeCoverage] = {}
+        self._unit_types: Dict[int, models.UserRole] = {}
+        self._rasters: Dict[models.UserRole, Tuple[int, np.ndarray]] = {}
+        self._geojson = LRUCache(GEOJSON_CACHE_SIZE)
+        self._generation = 0  # bumped by clear() so version tags never repeat
+        self._queued: Dict[int, UnitSnapshot] = {}
+        self._queue_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def notify(self, units: Iterable) -> None:
+        """
+        Queue the latest state of changed units (anything with id, unit_type,
+        status, latitude, longitude).
+        """
+        with self._queue_lock:
+            for unit in units:
+                self._queued[unit.id] = (unit.unit_type, unit.status, unit.latitude, unit.longitude)
+
+    def clear(self) -> None:
+        with self._queue_lock:
+            self._queued.clear()
+        with self._lock:
+            self._types.clear()
+            self._unit_types.clear()
+            self._rasters.clear()
+            self._generation += 1
+        self._geojson.clear()
+
+    def _type(self, unit_type: models.UserRole) -> _TypeCoverage:
+        coverage = self._types.get(unit_type)
+        if coverage is None:
+            coverage = self._types[unit_type] = _TypeCoverage(self._graph.node_count)
+        return coverage
+
+    def _snap(self, latitude: float, longitude: float) -> Optional[Tuple[int, float]]:
+        snapped = self._graph.snap(latitude, longitude)
+        if snapped is None:
+            return None
+        return snapped[0], _access_minutes(snapped[1])
+
+    def _load_graph_locked(self, graph: RoadGraph) -> None:
+        self._graph = graph
+        self._grid = _Grid(graph, self.bbox, self.cell_size)
+        self._rasters.clear()
+        for coverage in self._types.values():
+            coverage.sources = {
+                unit_id: snapped for unit_id, snapped in
+                ((unit_id, self._snap(*position)) for unit_id, position in coverage.positions.items())
+                if snapped is not None
+            }
+            coverage.recompute(graph, self.max_minutes)
+            coverage.version += 1
+
+    def refresh(self) -> int:
+        """
+        Apply queued unit changes; returns the removals plus additions applied.
+        """
+        with self._queue_lock:
+            queued, self._queued = self._queued, {}
+        with self._lock:
+            if road_router.graph is not self._graph:
+                self._load_graph_locked(road_router.graph)
+            removals: Dict[models.UserRole, List[int]] = {}
+            additions: Dict[models.UserRole, Dict[int, Tuple[float, float]]] = {}
+            for unit_id, (unit_type, status, latitude, longitude) in queued.items():
+                current = self._unit_types.get(unit_id)
+                idle = status == models.UnitStatus.IDLE and unit_type is not None and latitude is not None and longitude is not None
+                if current is not None:
+                    same_place = idle and unit_type == current and self._same_place(current, unit_id, latitude, longitude)
+                    if same_place:
+                        continue
+                    removals.setdefault(current, []).append(unit_id)
+                    del self._unit_types[unit_id]
+                if idle:
+                    additions.setdefault(unit_type, {})[unit_id] = (latitude, longitude)
+                    self._unit_types[unit_id] = unit_type
+            for unit_type in set(removals) | set(additions):
+                self._apply(unit_type, removals.get(unit_type, []), additions.get(unit_type, {}))
+            return sum(len(ids) for ids in removals.values()) + sum(len(units) for units in additions.values())
+
+    def _same_place(self, unit_type: models.UserRole, unit_id: int, latitude: float, longitude: float) -> bool:
+        coverage = self._types[unit_type]
+        snapped = self._snap(latitude, longitude)
+        if unit_id not in coverage.sources or snapped is None:
+            return False
+        # Small moves around the same road node leave the search untouched
+        node, access = coverage.sources[unit_id]
+        if snapped[0] != node or abs(snapped[1] - access) > 0.05:
+            return False
+        coverage.positions[unit_id] = (latitude, longitude)
+        return True
+
+    def _apply(self, unit_type: models.UserRole, removed: List[int], added: Dict[int, Tuple[float, float]]) -> None:
+        graph, coverage = self._graph, self._type(unit_type)
+        for unit_id in removed:
+            coverage.positions.pop(unit_id, None)
+        coverage.positions.update(added)
+        snapped = {unit_id: self._snap(*position) for unit_id, position in added.items()}
+        snapped = {unit_id: value for unit_id, value in snapped.items() if value is not None}
+        if len(removed) > FULL_RECOMPUTE_FRACTION * max(len(coverage.sources), 1):
+            for unit_id in removed:
+                coverage.sources.pop(unit_id, None)
+            coverage.sources.update(snapped)
+            coverage.recompute(graph, self.max_minutes)
+        else:
+            for unit_id in removed:
+                coverage.remove(graph, unit_id, self.max_minutes)
+            coverage.insert(graph, snapped, self.max_minutes)
+        coverage.version += 1
+
+    def _raster_locked(self, unit_type: models.UserRole) -> np.ndarray:
+        coverage = self._types.get(unit_type)
+        grid = self._grid
+        if coverage is None or not coverage.positions:
+            return np.full(len(grid), inf)
+        cached = self._rasters.get(unit_type)
+        if cached is not None and cached[0] == coverage.version:
+            return cached[1]
+        dist = np.frombuffer(coverage.dist, dtype=np.float64)
+        minutes = np.full(len(grid), inf)
+        minutes[grid.on_network] = dist[grid.nodes[grid.on_network]] + grid.access[grid.on_network]
+        # Straight-line estimate where either end is off the network
+        offroad = [p for unit_id, p in coverage.positions.items() if unit_id not in coverage.sources]
+        for cells, units in ((~grid.on_network, list(coverage.positions.values())), (grid.on_network, offroad)):
+            if not units or not cells.any():
+                continue
+            unit_lats, unit_lngs = geo.to_arrays([p[0] for p in units], [p[1] for p in units])
+            nearest = np.full(int(cells.sum()), inf)
+            for start in range(0, len(units), 256):
+                km = geo.haversine_km(grid.lats[cells][:, None], grid.lngs[cells][:, None],
+                                      unit_lats[None, start:start + 256], unit_lngs[None, start:start + 256])
+                nearest = np.minimum(nearest, km.min(axis=1))
+            minutes[cells] = np.minimum(minutes[cells], nearest / 0.5 * np.where(nearest > 10, 1.1, 1.0))
+        minutes[minutes > self.max_minutes] = inf
+        self._rasters[unit_type] = (coverage.version, minutes)
+        return minutes
+
+    def raster(self, unit_type: Optional[models.UserRole] = None) -> Tuple[_Grid, np.ndarray, str]:
+        """
+        (grid, minutes per cell with inf beyond max_minutes, version tag).
+        Without a unit type, the nearest idle unit of any type.
+        """
+        self.refresh()
+        with self._lock:
+            unit_types = [unit_type] if unit_type is not None else sorted(self._types, key=lambda t: t.value)
+            minutes = np.full(len(self._grid), inf)
+            for t in unit_types:
+                minutes = np.minimum(minutes, self._raster_locked(t))
+            tag = "-".join(f"{t.value}.{self._types[t].version}" if t in self._types else f"{t.value}.0" for t in unit_types)
+            return self._grid, minutes, f"{self._generation}-{id(self._graph):x}-{tag}"
+
+    def to_geojson(self, unit_type: Optional[models.UserRole], threshold_minutes: float, uncovered_only: bool = False) -> Tuple[dict, str]:
+        """
+        (FeatureCollection of cells, version tag); unchanged rasters are served
+        from the rendered-response cache.
+        """
+        grid, minutes, tag = self.raster(unit_type)
+        tag = f"{tag}-{threshold_minutes:g}-{int(uncovered_only)}"
+        cached = self._geojson.get(tag)
+        if cached is not None:
+            return cached, tag
+        covered = minutes <= threshold_minutes
+        half = grid.cell_size / 2.0
+        features = []
+        for cell in np.flatnonzero(~covered if uncovered_only else np.ones(len(grid), dtype=bool)).tolist():
+            lat, lng = float(grid.lats[cell]), float(grid.lngs[cell])
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [[
+                    [lng - half, lat - half], [lng + half, lat - half], [lng + half, lat + half],
+                    [lng - half, lat + half], [lng - half, lat - half],
+                ]]},
+                "properties": {
+                    "eta_minutes": round(float(minutes[cell]), 2) if np.isfinite(minutes[cell]) else None,
+                    "covered": bool(covered[cell]),
+                },
+            })
+        summary = {
+            "unit_type": unit_type,
+            "threshold_minutes": threshold_minutes,
+            "max_minutes": self.max_minutes,
+            "cell_size_deg": grid.cell_size,
+            "cells": len(grid),
+            "covered_cells": int(covered.sum()),
+            "covered_fraction": round(float(covered.mean()), 4),
+        }
+        collection = {"type": "FeatureCollection", "features": features, "summary": summary}
+        self._geojson.put(tag, collection)
+        return collection, tag
+
+
+class CoverageWorker:
+    """
+    Background thread applying queued unit changes every interval, so coverage
+    requests rarely have work left to do.
+    """
+
+    def __init__(self, index: CoverageIndex, interval_seconds: float):
+        self.index = index
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="coverage-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.index.refresh()
+            except Exception:
+                logger.exception("Coverage refresh failed")
+
+
+# Singleton instance
+coverage_index = CoverageIndex(
+    bbox=parse_bbox(settings.coverage_bbox),
+    cell_size_deg=settings.coverage_cell_deg,
+    max_minutes=settings.coverage_max_minutes,
+)
@@ -0,0 +1,239 @@
+"""
+In-memory spatio-temporal index of recent incidents for intake de-duplication.
+
+Incidents are bucketed by (lat cell, lng cell, time bucket) so a duplicate check
+only touches the neighbouring cells inside the dedup window instead of loading
+every recent incident from the database. Candidates in range are matched on text
+via MinHash LSH (title, and title + description), so reworded reports of the same
+event collapse onto one incident. Titles too short to shingle (e.g. "A" or an
+emoji) have no signature and are matched on their normalized text instead.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+from math import ceil, cos, floor, radians
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .minhash import MinHashLSH, Signature, minhasher, similarity
+from .routing import haversine
+from .timeutil import epoch_seconds
+
+DEDUP_WINDOW = timedelta(hours=2)
+DEDUP_RADIUS_KM = 0.5
+CELL_SIZE_DEG = 0.005  # ~550 m of latitude
+BUCKET_SECONDS = 15 * 60
+KM_PER_DEG_LAT = 111.32
+SIMILARITY_THRESHOLD = 0.5
+
+CellKey = Tuple[int, int, int]
+
+
+def normalize_title(title: Optional[str]) -> str:
+    return " ".join((title or "").lower().split())
+
+
+def report_text(title: Optional[str], description: Optional[str]) -> str:
+    return f"{title or ''} {description or ''}"
+
+
+class _Entry:
+    __slots__ = ("incident_id", "latitude", "longitude", "created_ts", "title_key", "key")
+
+    def __init__(self, incident_id: int, latitude: float, longitude: float, created_ts: float, title_key: str, key: CellKey):
+        self.incident_id = incident_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.created_ts = created_ts
+        self.title_key = title_key
+        self.key = key
+
+
+TextSignatures = Tuple[Optional[Signature], Optional[Signature]]
+
+
+def text_signatures(title: Optional[str], description: Optional[str]) -> TextSignatures:
+    """
+    MinHash signatures of the title and of title + description.
+    """
+    return minhasher.signature(title), minhasher.signature(report_text(title, description))
+
+
+class DuplicateMatch:
+    __slots__ = ("incident_id", "score", "distance_km")
+
+    def __init__(self, incident_id: int, score: float, distance_km: float):
+        self.incident_id = incident_id
+        self.score = score
+        self.distance_km = distance_km
+
+
+class RecentIncidentIndex:
+    """
+    Grid/time-bucket index of incidents reported inside the dedup window.
+    Thread-safe; request handlers run in the threadpool.
+    """
+
+    def __init__(
+        self,
+        window: timedelta = DEDUP_WINDOW,
+        radius_km: float = DEDUP_RADIUS_KM,
+        cell_size_deg: float = CELL_SIZE_DEG,
+        bucket_seconds: int = BUCKET_SECONDS,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+    ):
+        self.window = window
+        self.radius_km = radius_km
+        self.similarity_threshold = similarity_threshold
+        self.cell_size_deg = cell_size_deg
+        self.bucket_seconds = bucket_seconds
+        self._cells: Dict[CellKey, Dict[int, _Entry]] = {}
+        self._entries: Dict[int, _Entry] = {}
+        self._bucket_keys: Dict[int, Set[CellKey]] = {}
+        self._title_lsh = MinHashLSH()
+        self._text_lsh = MinHashLSH()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return floor(latitude / self.cell_size_deg), floor(longitude / self.cell_size_deg)
+
+    def _bucket(self, ts: float) -> int:
+        return int(ts // self.bucket_seconds)
+
+    def _prune(self, now_ts: float) -> None:
+        oldest = self._bucket(now_ts - self.window.total_seconds())
+        for bucket in [b for b in self._bucket_keys if b < oldest]:
+            for key in self._bucket_keys.pop(bucket):
+                for incident_id in self._cells.pop(key, {}):
+                    self._entries.pop(incident_id, None)
+                    self._title_lsh.remove(incident_id)
+                    self._text_lsh.remove(incident_id)
+
+    def _discard(self, incident_id: int) -> None:
+        entry = self._entries.pop(incident_id, None)
+        if entry is None:
+            return
+        self._title_lsh.remove(incident_id)
+        self._text_lsh.remove(incident_id)
+        cell = self._cells.get(entry.key)
+        if cell is not None:
+            cell.pop(incident_id, None)
+            if not cell:
+                del self._cells[entry.key]
+                keys = self._bucket_keys.get(entry.key[2])
+                if keys is not None:
+                    keys.discard(entry.key)
+                    if not keys:
+                        del self._bucket_keys[entry.key[2]]
+
+    def add(self, incident: models.Incident, signatures: Optional[TextSignatures] = None) -> None:
+        if incident.id is None or incident.latitude is None or incident.longitude is None:
+            return
+        created_ts = epoch_seconds(incident.created_at)
+        cx, cy = self._cell(incident.latitude, incident.longitude)
+        key = (cx, cy, self._bucket(created_ts))
+        entry = _Entry(incident.id, incident.latitude, incident.longitude, created_ts, normalize_title(incident.title), key)
+        title_sig, text_sig = signatures or text_signatures(incident.title, incident.description)
+        with self._lock:
+            self._discard(incident.id)
+            self._prune(datetime.now(timezone.utc).timestamp())
+            if created_ts < datetime.now(timezone.utc).timestamp() - self.window.total_seconds():
+                return
+            self._entries[incident.id] = entry
+            self._cells.setdefault(key, {})[incident.id] = entry
+            self._bucket_keys.setdefault(key[2], set()).add(key)
+            self._title_lsh.add(incident.id, title_sig, scope=(cx, cy))
+            self._text_lsh.add(incident.id, text_sig, scope=(cx, cy))
+
+    def remove(self, incident_id: int) -> None:
+        with self._lock:
+            self._discard(incident_id)
+
+    def _same_title(self, scopes: List[Tuple[int, int]], title_key: str, since_ts: float, now_ts: float) -> Set[int]:
+        # Titles without shingles are invisible to LSH: scan the window buckets of the scopes
+        found = set()
+        for bucket in range(self._bucket(since_ts), self._bucket(now_ts) + 1):
+            for x, y in scopes:
+                for incident_id, entry in self._cells.get((x, y, bucket), {}).items():
+                    if entry.title_key == title_key:
+                        found.add(incident_id)
+        return found
+
+    def _score(self, entry: _Entry, title_key: str, title_sig: Optional[Signature], text_sig: Optional[Signature]) -> float:
+        if entry.title_key and entry.title_key == title_key:
+            return 1.0
+        return max(
+            similarity(title_sig, self._title_lsh.signature_of(entry.incident_id)),
+            similarity(text_sig, self._text_lsh.signature_of(entry.incident_id)),
+        )
+
+    def find_duplicate(
+        self,
+        latitude: float,
+        longitude: float,
+        title: str,
+        description: Optional[str] = None,
+        now: Optional[datetime] = None,
+        signatures: Optional[TextSignatures] = None,
+    ) -> Optional[DuplicateMatch]:
+        """
+        Return the best text match among incidents within the dedup radius and
+        window (highest similarity, then closest), or None below the threshold.
+        """
+        title_key = normalize_title(title)
+        title_sig, text_sig = signatures or text_signatures(title, description)
+        now_ts = epoch_seconds(now)
+        since_ts = now_ts - self.window.total_seconds()
+        cx, cy = self._cell(latitude, longitude)
+        lat_span = ceil(self.radius_km / (KM_PER_DEG_LAT * self.cell_size_deg))
+        lng_km = KM_PER_DEG_LAT * max(cos(radians(latitude)), 0.01) * self.cell_size_deg
+        lng_span = ceil(self.radius_km / lng_km)
+        scopes = [
+            (cx + dx, cy + dy)
+            for dx in range(-lat_span, lat_span + 1)
+            for dy in range(-lng_span, lng_span + 1)
+        ]
+        best = None
+        with self._lock:
+            candidates = self._title_lsh.query(title_sig, scopes) | self._text_lsh.query(text_sig, scopes)
+            if title_sig is None and title_key:
+                candidates |= self._same_title(scopes, title_key, since_ts, now_ts)
+            for incident_id in candidates:
+                entry = self._entries.get(incident_id)
+                if entry is None or entry.created_ts < since_ts:
+                    continue
+                distance = haversine(latitude, longitude, entry.latitude, entry.longitude)
+                if distance > self.radius_km:
+                    continue
+                score = self._score(entry, title_key, title_sig, text_sig)
+                if score < self.similarity_threshold:
+                    continue
+                if best is None or (score, -distance) > (best.score, -best.distance_km):
+                    best = DuplicateMatch(incident_id, score, distance)
+        return best
+
+    def rebuild(self, db: Session) -> None:
+        """
+        Reload the window from the database (startup / recovery).
+        """
+        since = datetime.utcnow() - self.window
+        incidents = db.query(models.Incident).filter(
+            models.Incident.created_at >= since,
+            models.Incident.status.notin_([models.IncidentStatus.RESOLVED, models.IncidentStatus.FALSE_ALARM]),
+        ).all()
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+            self._bucket_keys.clear()
+            self._title_lsh.clear()
+            self._text_lsh.clear()
+        for incident in incidents:
+            self.add(incident)
+
+
+# Singleton instance
+recent_incidents = RecentIncidentIndex()
@@ -0,0 +1,78 @@
+"""
+Vectorized geodesic kernels over NumPy coordinate arrays.
+
+Every function takes an origin and arrays of latitudes/longitudes (degrees,
+WGS84 sphere) and evaluates all points in one call. Missing coordinates should
+be passed as NaN; they never match a radius and sort last by distance.
+"""
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from .routing import EARTH_RADIUS_KM
+
+KM_PER_DEG_LAT = np.pi * EARTH_RADIUS_KM / 180.0
+
+
+def to_arrays(latitudes: Iterable[Optional[float]], longitudes: Iterable[Optional[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    float64 arrays from (possibly None-containing) coordinate columns.
+    """
+    lats = np.array([np.nan if v is None else v for v in latitudes], dtype=np.float64)
+    lngs = np.array([np.nan if v is None else v for v in longitudes], dtype=np.float64)
+    return lats, lngs
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distance in km from (lat, lng) to each point.
+    """
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlmb = np.radians(lngs - lng)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bearing_deg(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Initial bearing in degrees clockwise from north, from (lat, lng) to each point.
+    """
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dlmb = np.radians(lngs - lng)
+    y = np.sin(dlmb) * np.cos(phi2)
+    x = np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(dlmb)
+    return np.degrees(np.arctan2(y, x)) % 360.0
+
+
+def within_radius(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Boolean mask of points within radius_km and the distances of all points
+    (NaN where the cheap latitude-band prefilter already ruled a point out).
+    """
+    # Latitude band check is exact on a sphere and skips the trig for most points
+    band = np.abs(lats - lat) <= radius_km / KM_PER_DEG_LAT
+    distances = np.full(lats.shape, np.nan)
+    candidates = np.flatnonzero(band)
+    if candidates.size:
+        distances[candidates] = haversine_km(lat, lng, lats[candidates], lngs[candidates])
+    with np.errstate(invalid="ignore"):
+        mask = distances <= radius_km
+    return mask, distances
+
+
+def nearest(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and distances of the k nearest points, nearest first. Points with
+    missing coordinates are never returned.
+    """
+    distances = haversine_km(lat, lng, lats, lngs)
+    valid = np.flatnonzero(~np.isnan(distances))
+    if valid.size == 0 or k <= 0:
+        return valid[:0], distances[:0]
+    k = min(k, valid.size)
+    part = valid[np.argpartition(distances[valid], k - 1)[:k]] if k < valid.size else valid
+    order = part[np.argsort(distances[part], kind="stable")]
+    return order, distances[order]
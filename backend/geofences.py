@@ -0,0 +1,205 @@
+"""
+Reverse geofence index: which active fences contain a point.
+
+Fences are the circles of located alerts (radius_km, active for
+GEOFENCE_ALERT_TTL_HOURS after creation) and of map annotations with a
+radius_m (roadblocks, safe zones, staging areas). Each circle is registered in
+every grid cell its bounding box touches, so matching a point is one cell
+lookup plus an exact haversine check on the few circles stored there. Circles
+spanning more than MAX_CELLS_PER_FENCE cells are kept in a short list that is
+checked on every match instead.
+"""
+import threading
+import time
+from math import cos, floor, radians
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import get_settings
+from .geo import KM_PER_DEG_LAT
+from .routing import haversine
+from .timeutil import epoch_seconds
+
+settings = get_settings()
+
+ALERT = "alert"
+ANNOTATION = "annotation"
+MAX_CELLS_PER_FENCE = 1024
+PRUNE_INTERVAL_SECONDS = 60.0
+
+FenceKey = Tuple[str, int]  # (fence kind, row id)
+Cell = Tuple[int, int]
+
+
+class _Fence:
+    __slots__ = ("kind", "id", "fence_type", "label", "latitude", "longitude", "radius_km", "expires_at", "cells")
+
+    def __init__(self, kind: str, fence_id: int, fence_type: str, label: Optional[str],
+                 latitude: float, longitude: float, radius_km: float, expires_at: Optional[float]):
+        self.kind = kind
+        self.id = fence_id
+        self.fence_type = fence_type
+        self.label = label
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.expires_at = expires_at  # epoch seconds, None = no expiry
+        self.cells: List[Cell] = []
+
+
+class GeofenceIndex:
+    """
+    Thread-safe; `sync()` picks up alerts and annotations inserted by other
+    processes since the last seen ids.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.01, alert_ttl_hours: float = 24.0):
+        self.cell_size = cell_size_deg
+        self.alert_ttl_seconds = alert_ttl_hours * 3600.0
+        self._cells: Dict[Cell, List[_Fence]] = {}
+        self._large: List[_Fence] = []
+        self._fences: Dict[FenceKey, _Fence] = {}
+        self._max_ids = {ALERT: 0, ANNOTATION: 0}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._fences)
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return floor(latitude / self.cell_size), floor(longitude / self.cell_size)
+
+    def _covering_cells(self, fence: _Fence) -> Optional[List[Cell]]:
+        dlat = fence.radius_km / KM_PER_DEG_LAT
+        # Widest longitude span is at the circle's pole-ward edge
+        edge_lat = min(abs(fence.latitude) + dlat, 89.9)
+        dlng = min(fence.radius_km / (KM_PER_DEG_LAT * cos(radians(edge_lat))), 180.0)
+        y0, x0 = self._cell(fence.latitude - dlat, fence.longitude - dlng)
+        y1, x1 = self._cell(fence.latitude + dlat, fence.longitude + dlng)
+        if (y1 - y0 + 1) * (x1 - x0 + 1) > MAX_CELLS_PER_FENCE:
+            return None
+        return [(y, x) for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)]
+
+    def _remove_locked(self, key: FenceKey) -> None:
+        fence = self._fences.pop(key, None)
+        if fence is None:
+            return
+        if not fence.cells:
+            self._large.remove(fence)
+        for cell in fence.cells:
+            bucket = self._cells[cell]
+            bucket.remove(fence)
+            if not bucket:
+                del self._cells[cell]
+
+    def _add(self, fence: _Fence) -> None:
+        with self._lock:
+            self._max_ids[fence.kind] = max(self._max_ids[fence.kind], fence.id)
+            key = (fence.kind, fence.id)
+            self._remove_locked(key)
+            if fence.expires_at is not None and fence.expires_at <= time.time():
+                return
+            cells = self._covering_cells(fence)
+            if cells is None:
+                self._large.append(fence)
+            else:
+                fence.cells = cells
+                for cell in cells:
+                    self._cells.setdefault(cell, []).append(fence)
+            self._fences[key] = fence
+
+    def add_alert(self, alert) -> None:
+        if alert.id is None:
+            return
+        if alert.latitude is None or alert.longitude is None or not alert.radius_km:
+            # Not a geofence, but remember the id so sync() does not reload it
+            with self._lock:
+                self._max_ids[ALERT] = max(self._max_ids[ALERT], alert.id)
+            return
+        expires_at = epoch_seconds(alert.created_at) + self.alert_ttl_seconds
+        self._add(_Fence(ALERT, alert.id, ALERT, alert.title, alert.latitude, alert.longitude, alert.radius_km, expires_at))
+
+    def add_annotation(self, annotation) -> None:
+        if annotation.id is None:
+            return
+        if annotation.latitude is None or annotation.longitude is None or not annotation.radius_m:
+            with self._lock:
+                self._max_ids[ANNOTATION] = max(self._max_ids[ANNOTATION], annotation.id)
+            return
+        self._add(_Fence(
+            ANNOTATION, annotation.id, annotation.annotation_type, annotation.label,
+            annotation.latitude, annotation.longitude, annotation.radius_m / 1000.0, None,
+        ))
+
+    def remove(self, kind: str, fence_id: int) -> None:
+        with self._lock:
+            self._remove_locked((kind, fence_id))
+
+    def prune(self) -> None:
+        """
+        Drop expired alert fences.
+        """
+        now = time.time()
+        with self._lock:
+            self._next_prune = now + PRUNE_INTERVAL_SECONDS
+            for key in [k for k, f in self._fences.items() if f.expires_at is not None and f.expires_at <= now]:
+                self._remove_locked(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cells.clear()
+            self._large.clear()
+            self._fences.clear()
+            self._max_ids = {ALERT: 0, ANNOTATION: 0}
+
+    def rebuild(self, db: Session) -> None:
+        self.clear()
+        self.sync(db)
+
+    def sync(self, db: Session) -> None:
+        alerts = db.query(models.Alert).filter(
+            models.Alert.id > self._max_ids[ALERT],
+            models.Alert.radius_km.isnot(None),
+        )
+        for alert in alerts.order_by(models.Alert.id):
+            self.add_alert(alert)
+        annotations = db.query(models.MapAnnotation).filter(
+            models.MapAnnotation.id > self._max_ids[ANNOTATION],
+            models.MapAnnotation.radius_m.isnot(None),
+        )
+        for annotation in annotations.order_by(models.MapAnnotation.id):
+            self.add_annotation(annotation)
+        if time.time() >= self._next_prune:
+            self.prune()
+
+    def match(self, latitude: Optional[float], longitude: Optional[float]) -> List[dict]:
+        """
+        Every active fence containing the point, nearest centre first.
+        """
+        if latitude is None or longitude is None:
+            return []
+        now = time.time()
+        hits = []
+        with self._lock:
+            candidates = self._cells.get(self._cell(latitude, longitude), []) + self._large
+            for fence in candidates:
+                if fence.expires_at is not None and fence.expires_at <= now:
+                    continue
+                distance = haversine(latitude, longitude, fence.latitude, fence.longitude)
+                if distance <= fence.radius_km:
+                    hits.append({
+                        "fence_kind": fence.kind,
+                        "fence_id": fence.id,
+                        "fence_type": fence.fence_type,
+                        "label": fence.label,
+                        "radius_km": fence.radius_km,
+                        "distance_km": round(distance, 4),
+                    })
+        hits.sort(key=lambda h: h["distance_km"])
+        return hits
+
+
+# Singleton instance
+geofences = GeofenceIndex(alert_ttl_hours=settings.geofence_alert_ttl_hours)
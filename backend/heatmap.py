@@ -0,0 +1,227 @@
+"""
+Incrementally maintained heatmap aggregates.
+
+Every other zoom level up to HEATMAP_MAX_ZOOM buckets incidents into Web
+Mercator cells of TILE_SIZE / CELLS_PER_TILE pixels (quadkey-aligned, so cells
+nest across levels). Each cell keeps hourly time buckets as sorted keys with running
+(cumulative) counts and spatial_risk_index sums, so the totals for any time
+window are two bisects per cell: a heatmap request costs O(cells in view),
+independent of how many incidents those cells hold.
+"""
+import bisect
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .tiles import lnglat_to_world, world_to_cell, world_to_lnglat
+from .timeutil import as_utc
+
+HEATMAP_MAX_ZOOM = 12  # ~1 km cells; finer zooms reuse this level
+LEVEL_STEP = 2  # store every other zoom; odd zooms use the level below (64 px cells)
+CELLS_PER_TILE = 8  # 32 px cells on 256 px tiles
+BUCKET_SECONDS = 3600
+
+Cell = Tuple[int, int]
+
+
+def _bucket(created_at: Optional[datetime]) -> int:
+    created_at = as_utc(created_at) if created_at is not None else datetime.now(timezone.utc)
+    return int(created_at.timestamp()) // BUCKET_SECONDS
+
+
+class _CellSeries:
+    """
+    Sorted hourly buckets with cumulative count and risk sums.
+    """
+
+    __slots__ = ("buckets", "counts", "risks")
+
+    def __init__(self):
+        self.buckets: List[int] = []
+        self.counts: List[int] = []
+        self.risks: List[float] = []
+
+    def add(self, bucket: int, count: int, risk: float) -> None:
+        pos = bisect.bisect_left(self.buckets, bucket)
+        if pos == len(self.buckets) or self.buckets[pos] != bucket:
+            # New incidents almost always land at the end (append is O(1))
+            self.buckets.insert(pos, bucket)
+            self.counts.insert(pos, self.counts[pos - 1] if pos else 0)
+            self.risks.insert(pos, self.risks[pos - 1] if pos else 0.0)
+        for i in range(pos, len(self.buckets)):
+            self.counts[i] += count
+            self.risks[i] += risk
+
+    def window(self, start: Optional[int], end: Optional[int]) -> Tuple[int, float]:
+        """
+        (count, risk sum) for buckets in [start, end).
+        """
+        lo = bisect.bisect_left(self.buckets, start) if start is not None else 0
+        hi = bisect.bisect_left(self.buckets, end) if end is not None else len(self.buckets)
+        if hi <= lo:
+            return 0, 0.0
+        count = self.counts[hi - 1] - (self.counts[lo - 1] if lo else 0)
+        risk = self.risks[hi - 1] - (self.risks[lo - 1] if lo else 0.0)
+        return count, risk
+
+    @property
+    def total(self) -> int:
+        return self.counts[-1] if self.counts else 0
+
+
+# Cells holding a single hour are stored as a plain (bucket, count, risk) tuple
+CellData = Union[Tuple[int, int, float], _CellSeries]
+
+
+class HeatmapIndex:
+    """
+    Thread-safe; `sync()` catches up on rows inserted by other processes since
+    the last seen id.
+    """
+
+    def __init__(self, max_zoom: int = HEATMAP_MAX_ZOOM, cells_per_tile: int = CELLS_PER_TILE, level_step: int = LEVEL_STEP):
+        self.max_zoom = max_zoom
+        self.cells_per_tile = cells_per_tile
+        self.zooms = list(range(0, max_zoom + 1, level_step))
+        self._levels: List[Dict[Cell, CellData]] = [{} for _ in self.zooms]
+        self._level_divisions = [self._divisions(zoom) for zoom in self.zooms]
+        self._points: Dict[int, Tuple[float, float, int, float]] = {}  # id -> (world x, world y, bucket, risk)
+        self._max_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _divisions(self, zoom: int) -> int:
+        return (2 ** zoom) * self.cells_per_tile
+
+    @staticmethod
+    def _merge(level: Dict[Cell, CellData], key: Cell, bucket: int, count: int, risk: float) -> None:
+        cell = level.get(key)
+        if cell is None:
+            level[key] = (bucket, count, risk)
+            return
+        if type(cell) is tuple:
+            if cell[0] == bucket:
+                if cell[1] + count <= 0:
+                    del level[key]
+                else:
+                    level[key] = (bucket, cell[1] + count, cell[2] + risk)
+                return
+            # Promote to a series once a second hour shows up
+            series = _CellSeries()
+            series.add(*cell)
+            level[key] = cell = series
+        cell.add(bucket, count, risk)
+        if cell.total <= 0:
+            del level[key]
+
+    def _apply(self, point: Tuple[float, float, int, float], sign: int) -> None:
+        wx, wy, bucket, risk = point
+        for level, divisions in zip(self._levels, self._level_divisions):
+            self._merge(level, world_to_cell(wx, wy, divisions), bucket, sign, sign * risk)
+
+    def add(self, incident_id: Optional[int], latitude: Optional[float], longitude: Optional[float],
+            created_at: Optional[datetime], risk: Optional[float]) -> None:
+        """
+        Insert or replace an incident (upsert by id).
+        """
+        if incident_id is None:
+            return
+        with self._lock:
+            previous = self._points.pop(incident_id, None)
+            if previous is not None:
+                self._apply(previous, -1)
+            self._max_id = max(self._max_id, incident_id)
+            if latitude is None or longitude is None:
+                return
+            point = (*lnglat_to_world(longitude, latitude), _bucket(created_at), float(risk or 0.0))
+            self._points[incident_id] = point
+            self._apply(point, 1)
+
+    def update_risk(self, risks: Iterable[Tuple[int, Optional[float]]]) -> None:
+        """
+        Re-weight incidents after their spatial_risk_index changed.
+        """
+        with self._lock:
+            for incident_id, risk in risks:
+                previous = self._points.get(incident_id)
+                if previous is None:
+                    continue
+                wx, wy, bucket, old_risk = previous
+                delta = float(risk or 0.0) - old_risk
+                if delta:
+                    for level, divisions in zip(self._levels, self._level_divisions):
+                        self._merge(level, world_to_cell(wx, wy, divisions), bucket, 0, delta)
+                    self._points[incident_id] = (wx, wy, bucket, old_risk + delta)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._levels = [{} for _ in self.zooms]
+            self._points.clear()
+            self._max_id = 0
+
+    def rebuild(self, db: Session) -> None:
+        self.clear()
+        self.sync(db)
+
+    def sync(self, db: Session) -> None:
+        rows = db.query(
+            models.Incident.id,
+            models.Incident.latitude,
+            models.Incident.longitude,
+            models.Incident.created_at,
+            models.Incident.spatial_risk_index,
+        ).filter(models.Incident.id > self._max_id).all()
+        for row in rows:
+            self.add(*row)
+
+    def cells(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float, zoom: int,
+              start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, List[dict]]:
+        """
+        (level used, non-empty cells in the bbox for the time window [start, end)).
+        """
+        position = max(i for i, stored in enumerate(self.zooms) if stored <= max(zoom, 0))
+        zoom = self.zooms[position]
+        divisions = self._level_divisions[position]
+        x0, y0 = world_to_cell(*lnglat_to_world(min_lng, max_lat), divisions)
+        x1, y1 = world_to_cell(*lnglat_to_world(max_lng, min_lat), divisions)
+        start_bucket = _bucket(start) if start is not None else None
+        # A partially covered end hour is included
+        end_bucket = -(-int(as_utc(end).timestamp()) // BUCKET_SECONDS) if end is not None else None
+        result = []
+        with self._lock:
+            level = self._levels[position]
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > len(level):
+                cells = [(key, cell) for key, cell in level.items() if x0 <= key[0] <= x1 and y0 <= key[1] <= y1]
+            else:
+                cells = [
+                    (key, level[key])
+                    for key in ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+                    if key in level
+                ]
+            for (x, y), cell in cells:
+                if type(cell) is tuple:
+                    in_window = (start_bucket is None or cell[0] >= start_bucket) and (end_bucket is None or cell[0] < end_bucket)
+                    count, risk = (cell[1], cell[2]) if in_window else (0, 0.0)
+                else:
+                    count, risk = cell.window(start_bucket, end_bucket)
+                if count <= 0:
+                    continue
+                lng, lat = world_to_lnglat((x + 0.5) / divisions, (y + 0.5) / divisions)
+                result.append({
+                    "cell": f"{zoom}/{x}/{y}",
+                    "latitude": lat,
+                    "longitude": lng,
+                    "count": count,
+                    "risk_sum": round(risk, 4),
+                    "mean_risk": round(risk / count, 4),
+                })
+        return zoom, result
+
+
+# Singleton instance
+incident_heatmap = HeatmapIndex()
@@ -0,0 +1,140 @@
+"""
+Idempotency-Key support for report resubmission (PWA background sync).
+
+A keyed request stores its response in the same transaction as the rows it
+creates, so a replay returns the stored response after a single primary-key
+lookup and never re-runs triage, dedup or alerting.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Type
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import get_settings
+
+logger = logging.getLogger("aegis.idempotency")
+
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL = timedelta(minutes=10)
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+class IdempotencyStore:
+    """
+    TTL'd store of responses keyed by (client key, principal, route).
+    """
+
+    def __init__(self, ttl: timedelta):
+        self.ttl = ttl
+        self._last_purge = datetime.min
+        self._lock = threading.Lock()
+
+    def record_id(self, key: str, request: Request, current_user: Optional[models.User]) -> str:
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        principal = str(current_user.id) if current_user else "anonymous"
+        scope = f"{request.method} {request.url.path}"
+        return hashlib.sha256(f"{principal}\x00{scope}\x00{key}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def request_hash(payload: BaseModel) -> str:
+        return hashlib.sha256(payload.model_dump_json().encode("utf-8")).hexdigest()
+
+    def lookup(self, db: Session, record_id: str, request_hash: str) -> Optional[models.IdempotencyKey]:
+        """
+        Return the stored response for a live key. A key reused with a
+        different body is rejected rather than silently replayed.
+        """
+        record = db.get(models.IdempotencyKey, record_id)
+        if record is None:
+            return None
+        if _naive_utc(record.expires_at) <= datetime.utcnow():
+            db.delete(record)
+            db.commit()
+            return None
+        if record.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+        return record
+
+    def commit(
+        self,
+        db: Session,
+        record_id: str,
+        request_hash: str,
+        obj: Any,
+        response_model: Type[BaseModel],
+        status_code: int = 200,
+    ) -> Optional[models.IdempotencyKey]:
+        """
+        Store the response for obj and commit it together with the pending
+        rows. If a concurrent request with the same key won the race, roll
+        back and return its record instead.
+        """
+        db.flush()
+        db.refresh(obj)
+        body = response_model.model_validate(obj).model_dump(mode="json")
+        now = datetime.utcnow()
+        db.add(models.IdempotencyKey(
+            id=record_id,
+            request_hash=request_hash,
+            status_code=status_code,
+            response=json.dumps(body),
+            expires_at=now + self.ttl,
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            record = self.lookup(db, record_id, request_hash)
+            if record is None:
+                raise HTTPException(status_code=409, detail="Idempotency-Key conflict, retry the request")
+            return record
+        self._maybe_purge(db, now)
+        return None
+
+    @staticmethod
+    def replay(record: models.IdempotencyKey) -> JSONResponse:
+        return JSONResponse(
+            content=json.loads(record.response),
+            status_code=record.status_code,
+            headers={REPLAY_HEADER: "true"},
+        )
+
+    def purge_expired(self, db: Session) -> int:
+        deleted = db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+    def _maybe_purge(self, db: Session, now: datetime) -> None:
+        with self._lock:
+            if now - self._last_purge < PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        try:
+            deleted = self.purge_expired(db)
+            if deleted:
+                logger.info("Purged %d expired idempotency keys", deleted)
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to purge idempotency keys")
+
+
+# Singleton instance
+idempotency_store = IdempotencyStore(timedelta(hours=get_settings().idempotency_ttl_hours))
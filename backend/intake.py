@@ -0,0 +1,393 @@
+"""
+Incident intake pipeline shared by the single-report, bulk and streaming
+endpoints: source resolution, AI triage, routing suggestions, dedup, geometry
+and auto-alerting.
+"""
+import json
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from pydantic import ValidationError
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .ai_engine import TriageBatch, ai_engine
+from .database import SQLALCHEMY_DATABASE_URL
+from .dedup import RecentIncidentIndex, recent_incidents, text_signatures
+from .rbac import admin_roles
+from .clusters import incident_clusters
+from .geofences import geofences
+from .heatmap import incident_heatmap
+from .jurisdictions import jurisdictions
+from .spatial_index import incident_points
+from .vector_tiles import tile_cache
+from .routing import suggest_agencies, suggest_unit_type, build_routing_rationale
+
+BULK_MAX_ITEMS = 5000
+STREAM_BATCH_SIZE = 200
+STREAM_FLUSH_SECONDS = 1.0
+STREAM_MAX_LINE_BYTES = 64 * 1024
+STREAM_MAX_ERRORS = 100
+
+responder_roles = [
+    models.UserRole.POLICE,
+    models.UserRole.FIRE,
+    models.UserRole.MEDICAL,
+    models.UserRole.TRAFFIC,
+    models.UserRole.DISASTER,
+    models.UserRole.MILITARY,
+]
+
+
+def resolve_source(current_user: Optional[models.User]) -> models.IncidentSource:
+    """
+    Determine source based on caller.
+    """
+    if not current_user:
+        return models.IncidentSource.CITIZEN
+    if current_user.role in admin_roles:
+        return models.IncidentSource.OPS_CENTER
+    if current_user.role in responder_roles:
+        return models.IncidentSource.RESPONDER
+    if current_user.role == models.UserRole.VERIFIER:
+        return models.IncidentSource.OPS_CENTER
+    return models.IncidentSource.CITIZEN
+
+
+def anonymous_reporter_id(db: Session) -> int:
+    # Fallback to "citizen_zero" for anonymous reports
+    citizen_zero = db.query(models.User).filter(models.User.username == "citizen_zero").first()
+    if not citizen_zero:
+        # Create citizen_zero if not exists
+        citizen_zero = models.User(username="citizen_zero", email="anonymous@aegis.et", hashed_password="hash", role=models.UserRole.CITIZEN)
+        db.add(citizen_zero)
+        db.commit()
+        db.refresh(citizen_zero)
+    return citizen_zero.id
+
+
+def spatial_risk_index(escalation_probability: float, spread_risk: float, casualty_likelihood: float) -> float:
+    # Simple spatial risk index heuristic
+    return 0.4 * (escalation_probability or 0) + 0.3 * (spread_risk or 0) + 0.3 * (casualty_likelihood or 0)
+
+
+def spatial_risk_indices(batch: TriageBatch) -> np.ndarray:
+    """
+    spatial_risk_index over a whole triage batch as array arithmetic.
+    """
+    return 0.4 * batch.escalation_probability + 0.3 * batch.spread_risk + 0.3 * batch.casualty_likelihood
+
+
+def geometry_wkt(latitude: float, longitude: float) -> str:
+    # Set geometry for Postgres; store WKT for others
+    if "postgresql" in SQLALCHEMY_DATABASE_URL:
+        return f"SRID=4326;POINT({longitude} {latitude})"
+    return f"POINT({longitude} {latitude})"
+
+
+def routing_suggestions(selected_type: models.IncidentType, severity: models.IncidentSeverity, final_type: models.IncidentType) -> Tuple[str, str, str]:
+    suggested_roles = suggest_agencies(selected_type, severity)
+    suggested_unit = suggest_unit_type(selected_type)
+    rationale = build_routing_rationale(
+        models.Incident(incident_type=final_type, severity=severity), suggested_roles, suggested_unit
+    )
+    # store as comma-separated for simplicity
+    return ",".join(r.value for r in suggested_roles), suggested_unit.value, rationale
+
+
+def triage(
+    incident: schemas.IncidentCreate,
+    ai_result: Optional[dict] = None,
+    routing_cache: Optional[Dict] = None,
+    risk_index: Optional[float] = None,
+) -> dict:
+    """
+    Build the DB row for a report: AI severity/type and risk cues, spatial risk
+    index and routing suggestions. Batch callers pass precomputed `ai_result`
+    and `risk_index`; `routing_cache` memoizes routing per (selected type,
+    severity, final type) across a batch.
+    """
+    # --- AI Triage Engine ---
+    # Analyze the text to determine severity and type automatically
+    if ai_result is None:
+        ai_result = ai_engine.analyze(f"{incident.title} {incident.description}")
+    incident_data = incident.model_dump()
+
+    # Apply AI Severity (Always trust AI for risk assessment in this MVP)
+    incident_data['severity'] = ai_result['severity']
+    incident_data['ai_confidence'] = ai_result.get('confidence', 0.0)
+    incident_data['escalation_probability'] = ai_result.get('escalation_probability', 0.0)
+    incident_data['spread_risk'] = ai_result.get('spread_risk', 0.0)
+    incident_data['casualty_likelihood'] = ai_result.get('casualty_likelihood', 0.0)
+    incident_data['crowd_size_estimate'] = ai_result.get('crowd_size_estimate', 0)
+    incident_data['lexicon_version'] = ai_result.get('lexicon_version')
+    if risk_index is None:
+        risk_index = spatial_risk_index(
+            incident_data['escalation_probability'],
+            incident_data['spread_risk'],
+            incident_data['casualty_likelihood'],
+        )
+    incident_data['spatial_risk_index'] = risk_index
+
+    # Routing suggestions are made from the reported type; the AI type
+    # replaces it if the engine found something specific
+    selected_type = incident_data['incident_type']
+    if ai_result['incident_type'] != models.IncidentType.OTHER:
+        incident_data['incident_type'] = ai_result['incident_type']
+
+    key = (selected_type, incident_data['severity'], incident_data['incident_type'])
+    if routing_cache is not None and key in routing_cache:
+        routing = routing_cache[key]
+    else:
+        routing = routing_suggestions(*key)
+        if routing_cache is not None:
+            routing_cache[key] = routing
+    incident_data['suggested_agencies'], incident_data['suggested_unit_type'], incident_data['routing_rationale'] = routing
+    incident_data.update(jurisdictions.resolve(incident_data['latitude'], incident_data['longitude']))
+    return incident_data
+
+
+def alert_fields(incident_id: int, incident_type: models.IncidentType, severity: models.IncidentSeverity, title: str) -> Optional[dict]:
+    """
+    If severity is HIGH or CRITICAL, generate a system-wide alert.
+    """
+    if severity not in [models.IncidentSeverity.HIGH, models.IncidentSeverity.CRITICAL]:
+        return None
+    return {
+        "title": f"NEW {severity.value.upper()} THREAT",
+        "message": f"{incident_type.value.title()} reported at {title}. Immediate attention required.",
+        "severity": severity,
+        "incident_id": incident_id,
+    }
+
+
+def geofence_hit_rows(incident_id: int, hits: List[dict]) -> List[dict]:
+    """
+    GeofenceHit rows for the fences an incident landed in.
+    """
+    return [
+        {
+            "incident_id": incident_id,
+            "fence_kind": hit["fence_kind"],
+            "fence_id": hit["fence_id"],
+            "fence_type": hit["fence_type"],
+            "label": hit["label"],
+            "distance_km": hit["distance_km"],
+        }
+        for hit in hits
+    ]
+
+
+def index_incidents(incidents: Iterable, signatures: Optional[List] = None) -> None:
+    """
+    Publish committed incidents to the in-memory intake indexes.
+    """
+    for position, incident in enumerate(incidents):
+        recent_incidents.add(incident, signatures[position] if signatures else None)
+        if not models.IS_POSTGRES:
+            incident_points.add(incident.id, incident.latitude, incident.longitude)
+        incident_clusters.add(incident.id, incident.latitude, incident.longitude, incident.severity, incident.incident_type)
+        incident_heatmap.add(incident.id, incident.latitude, incident.longitude, incident.created_at, incident.spatial_risk_index)
+        tile_cache.invalidate_point(incident.latitude, incident.longitude)
+
+
+def create_incident_record(db: Session, incident: schemas.IncidentCreate, reporter_id: int, source: models.IncidentSource, commit: bool = True) -> Tuple[models.Incident, bool]:
+    """
+    Run the full pipeline for one report and commit the incident (and its
+    auto-alert) in one transaction. Returns the incident and whether an alert
+    was raised. With commit=False the rows are only flushed; the caller
+    commits and then calls index_incidents().
+    """
+    incident_data = triage(incident)
+    incident_data["source"] = source
+
+    # --- Deduping: recent incidents within 0.5 km (haversine) with near-duplicate text ---
+    potential_dup = recent_incidents.find_duplicate(incident.latitude, incident.longitude, incident.title, incident.description)
+    if potential_dup:
+        incident_data["potential_duplicate_id"] = potential_dup.incident_id
+        incident_data["duplicate_score"] = round(potential_dup.score, 3)
+
+    db_incident = models.Incident(
+        **incident_data,
+        reporter_id=reporter_id,
+        status=models.IncidentStatus.PENDING
+    )
+    db_incident.geometry = geometry_wkt(incident.latitude, incident.longitude)
+    db.add(db_incident)
+    db.flush()
+
+    # --- Automated Alerting Logic ---
+    alert_data = alert_fields(db_incident.id, db_incident.incident_type, db_incident.severity, db_incident.title)
+    if alert_data:
+        db.add(models.Alert(**alert_data))
+
+    # --- Reverse geofencing: active alert circles and annotations containing the report ---
+    geofences.sync(db)
+    for hit in geofence_hit_rows(db_incident.id, geofences.match(incident.latitude, incident.longitude)):
+        db.add(models.GeofenceHit(**hit))
+    if commit:
+        db.commit()
+        db.refresh(db_incident)
+        index_incidents([db_incident])
+    return db_incident, alert_data is not None
+
+
+def bulk_create_incidents(db: Session, items: List[schemas.IncidentCreate], reporter_id: int) -> Tuple[List[dict], int]:
+    """
+    Triage, dedup and insert a batch of reports in one transaction: a single
+    multi-row INSERT for incidents and one for alerts. Returns per-item
+    results (in request order) and the number of alerts raised.
+    """
+    batch = ai_engine.analyze_batch([f"{item.title} {item.description}" for item in items])
+    ai_results = batch.rows()
+    risk_indices = spatial_risk_indices(batch).tolist()
+    signed: Dict[Tuple[str, str], tuple] = {}
+    signatures: List[tuple] = []
+    routing_cache: Dict = {}
+    batch_index = RecentIncidentIndex()
+    rows: List[dict] = []
+    in_batch_dups: Dict[int, int] = {}
+    for position, item in enumerate(items):
+        row = triage(item, ai_results[position], routing_cache, risk_indices[position])
+        row["reporter_id"] = reporter_id
+        row["status"] = models.IncidentStatus.PENDING
+        row["geometry"] = geometry_wkt(item.latitude, item.longitude)
+
+        text_key = (item.title, item.description)
+        if text_key not in signed:
+            signed[text_key] = text_signatures(*text_key)
+        signatures.append(signed[text_key])
+        match = recent_incidents.find_duplicate(item.latitude, item.longitude, item.title, item.description, signatures=signed[text_key])
+        local = batch_index.find_duplicate(item.latitude, item.longitude, item.title, item.description, signatures=signed[text_key])
+        if local and (not match or local.score > match.score):
+            # Duplicate of an earlier item in this batch (negative placeholder id)
+            in_batch_dups[position] = -local.incident_id - 1
+            row["duplicate_score"] = round(local.score, 3)
+        elif match:
+            row["potential_duplicate_id"] = match.incident_id
+            row["duplicate_score"] = round(match.score, 3)
+        batch_index.add(
+            SimpleNamespace(id=-position - 1, created_at=None, **item.model_dump(include={"title", "description", "latitude", "longitude"})),
+            signed[text_key],
+        )
+        rows.append(row)
+
+    if not rows:
+        return [], 0
+
+    inserted = db.execute(
+        insert(models.Incident).returning(models.Incident.id, models.Incident.created_at, sort_by_parameter_order=True),
+        rows,
+    ).all()
+    ids = [r.id for r in inserted]
+
+    if in_batch_dups:
+        db.execute(
+            update(models.Incident),
+            [{"id": ids[pos], "potential_duplicate_id": ids[ref]} for pos, ref in in_batch_dups.items()],
+        )
+        for pos, ref in in_batch_dups.items():
+            rows[pos]["potential_duplicate_id"] = ids[ref]
+
+    alerts = [
+        a for a in (
+            alert_fields(incident_id, row["incident_type"], row["severity"], row["title"])
+            for incident_id, row in zip(ids, rows)
+        ) if a
+    ]
+    if alerts:
+        db.execute(insert(models.Alert), alerts)
+    geofences.sync(db)
+    fence_hits = [geofences.match(row["latitude"], row["longitude"]) for row in rows]
+    hit_rows = [hit for incident_id, hits in zip(ids, fence_hits) for hit in geofence_hit_rows(incident_id, hits)]
+    if hit_rows:
+        db.execute(insert(models.GeofenceHit), hit_rows)
+    db.commit()
+
+    index_incidents(
+        [
+            SimpleNamespace(id=r.id, created_at=r.created_at, title=row["title"], description=row["description"],
+                            latitude=row["latitude"], longitude=row["longitude"],
+                            severity=row["severity"], incident_type=row["incident_type"],
+                            spatial_risk_index=row["spatial_risk_index"])
+            for r, row in zip(inserted, rows)
+        ],
+        signatures,
+    )
+    results = [
+        {
+            "index": position,
+            "id": incident_id,
+            "severity": row["severity"],
+            "incident_type": row["incident_type"],
+            "potential_duplicate_id": row.get("potential_duplicate_id"),
+            "duplicate_score": row.get("duplicate_score"),
+            "suggested_unit_type": row["suggested_unit_type"],
+            "geofence_hits": len(fence_hits[position]),
+        }
+        for position, (incident_id, row) in enumerate(zip(ids, rows))
+    ]
+    return results, len(alerts)
+
+
+class NDJSONDecoder:
+    """
+    Incremental NDJSON splitter for chunked request bodies. At most one partial
+    line is buffered; lines over `max_line_bytes` are dropped and reported as
+    None so a bad producer cannot grow memory without bound.
+    """
+
+    def __init__(self, max_line_bytes: int = STREAM_MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self.line_no = 0
+        self._buffer = bytearray()
+        self._oversized = False
+
+    def _emit(self, line: bytes) -> Iterator[Tuple[int, Optional[bytes]]]:
+        self.line_no += 1
+        if self._oversized or len(line) > self.max_line_bytes:
+            self._oversized = False
+            yield self.line_no, None
+        elif line.strip():
+            yield self.line_no, line
+
+    def feed(self, chunk: bytes) -> Iterator[Tuple[int, Optional[bytes]]]:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if not self._oversized:
+                self._buffer += chunk[start:end]
+            line = bytes(self._buffer)
+            self._buffer.clear()
+            yield from self._emit(line)
+            start = end + 1
+        if not self._oversized:
+            self._buffer += chunk[start:]
+            if len(self._buffer) > self.max_line_bytes:
+                self._buffer.clear()
+                self._oversized = True
+
+    def close(self) -> Iterator[Tuple[int, Optional[bytes]]]:
+        if self._buffer or self._oversized:
+            line = bytes(self._buffer)
+            self._buffer.clear()
+            yield from self._emit(line)
+
+
+def parse_ndjson_item(line: Optional[bytes]) -> schemas.IncidentCreate:
+    """
+    Decode and validate one NDJSON line; raises ValueError with a short reason.
+    """
+    if line is None:
+        raise ValueError(f"line exceeds {STREAM_MAX_LINE_BYTES} bytes")
+    try:
+        return schemas.IncidentCreate.model_validate(json.loads(line))
+    except json.JSONDecodeError as exc:
+        raise ValueError(f"invalid JSON: {exc.msg}")
+    except ValidationError as exc:
+        raise ValueError("; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors()))
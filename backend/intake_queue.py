@@ -0,0 +1,197 @@
+"""
+Write-behind intake: reports accepted via the async endpoint are persisted as
+raw tickets and enriched (triage, routing, dedup, alerting) by a worker pool.
+
+A worker claims a ticket with a conditional UPDATE (queued -> processing,
+stamping `claimed_at`), so with several API processes only one of them
+enriches it. The incident is committed together with the ticket completion,
+which is again conditional on still holding that claim. Tickets left
+processing longer than the lease (a worker that died) are released back to
+the queue on start().
+"""
+import logging
+import queue
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas, database, intake
+from .config import get_settings
+
+logger = logging.getLogger("aegis.intake")
+
+Notify = Callable[[str], None]
+
+
+def create_ticket(db: Session, incident: schemas.IncidentCreate, reporter_id: Optional[int], source: models.IncidentSource) -> models.IntakeTicket:
+    ticket = models.IntakeTicket(
+        id=uuid.uuid4().hex,
+        status=models.TicketStatus.QUEUED,
+        payload=incident.model_dump_json(),
+        source=source,
+        reporter_id=reporter_id,
+    )
+    db.add(ticket)
+    db.commit()
+    db.refresh(ticket)
+    return ticket
+
+
+class IntakeWorkerPool:
+    """
+    Thread pool draining queued tickets. Tickets are durable in the DB, so
+    anything queued or in flight at shutdown is picked up again on start().
+    With zero workers tickets are processed inline on submit (tests / dev).
+    """
+
+    def __init__(self, workers: int = 2, lease_seconds: float = 300.0):
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._notify: Optional[Notify] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def start(self, notify: Optional[Notify] = None, requeue: bool = True) -> None:
+        with self._lock:
+            if notify is not None:
+                self._notify = notify
+            if self._threads or self.workers <= 0:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"intake-worker-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        if requeue:
+            self._requeue_pending()
+
+    def stop(self) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def submit(self, ticket_id: str) -> None:
+        if self.workers <= 0:
+            self.process(ticket_id)
+            return
+        if not self.running:
+            self.start(requeue=False)
+        self._queue.put(ticket_id)
+
+    def _requeue_pending(self) -> None:
+        table = models.IntakeTicket.__table__
+        expired = datetime.now(timezone.utc) - timedelta(seconds=self.lease_seconds)
+        db = database.SessionLocal()
+        try:
+            # Claims older than the lease belong to a worker that is gone; younger ones may still be running elsewhere
+            released = db.execute(
+                update(table)
+                .where(table.c.status == models.TicketStatus.PROCESSING, or_(table.c.claimed_at.is_(None), table.c.claimed_at < expired))
+                .values(status=models.TicketStatus.QUEUED, claimed_at=None)
+            ).rowcount
+            db.commit()
+            if released:
+                logger.warning("Released %d intake tickets with an expired processing lease", released)
+            pending = db.query(models.IntakeTicket.id).filter(
+                models.IntakeTicket.status == models.TicketStatus.QUEUED
+            ).order_by(models.IntakeTicket.created_at).all()
+        finally:
+            db.close()
+        for (ticket_id,) in pending:
+            self.submit(ticket_id)
+        if pending:
+            logger.info("Requeued %d pending intake tickets", len(pending))
+
+    def _emit(self, message: str) -> None:
+        if self._notify is not None:
+            try:
+                self._notify(message)
+            except Exception:
+                logger.exception("Failed to push intake notification")
+
+    def _run(self) -> None:
+        while True:
+            ticket_id = self._queue.get()
+            if ticket_id is None:
+                return
+            try:
+                self.process(ticket_id)
+            except Exception:
+                logger.exception("Intake worker crashed on ticket %s", ticket_id)
+
+    @staticmethod
+    def _claim(db: Session, ticket_id: str) -> Optional[datetime]:
+        """
+        Atomically move a queued ticket to processing. Returns the claim time,
+        or None if the ticket is done, failed or held by another worker.
+        """
+        table = models.IntakeTicket.__table__
+        claimed_at = datetime.now(timezone.utc)
+        claimed = db.execute(
+            update(table)
+            .where(table.c.id == ticket_id, table.c.status == models.TicketStatus.QUEUED)
+            .values(status=models.TicketStatus.PROCESSING, claimed_at=claimed_at)
+        ).rowcount
+        db.commit()
+        return claimed_at if claimed else None
+
+    @staticmethod
+    def _finish(db: Session, ticket_id: str, claimed_at: datetime, **values) -> bool:
+        # Only the holder of the current claim may complete the ticket (not committed here)
+        table = models.IntakeTicket.__table__
+        return db.execute(
+            update(table)
+            .where(table.c.id == ticket_id, table.c.status == models.TicketStatus.PROCESSING, table.c.claimed_at == claimed_at)
+            .values(**values)
+        ).rowcount == 1
+
+    def process(self, ticket_id: str) -> None:
+        db = database.SessionLocal()
+        try:
+            claimed_at = self._claim(db, ticket_id)
+            if claimed_at is None:
+                return
+            ticket = db.query(models.IntakeTicket).filter(models.IntakeTicket.id == ticket_id).first()
+            try:
+                incident = schemas.IncidentCreate.model_validate_json(ticket.payload)
+                reporter_id = ticket.reporter_id or intake.anonymous_reporter_id(db)
+                # Incident, alert and ticket completion commit together, and only
+                # while the claim holds, so a ticket never creates two incidents
+                db_incident, alert_created = intake.create_incident_record(db, incident, reporter_id, ticket.source, commit=False)
+                if not self._finish(db, ticket_id, claimed_at, status=models.TicketStatus.DONE, incident_id=db_incident.id):
+                    db.rollback()
+                    logger.warning("Intake ticket %s lost its processing lease; its new holder completes it", ticket_id)
+                    return
+                db.commit()
+            except Exception as exc:
+                db.rollback()
+                logger.exception("Intake ticket %s failed", ticket_id)
+                failed = self._finish(db, ticket_id, claimed_at, status=models.TicketStatus.FAILED, error=str(exc)[:500])
+                db.commit()
+                if failed:
+                    self._emit(f"intake_ticket:{ticket_id}:failed")
+                return
+            db.refresh(db_incident)
+            intake.index_incidents([db_incident])
+        finally:
+            db.close()
+        self._emit("refresh_incidents")
+        if alert_created:
+            self._emit("refresh_alerts")
+        self._emit(f"intake_ticket:{ticket_id}:done")
+
+
+# Singleton instance
+settings = get_settings()
+intake_workers = IntakeWorkerPool(settings.intake_workers, settings.intake_lease_seconds)
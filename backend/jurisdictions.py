@@ -0,0 +1,121 @@
+"""
+Point-in-polygon jurisdiction index over the district base layers.
+
+District polygons (or their bboxes when no polygon is given) are bucketed into
+a fixed lat/lng grid at load time. Resolving a point looks up its one cell and
+ray-casts only against the polygons registered there, so a lookup costs a few
+microseconds regardless of how many districts are loaded.
+"""
+import threading
+from math import floor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .layers import BASE_LAYERS
+
+# Base layer -> incident column holding the resolved district id
+DISTRICT_LAYERS = {
+    "admin_boundaries": "admin_district",
+    "police_districts": "police_district",
+    "fire_districts": "fire_district",
+}
+
+Ring = List[Tuple[float, float]]  # (lng, lat) vertices
+
+
+def _ring(item: dict) -> Ring:
+    if "polygon" in item:
+        return [(float(lng), float(lat)) for lng, lat in item["polygon"]]
+    w, s, e, n = item["bbox"]
+    return [(w, s), (e, s), (e, n), (w, n)]
+
+
+def _area(ring: Ring) -> float:
+    return abs(sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]))) / 2.0
+
+
+def point_in_ring(lng: float, lat: float, ring: Sequence[Tuple[float, float]]) -> bool:
+    """
+    Even-odd ray casting; points on the west/south edges count as inside.
+    """
+    inside = False
+    x0, y0 = ring[-1]
+    for x1, y1 in ring:
+        if (y1 > lat) != (y0 > lat) and lng < (x0 - x1) * (lat - y1) / (y0 - y1) + x1:
+            inside = not inside
+        x0, y0 = x1, y1
+    return inside
+
+
+class _District:
+    __slots__ = ("id", "column", "ring", "bbox", "area")
+
+    def __init__(self, district_id: str, column: str, ring: Ring):
+        self.id = district_id
+        self.column = column
+        self.ring = ring
+        lngs = [p[0] for p in ring]
+        lats = [p[1] for p in ring]
+        self.bbox = (min(lngs), min(lats), max(lngs), max(lats))
+        self.area = _area(ring)
+
+    def contains(self, lng: float, lat: float) -> bool:
+        w, s, e, n = self.bbox
+        return w <= lng <= e and s <= lat <= n and point_in_ring(lng, lat, self.ring)
+
+
+class JurisdictionIndex:
+    """
+    Grid-bucketed polygon index. Where districts of one kind overlap, the
+    smallest (most specific) one wins.
+    """
+
+    def __init__(self, cell_size_deg: float = 0.01):
+        self.cell_size = cell_size_deg
+        self._cells: Dict[Tuple[int, int], List[_District]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _cell(self, lng: float, lat: float) -> Tuple[int, int]:
+        return floor(lng / self.cell_size), floor(lat / self.cell_size)
+
+    def load(self, layers: Dict[str, Iterable[dict]]) -> None:
+        """
+        Replace the index with the district layers found in `layers`.
+        """
+        cells: Dict[Tuple[int, int], List[_District]] = {}
+        count = 0
+        for layer_name, column in DISTRICT_LAYERS.items():
+            for item in layers.get(layer_name, []):
+                district = _District(item.get("id") or item["name"], column, _ring(item))
+                x0, y0 = self._cell(district.bbox[0], district.bbox[1])
+                x1, y1 = self._cell(district.bbox[2], district.bbox[3])
+                for x in range(x0, x1 + 1):
+                    for y in range(y0, y1 + 1):
+                        cells.setdefault((x, y), []).append(district)
+                count += 1
+        for bucket in cells.values():
+            bucket.sort(key=lambda d: d.area)
+        with self._lock:
+            self._cells = cells
+            self._count = count
+
+    def resolve(self, latitude: Optional[float], longitude: Optional[float]) -> Dict[str, Optional[str]]:
+        """
+        District id per incident column (None where no district contains the point).
+        """
+        result: Dict[str, Optional[str]] = dict.fromkeys(DISTRICT_LAYERS.values())
+        if latitude is None or longitude is None:
+            return result
+        for district in self._cells.get(self._cell(longitude, latitude), ()):
+            # Buckets are sorted by area, so the first hit per column is the most specific
+            if result[district.column] is None and district.contains(longitude, latitude):
+                result[district.column] = district.id
+        return result
+
+
+# Singleton instance
+jurisdictions = JurisdictionIndex()
+jurisdictions.load(BASE_LAYERS)
@@ -4,13 +4,13 @@ Static base layers for GIS overlays (stub data for MVP).
 
 BASE_LAYERS = {
     "admin_boundaries": [
-        {"name": "Addis Central", "bbox": [38.74, 8.95, 38.82, 9.05]},
+        {"id": "ADM-ADDIS-CENTRAL", "name": "Addis Central", "bbox": [38.74, 8.95, 38.82, 9.05]},
     ],
     "police_districts": [
-        {"name": "PD-1", "bbox": [38.75, 8.97, 38.80, 9.02]},
+        {"id": "PD-1", "name": "PD-1", "bbox": [38.75, 8.97, 38.80, 9.02]},
     ],
     "fire_districts": [
-        {"name": "FD-1", "bbox": [38.76, 8.98, 38.81, 9.03]},
+        {"id": "FD-1", "name": "FD-1", "bbox": [38.76, 8.98, 38.81, 9.03]},
     ],
     "hospitals": [
         {"name": "Black Lion Hospital", "lat": 9.020, "lng": 38.746},
@@ -0,0 +1,122 @@
+"""
+Versioned triage lexicon: keyword lists loaded from JSON and compiled into an
+immutable matcher snapshot. AIEngine swaps whole snapshots (copy-on-write), so
+in-flight requests keep the snapshot they started with and a reload never
+blocks them.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from .matcher import KeywordMatcher
+from .models import IncidentSeverity, IncidentType
+
+logger = logging.getLogger("aegis.lexicon")
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), "lexicon.json")
+
+
+class Lexicon:
+    """
+    Compiled keyword lists. `version` is the declared file version (or the
+    content digest when none is declared); `digest` always tracks content.
+    """
+
+    def __init__(
+        self,
+        critical_keywords: Iterable[str],
+        high_keywords: Iterable[str],
+        medium_keywords: Iterable[str],
+        type_map: Dict[IncidentType, Iterable[str]],
+        version: Optional[str] = None,
+    ):
+        self.critical_keywords = tuple(critical_keywords)
+        self.high_keywords = tuple(high_keywords)
+        self.medium_keywords = tuple(medium_keywords)
+        self.type_map = {t: tuple(k) for t, k in type_map.items()}
+        self.type_order: List[IncidentType] = list(self.type_map)
+
+        content = [self.critical_keywords, self.high_keywords, self.medium_keywords, [[t.value, k] for t, k in self.type_map.items()]]
+        self.digest = hashlib.sha1(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+        self.version = version or self.digest
+
+        patterns = [(k, IncidentSeverity.CRITICAL) for k in self.critical_keywords]
+        patterns += [(k, IncidentSeverity.HIGH) for k in self.high_keywords]
+        patterns += [(k, IncidentSeverity.MEDIUM) for k in self.medium_keywords]
+        # Type labels are ranks so the first matching entry in file order wins
+        for rank, keywords in enumerate(self.type_map.values()):
+            patterns += [(k, rank) for k in keywords]
+        self.matcher = KeywordMatcher(patterns)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Lexicon":
+        severity = data.get("severity") or {}
+        type_map = {}
+        for entry in data.get("types") or []:
+            try:
+                incident_type = IncidentType(entry["type"])
+            except (KeyError, ValueError):
+                raise ValueError(f"Unknown incident type in lexicon: {entry.get('type')!r}")
+            type_map[incident_type] = [k.lower() for k in entry.get("keywords", [])]
+        version = data.get("version")
+        return cls(
+            [k.lower() for k in severity.get("critical", [])],
+            [k.lower() for k in severity.get("high", [])],
+            [k.lower() for k in severity.get("medium", [])],
+            type_map,
+            str(version) if version is not None else None,
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "Lexicon":
+        with open(path, encoding="utf-8") as fh:
+            return cls.from_dict(json.load(fh))
+
+
+class LexiconWatcher:
+    """
+    Polls the lexicon file and hot-swaps the engine's snapshot when it changes.
+    A file that fails to parse is logged and the current lexicon stays live.
+    """
+
+    def __init__(self, engine, interval_seconds: float):
+        self.engine = engine
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._mtime: Optional[float] = None
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.engine.lexicon_path).st_mtime
+        except OSError:
+            return None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._mtime = self._current_mtime()
+        self._thread = threading.Thread(target=self._run, name="lexicon-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            mtime = self._current_mtime()
+            if mtime is None or mtime == self._mtime:
+                continue
+            self._mtime = mtime
+            try:
+                if self.engine.reload():
+                    logger.info("Triage lexicon reloaded: version %s", self.engine.lexicon_version)
+            except Exception:
+                logger.exception("Failed to reload triage lexicon from %s", self.engine.lexicon_path)
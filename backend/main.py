@@ -1,11 +1,13 @@
+import asyncio
 import logging
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, BackgroundTasks, Request, Response, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from sqlalchemy import func, text
-from typing import List
-from datetime import timedelta, datetime
+from typing import List, Optional, Union
+from datetime import timedelta, datetime, timezone
 
 from . import models, schemas, database, auth
 from .ai_engine import ai_engine
@@ -14,7 +16,6 @@ from .rbac import admin_roles, dispatcher_roles, require_roles
 from .layers import BASE_LAYERS
 from .predictions import forecast
 from .database import SQLALCHEMY_DATABASE_URL
-from .routing import haversine
 from . import models, schemas, database, auth
 from .ai_engine import ai_engine
 from .config import get_settings
@@ -22,8 +23,24 @@ from .rbac import admin_roles, dispatcher_roles, require_roles
 from .layers import BASE_LAYERS
 from .database import SQLALCHEMY_DATABASE_URL
 from .routers import routing as routing_router
-from .routing import suggest_agencies, suggest_unit_type, build_routing_rationale
-from math import radians, sin, cos, sqrt, atan2
+from .routers import tiles as tiles_router
+from .dedup import recent_incidents
+from .spatial_index import incident_points, hydrate
+from .clusters import incident_clusters
+from .vector_tiles import tile_cache
+from .heatmap import BUCKET_SECONDS, incident_heatmap
+from .timeutil import as_utc
+from .geofences import geofences
+from .telemetry import TelemetryFlusher, unit_positions
+from .tracks import unit_tracks
+from .coverage import CoverageWorker, coverage_index
+from .road_graph import load_configured_graph, road_router
+from . import intake
+from .intake_queue import intake_workers, create_ticket
+from .idempotency import idempotency_store
+from .classifier import ClassifierPool
+from .lexicon import LexiconWatcher
+from . import retriage
 from .routers import routing as routing_router
 
 settings = get_settings()
@@ -42,6 +59,106 @@ app = FastAPI(
     version="1.0.0"
 )
 app.include_router(routing_router.router)
+app.include_router(tiles_router.router)
+
+
+@app.on_event("startup")
+def load_road_graph():
+    load_configured_graph(road_router, settings.road_graph_path)
+
+
+@app.on_event("startup")
+def warm_indexes():
+    # Rebuild in-memory intake indexes from the database
+    db = database.SessionLocal()
+    try:
+        recent_incidents.rebuild(db)
+        if not models.IS_POSTGRES:
+            incident_points.rebuild(db)
+        incident_clusters.rebuild(db)
+        incident_heatmap.rebuild(db)
+        geofences.rebuild(db)
+        unit_positions.rebuild(db)  # also reloads idle_units
+    finally:
+        db.close()
+
+
+telemetry_flusher = TelemetryFlusher([unit_positions, unit_tracks], database.SessionLocal, settings.telemetry_flush_seconds)
+
+
+@app.on_event("startup")
+def start_telemetry_flusher():
+    telemetry_flusher.start()
+
+
+@app.on_event("shutdown")
+def stop_telemetry_flusher():
+    telemetry_flusher.stop()
+
+
+coverage_worker = CoverageWorker(coverage_index, settings.coverage_refresh_seconds)
+
+
+@app.on_event("startup")
+def start_coverage_worker():
+    coverage_worker.start()
+
+
+@app.on_event("shutdown")
+def stop_coverage_worker():
+    coverage_worker.stop()
+
+
+@app.on_event("startup")
+async def start_intake_workers():
+    loop = asyncio.get_running_loop()
+    intake_workers.start(lambda message: asyncio.run_coroutine_threadsafe(manager.broadcast(message), loop))
+
+
+@app.on_event("shutdown")
+def stop_intake_workers():
+    intake_workers.stop()
+
+
+lexicon_watcher = LexiconWatcher(ai_engine, settings.lexicon_reload_seconds)
+
+
+@app.on_event("startup")
+def start_lexicon_watcher():
+    lexicon_watcher.start()
+
+
+@app.on_event("shutdown")
+def stop_lexicon_watcher():
+    lexicon_watcher.stop()
+
+
+@app.on_event("startup")
+def start_classifier():
+    if not settings.classifier_model_path:
+        return
+    try:
+        pool = ClassifierPool(
+            settings.classifier_model_path, settings.classifier_workers, settings.classifier_budget_ms, settings.classifier_batch_workers,
+        )
+        pool.start()
+    except Exception:
+        logger.exception("Classifier model unavailable, using keyword triage")
+        return
+    ai_engine.use_classifier(pool)
+    logger.info("Triage classifier %s loaded", ai_engine.model_version)
+
+
+@app.on_event("shutdown")
+def stop_retriage():
+    retriage.retriage_runner.stop()
+
+
+@app.on_event("shutdown")
+def stop_classifier():
+    if ai_engine.classifier is not None:
+        ai_engine.classifier.stop()
+        ai_engine.use_classifier(None)
 
 # --- WebSocket Manager ---
 class ConnectionManager:
@@ -149,8 +266,55 @@ def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
 
 @app.get("/units/", response_model=List[schemas.UnitResponse])
 def read_units(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    units = db.query(models.Unit).offset(skip).limit(limit).all()
-    return units
+    # Served from the position store, which holds telemetry not yet flushed to the table
+    unit_positions.sync(db)
+    return unit_positions.list(skip, limit)
+
+TELEMETRY_BATCH_MAX = 5000
+
+@app.post("/units/telemetry", response_model=schemas.TelemetryResult)
+def ingest_telemetry(batch: schemas.TelemetryBatch, db: Session = Depends(get_db), current_user: models.User = Depends(require_roles(dispatcher_roles))):
+    if len(batch.fixes) > TELEMETRY_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {TELEMETRY_BATCH_MAX} fixes per batch")
+    if any(unit_positions.get(fix.unit_id) is None for fix in batch.fixes):
+        # Units created by another process since the last sync
+        unit_positions.sync(db)
+    result = unit_positions.record((fix.unit_id, fix.latitude, fix.longitude, fix.recorded_at) for fix in batch.fixes)
+    # Out-of-order fixes are stale for the latest position but still belong in the track
+    now = datetime.now(timezone.utc).timestamp()
+    unit_tracks.append(
+        (fix.unit_id, fix.latitude, fix.longitude, min(fix.recorded_at.timestamp(), now) if fix.recorded_at else now)
+        for fix in batch.fixes if unit_positions.get(fix.unit_id) is not None
+    )
+    return result
+
+@app.get("/units/telemetry/stats")
+def telemetry_stats():
+    return {**unit_positions.stats(), "track_points_buffered": unit_tracks.pending()}
+
+TRACK_QUERY_MAX_HOURS = 24 * 7
+
+@app.get("/units/{unit_id}/track", response_model=schemas.UnitTrackResponse)
+def read_unit_track(unit_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None, db: Session = Depends(get_db), current_user: models.User = Depends(require_roles(dispatcher_roles))):
+    if not db.query(models.Unit.id).filter(models.Unit.id == unit_id).first():
+        raise HTTPException(status_code=404, detail="Unit not found")
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(hours=1)
+    start, end = as_utc(start), as_utc(end)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > timedelta(hours=TRACK_QUERY_MAX_HOURS):
+        raise HTTPException(status_code=400, detail=f"At most {TRACK_QUERY_MAX_HOURS} hours per track query")
+    points = unit_tracks.query(db, unit_id, start.timestamp(), end.timestamp())
+    return {
+        "unit_id": unit_id,
+        "start": start,
+        "end": end,
+        "points": [
+            {"recorded_at": datetime.fromtimestamp(t, timezone.utc), "latitude": lat, "longitude": lng}
+            for t, lat, lng in points
+        ],
+    }
 
 @app.post("/units/", response_model=schemas.UnitResponse)
 def create_unit(unit: schemas.UnitCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_active_admin)):
@@ -158,6 +322,7 @@ def create_unit(unit: schemas.UnitCreate, db: Session = Depends(get_db), current
     db.add(db_unit)
     db.commit()
     db.refresh(db_unit)
+    unit_positions.update_unit(db_unit)
     return db_unit
 
 @app.patch("/units/{unit_id}", response_model=schemas.UnitResponse)
@@ -176,138 +341,172 @@ def update_unit(unit_id: int, unit_update: schemas.UnitUpdate, db: Session = Dep
     
     db.commit()
     db.refresh(db_unit)
+    position_changed = "latitude" in update_data or "longitude" in update_data
+    unit_positions.update_unit(db_unit, position_changed=position_changed)
+    if position_changed and db_unit.latitude is not None and db_unit.longitude is not None:
+        unit_tracks.append([(db_unit.id, db_unit.latitude, db_unit.longitude, datetime.now(timezone.utc).timestamp())])
     return db_unit
 
 # --- Incident Endpoints ---
 
 @app.post("/incidents/", response_model=schemas.IncidentResponse)
-def create_incident(incident: schemas.IncidentCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user_optional)):
-    # Determine reporter ID
-    if current_user:
-        reporter_id = current_user.id
-    else:
-        # Fallback to "citizen_zero" for anonymous reports
-        citizen_zero = db.query(models.User).filter(models.User.username == "citizen_zero").first()
-        if not citizen_zero:
-             # Create citizen_zero if not exists
-            citizen_zero = models.User(username="citizen_zero", email="anonymous@aegis.et", hashed_password="hash", role=models.UserRole.CITIZEN)
-            db.add(citizen_zero)
-            db.commit()
-            db.refresh(citizen_zero)
-        reporter_id = citizen_zero.id
-
-    # Determine source based on caller
-    source = incident.source
-    if current_user:
-        if current_user.role in admin_roles:
-            source = models.IncidentSource.OPS_CENTER
-        elif current_user.role in [
-            models.UserRole.POLICE,
-            models.UserRole.FIRE,
-            models.UserRole.MEDICAL,
-            models.UserRole.TRAFFIC,
-            models.UserRole.DISASTER,
-            models.UserRole.MILITARY,
-        ]:
-            source = models.IncidentSource.RESPONDER
-        elif current_user.role == models.UserRole.VERIFIER:
-            source = models.IncidentSource.OPS_CENTER
-        else:
-            source = models.IncidentSource.CITIZEN
-    else:
-        source = models.IncidentSource.CITIZEN
+def create_incident(
+    incident: schemas.IncidentCreate,
+    background_tasks: BackgroundTasks,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user_optional),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    # Offline clients replay reports on reconnect; a known key returns the stored response
+    if idempotency_key is not None:
+        record_id = idempotency_store.record_id(idempotency_key, request, current_user)
+        request_hash = idempotency_store.request_hash(incident)
+        stored = idempotency_store.lookup(db, record_id, request_hash)
+        if stored:
+            return idempotency_store.replay(stored)
 
-    # --- AI Triage Engine ---
-    # Analyze the text to determine severity and type automatically
-    ai_result = ai_engine.analyze(f"{incident.title} {incident.description}")
-    
-    # Prepare data for DB
-    incident_data = incident.model_dump()
-    
-    # Apply AI Severity (Always trust AI for risk assessment in this MVP)
-    incident_data['severity'] = ai_result['severity']
-    incident_data['ai_confidence'] = ai_result.get('confidence', 0.0)
-    incident_data['escalation_probability'] = ai_result.get('escalation_probability', 0.0)
-    incident_data['spread_risk'] = ai_result.get('spread_risk', 0.0)
-    incident_data['casualty_likelihood'] = ai_result.get('casualty_likelihood', 0.0)
-    incident_data['crowd_size_estimate'] = ai_result.get('crowd_size_estimate', 0)
-    # Simple spatial risk index heuristic
-    incident_data['spatial_risk_index'] = (
-        0.4 * (incident_data['escalation_probability'] or 0)
-        + 0.3 * (incident_data['spread_risk'] or 0)
-        + 0.3 * (incident_data['casualty_likelihood'] or 0)
-    )
+    # Determine reporter ID
+    reporter_id = current_user.id if current_user else intake.anonymous_reporter_id(db)
 
-    # Routing suggestions
-    suggested_roles = suggest_agencies(incident_data['incident_type'], incident_data['severity'])
-    suggested_unit = suggest_unit_type(incident_data['incident_type'])
-    incident_data['suggested_agencies'] = [r.value for r in suggested_roles]
-    incident_data['suggested_unit_type'] = suggested_unit.value
-
-    # Apply AI Type if the user selected "Other" or if we want to auto-classify
-    # For now, let's prioritize the AI's classification if it found something specific
-    if ai_result['incident_type'] != models.IncidentType.OTHER:
-        incident_data['incident_type'] = ai_result['incident_type']
-
-    incident_data["source"] = source
-
-    # --- Basic deduping: find recent incidents within ~0.5 km with similar title ---
-    def nearby_duplicates():
-        candidates = db.query(models.Incident).filter(
-            models.Incident.created_at >= datetime.utcnow() - timedelta(hours=2)
-        ).all()
-        for cand in candidates:
-            # Rough distance calc (not accurate for production; placeholder)
-            dx = cand.latitude - incident.latitude
-            dy = cand.longitude - incident.longitude
-            dist = (dx * dx + dy * dy) ** 0.5
-            if dist < 0.005 and cand.title.lower() == incident.title.lower():
-                return cand
-        return None
-
-    potential_dup = nearby_duplicates()
-    if potential_dup:
-        incident_data["potential_duplicate_id"] = potential_dup.id
-
-    db_incident = models.Incident(
-        **incident_data,
-        reporter_id=reporter_id,
-        status=models.IncidentStatus.PENDING
-    )
-    db_incident.routing_rationale = build_routing_rationale(db_incident, suggested_roles, suggested_unit)
-    # Set geometry for Postgres; store WKT for others
-    try:
-        if "postgresql" in SQLALCHEMY_DATABASE_URL:
-            db_incident.geometry = f"SRID=4326;POINT({incident.longitude} {incident.latitude})"
-        else:
-            db_incident.geometry = f"POINT({incident.longitude} {incident.latitude})"
-    except Exception:
-        pass
-    db.add(db_incident)
-    db.commit()
-    db.refresh(db_incident)
+    if idempotency_key is None:
+        db_incident, alert_created = intake.create_incident_record(db, incident, reporter_id, intake.resolve_source(current_user))
+    else:
+        db_incident, alert_created = intake.create_incident_record(db, incident, reporter_id, intake.resolve_source(current_user), commit=False)
+        stored = idempotency_store.commit(db, record_id, request_hash, db_incident, schemas.IncidentResponse)
+        if stored:
+            return idempotency_store.replay(stored)
+        db.refresh(db_incident)
+        intake.index_incidents([db_incident])
 
     # Broadcast update
     background_tasks.add_task(manager.broadcast, "refresh_incidents")
-
-    # --- Automated Alerting Logic ---
-    # If severity is HIGH or CRITICAL, generate a system-wide alert
-    if db_incident.severity in [models.IncidentSeverity.HIGH, models.IncidentSeverity.CRITICAL]:
-        alert = models.Alert(
-            title=f"NEW {db_incident.severity.value.upper()} THREAT",
-            message=f"{db_incident.incident_type.value.title()} reported at {db_incident.title}. Immediate attention required.",
-            severity=db_incident.severity,
-            incident_id=db_incident.id
-        )
-        db.add(alert)
-        db.commit()
+    if alert_created:
         background_tasks.add_task(manager.broadcast, "refresh_alerts")
 
     return db_incident
 
+@app.post("/incidents/async", response_model=schemas.IntakeTicketResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_incident_async(incident: schemas.IncidentCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user_optional)):
+    """
+    Opt-in write-behind intake: persist the raw report and return a ticket;
+    triage, dedup and alerting run on the intake worker pool.
+    """
+    ticket = create_ticket(db, incident, current_user.id if current_user else None, intake.resolve_source(current_user))
+    intake_workers.submit(ticket.id)
+    return ticket
+
+@app.get("/incidents/tickets/{ticket_id}", response_model=schemas.IntakeTicketResponse)
+def read_intake_ticket(ticket_id: str, db: Session = Depends(get_db)):
+    ticket = db.query(models.IntakeTicket).filter(models.IntakeTicket.id == ticket_id).first()
+    if not ticket:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return ticket
+
+@app.post("/incidents/bulk", response_model=schemas.BulkIncidentResponse)
+def create_incidents_bulk(items: List[schemas.IncidentCreate], background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+    # Sensor/weather gateways and ops tooling only
+    if current_user.role not in admin_roles:
+        raise HTTPException(status_code=403, detail="Not authorized for bulk ingestion")
+    if len(items) > intake.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {intake.BULK_MAX_ITEMS} incidents per request")
+
+    results, alerts_created = intake.bulk_create_incidents(db, items, current_user.id)
+
+    # One coalesced broadcast for the whole batch
+    if results:
+        background_tasks.add_task(manager.broadcast, "refresh_incidents")
+    if alerts_created:
+        background_tasks.add_task(manager.broadcast, "refresh_alerts")
+    return {"created": len(results), "alerts_created": alerts_created, "results": results}
+
+@app.post("/incidents/stream", response_model=schemas.StreamIntakeSummary)
+async def create_incidents_stream(request: Request, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+    """
+    Chunked NDJSON intake (one IncidentCreate per line) for continuous feeds.
+    Items are flushed through the bulk pipeline in micro-batches by size or
+    age; the body is not read while a flush runs, so a slow DB pushes back on
+    the sender through TCP flow control.
+    """
+    if current_user.role not in admin_roles:
+        raise HTTPException(status_code=403, detail="Not authorized for bulk ingestion")
+
+    loop = asyncio.get_running_loop()
+    decoder = intake.NDJSONDecoder()
+    batch: List[schemas.IncidentCreate] = []
+    batch_started = None
+    summary = {"received": 0, "created": 0, "rejected": 0, "alerts_created": 0, "batches": 0, "errors": []}
+
+    async def flush():
+        nonlocal batch, batch_started
+        if not batch:
+            return
+        items, batch, batch_started = batch, [], None
+        results, alerts_created = await run_in_threadpool(intake.bulk_create_incidents, db, items, current_user.id)
+        summary["created"] += len(results)
+        summary["alerts_created"] += alerts_created
+        summary["batches"] += 1
+        await manager.broadcast("refresh_incidents")
+        if alerts_created:
+            await manager.broadcast("refresh_alerts")
+
+    async def handle(lines):
+        nonlocal batch_started
+        for line_no, line in lines:
+            summary["received"] += 1
+            try:
+                item = intake.parse_ndjson_item(line)
+            except ValueError as exc:
+                summary["rejected"] += 1
+                if len(summary["errors"]) < intake.STREAM_MAX_ERRORS:
+                    summary["errors"].append({"line": line_no, "error": str(exc)})
+                continue
+            if batch_started is None:
+                batch_started = loop.time()
+            batch.append(item)
+            if len(batch) >= intake.STREAM_BATCH_SIZE:
+                await flush()
+
+    chunks = request.stream().__aiter__()
+    next_chunk = asyncio.ensure_future(chunks.__anext__())
+    while True:
+        timeout = None if batch_started is None else max(0.0, batch_started + intake.STREAM_FLUSH_SECONDS - loop.time())
+        done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+        if not done:
+            # Time-based flush while the producer is quiet
+            await flush()
+            continue
+        try:
+            chunk = next_chunk.result()
+        except StopAsyncIteration:
+            break
+        await handle(decoder.feed(chunk))
+        next_chunk = asyncio.ensure_future(chunks.__anext__())
+    await handle(decoder.close())
+    await flush()
+    return summary
+
 @app.get("/incidents/", response_model=List[schemas.IncidentResponse])
-def read_incidents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    incidents = db.query(models.Incident).offset(skip).limit(limit).all()
+def read_incidents(
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[models.IncidentStatus] = None,
+    admin_district: Optional[str] = None,
+    police_district: Optional[str] = None,
+    fire_district: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    query = db.query(models.Incident)
+    # Per-district queues are served by the indexed district columns
+    if status is not None:
+        query = query.filter(models.Incident.status == status)
+    if admin_district is not None:
+        query = query.filter(models.Incident.admin_district == admin_district)
+    if police_district is not None:
+        query = query.filter(models.Incident.police_district == police_district)
+    if fire_district is not None:
+        query = query.filter(models.Incident.fire_district == fire_district)
+    incidents = query.offset(skip).limit(limit).all()
     return incidents
 
 @app.get("/incidents/near", response_model=List[schemas.IncidentResponse])
@@ -318,26 +517,42 @@ def incidents_near(lat: float, lng: float, radius_km: float = 5.0, db: Session =
         ).params(lat=lat, lng=lng, meters=radius_km * 1000)
         return query.all()
     else:
-        # Fallback: rough haversine approximation
-        def haversine(lat1, lon1, lat2, lon2):
-            from math import radians, sin, cos, sqrt, atan2
-            R = 6371.0
-            dlat = radians(lat2 - lat1)
-            dlon = radians(lon2 - lon1)
-            a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-            return R * c
-        all_incidents = db.query(models.Incident).all()
-        return [i for i in all_incidents if haversine(lat, lng, i.latitude, i.longitude) <= radius_km]
-
-@app.get("/incidents/bbox", response_model=List[schemas.IncidentResponse])
-def incidents_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float, db: Session = Depends(get_db)):
+        # Fallback: in-memory grid index, hydrating only the matches
+        incident_points.sync(db)
+        return hydrate(db, incident_points.within(lat, lng, radius_km))
+
+@app.get("/incidents/nearest", response_model=List[schemas.IncidentResponse])
+def incidents_nearest(lat: float, lng: float, k: int = 5, db: Session = Depends(get_db)):
+    if k < 1 or k > 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    if "postgresql" in SQLALCHEMY_DATABASE_URL:
+        # KNN ordering served by the GiST index on geometry
+        return db.query(models.Incident).order_by(
+            text("geometry <-> ST_SetSRID(ST_MakePoint(:lng, :lat), 4326)")
+        ).params(lat=lat, lng=lng).limit(k).all()
+    incident_points.sync(db)
+    return hydrate(db, incident_points.nearest(lat, lng, k))
+
+@app.get("/incidents/bbox", response_model=Union[List[schemas.IncidentResponse], schemas.ClusteredBBoxResponse])
+def incidents_bbox(min_lat: float, min_lng: float, max_lat: float, max_lng: float, zoom: Optional[int] = None, db: Session = Depends(get_db)):
+    if zoom is not None and zoom < 0:
+        raise HTTPException(status_code=400, detail="zoom must be >= 0")
+    if zoom is not None and zoom <= incident_clusters.max_zoom:
+        # Coarse zoom: aggregates from the cluster index, no incident rows loaded
+        incident_clusters.sync(db)
+        return schemas.ClusteredBBoxResponse(
+            zoom=zoom,
+            clustered=True,
+            clusters=incident_clusters.clusters(min_lat, min_lng, max_lat, max_lng, zoom),
+        )
     incidents = db.query(models.Incident).filter(
         models.Incident.latitude >= min_lat,
         models.Incident.latitude <= max_lat,
         models.Incident.longitude >= min_lng,
         models.Incident.longitude <= max_lng
     ).all()
+    if zoom is not None:
+        return schemas.ClusteredBBoxResponse(zoom=zoom, clustered=False, incidents=incidents)
     return incidents
 
 @app.patch("/incidents/{incident_id}", response_model=schemas.IncidentResponse)
@@ -377,6 +592,7 @@ def update_incident_status(incident_id: int, status: models.IncidentStatus, back
         )
     
     incident.status = status
+    changed_units = []
     
     # Handle Unit Assignment
     if unit_id:
@@ -389,6 +605,7 @@ def update_incident_status(incident_id: int, status: models.IncidentStatus, back
         
         # Update unit status to BUSY
         unit.status = models.UnitStatus.BUSY
+        changed_units.append(unit)
         
         # If status is DISPATCHED, ensure we save that too
         if status == models.IncidentStatus.DISPATCHED:
@@ -410,10 +627,16 @@ def update_incident_status(incident_id: int, status: models.IncidentStatus, back
         unit = db.query(models.Unit).filter(models.Unit.id == incident.assigned_unit_id).first()
         if unit:
             unit.status = models.UnitStatus.IDLE
+            changed_units.append(unit)
             # We keep the record of who was assigned, but they are now free
 
     db.commit()
     db.refresh(incident)
+    for changed in changed_units:
+        unit_positions.update_unit(changed, position_changed=False)
+    if status in [models.IncidentStatus.RESOLVED, models.IncidentStatus.FALSE_ALARM]:
+        recent_incidents.remove(incident.id)
+    tile_cache.invalidate_point(incident.latitude, incident.longitude)
     background_tasks.add_task(manager.broadcast, "refresh_incidents")
     background_tasks.add_task(manager.broadcast, "refresh_units")
     return incident
@@ -446,6 +669,8 @@ def merge_incident(incident_id: int, target_incident_id: int, db: Session = Depe
     incident.status = models.IncidentStatus.FALSE_ALARM
     db.commit()
     db.refresh(incident)
+    recent_incidents.remove(incident.id)
+    tile_cache.invalidate_point(incident.latitude, incident.longitude)
     return incident
 
 @app.get("/alerts/", response_model=List[schemas.AlertResponse])
@@ -463,6 +688,7 @@ def create_alert(alert: schemas.AlertCreate, background_tasks: BackgroundTasks,
     db.add(db_alert)
     db.commit()
     db.refresh(db_alert)
+    geofences.add_alert(db_alert)
     background_tasks.add_task(manager.broadcast, "refresh_alerts")
     return db_alert
 
@@ -500,21 +726,59 @@ def create_proximity_alert(incident_id: int = None, lat: float = None, lng: floa
     db.add(db_alert)
     db.commit()
     db.refresh(db_alert)
+    geofences.add_alert(db_alert)
     if background_tasks:
         background_tasks.add_task(manager.broadcast, "refresh_alerts")
     return db_alert
 
+# --- Geofences ---
+
+@app.get("/geofences/match", response_model=List[schemas.GeofenceMatch])
+def match_geofences(lat: float, lng: float, db: Session = Depends(get_db)):
+    geofences.sync(db)
+    return geofences.match(lat, lng)
+
+@app.get("/geofences/hits", response_model=List[schemas.GeofenceHitResponse])
+def read_geofence_hits(fence_kind: str, fence_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    return db.query(models.GeofenceHit).filter(
+        models.GeofenceHit.fence_id == fence_id,
+        models.GeofenceHit.fence_kind == fence_kind,
+    ).order_by(models.GeofenceHit.id.desc()).offset(skip).limit(limit).all()
+
+@app.get("/incidents/{incident_id}/geofences", response_model=List[schemas.GeofenceHitResponse])
+def read_incident_geofences(incident_id: int, db: Session = Depends(get_db)):
+    return db.query(models.GeofenceHit).filter(models.GeofenceHit.incident_id == incident_id).order_by(models.GeofenceHit.distance_km).all()
+
 # --- Comment Endpoints ---
 
 @app.post("/incidents/{incident_id}/comments/", response_model=schemas.CommentResponse)
-def create_comment(incident_id: int, comment: schemas.CommentCreate, db: Session = Depends(get_db), current_user: models.User = Depends(auth.get_current_user)):
+def create_comment(
+    incident_id: int,
+    comment: schemas.CommentCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    if idempotency_key is not None:
+        record_id = idempotency_store.record_id(idempotency_key, request, current_user)
+        request_hash = idempotency_store.request_hash(comment)
+        stored = idempotency_store.lookup(db, record_id, request_hash)
+        if stored:
+            return idempotency_store.replay(stored)
+
     db_comment = models.Comment(
         **comment.model_dump(),
         incident_id=incident_id,
         user_id=current_user.id
     )
     db.add(db_comment)
-    db.commit()
+    if idempotency_key is not None:
+        stored = idempotency_store.commit(db, record_id, request_hash, db_comment, schemas.CommentResponse)
+        if stored:
+            return idempotency_store.replay(stored)
+    else:
+        db.commit()
     db.refresh(db_comment)
     return db_comment
 
@@ -592,6 +856,8 @@ def create_annotation(annotation: schemas.AnnotationCreate, db: Session = Depend
     db.add(db_ann)
     db.commit()
     db.refresh(db_ann)
+    tile_cache.invalidate_point(db_ann.latitude, db_ann.longitude)
+    geofences.add_annotation(db_ann)
     return db_ann
 
 @app.get("/annotations/", response_model=List[schemas.AnnotationResponse])
@@ -603,6 +869,64 @@ def read_comments(incident_id: int, db: Session = Depends(get_db)):
     comments = db.query(models.Comment).filter(models.Comment.incident_id == incident_id).order_by(models.Comment.created_at.desc()).all()
     return comments
 
+# --- Triage ---
+
+@app.get("/triage/stats")
+def triage_stats(current_user: models.User = Depends(require_roles(admin_roles))):
+    return {
+        "lexicon_version": ai_engine.lexicon_version,
+        "classifier": ai_engine.model_version or None,
+        "classifier_budget_ms": ai_engine.classifier.budget_ms if ai_engine.classifier else None,
+        "cache": ai_engine.cache.stats(),
+        **ai_engine.metrics.stats(),
+    }
+
+@app.post("/triage/lexicon/reload")
+def reload_lexicon(current_user: models.User = Depends(require_roles(admin_roles))):
+    """
+    Recompile the lexicon file now instead of waiting for the watcher.
+    """
+    try:
+        reloaded = ai_engine.reload()
+    except (OSError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=f"Lexicon not reloaded: {exc}")
+    return {"reloaded": reloaded, "lexicon_version": ai_engine.lexicon_version}
+
+@app.post("/triage/backfill", response_model=schemas.BackfillJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def start_retriage_backfill(
+    stale_only: bool = False,
+    chunk_size: int = retriage.DEFAULT_CHUNK_SIZE,
+    sleep_ms: float = retriage.DEFAULT_SLEEP_MS,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(require_roles(admin_roles)),
+):
+    """
+    Start (or resume the latest unfinished or failed) re-triage backfill in
+    the background. A resumed job keeps its own stale_only setting.
+    """
+    if retriage.retriage_runner.running:
+        raise HTTPException(status_code=409, detail="A re-triage backfill is already running")
+    if chunk_size < 1 or chunk_size > 5000:
+        raise HTTPException(status_code=400, detail="chunk_size must be between 1 and 5000")
+    job = retriage.latest_unfinished_job(db)
+    if job is None:
+        job = retriage.create_job(db, stale_only)
+        retriage.retriage_runner.start(job.id, chunk_size, sleep_ms)
+        return job
+    detail = f"Resumed {job.status.value} job {job.id} after id {job.last_id}"
+    if bool(job.stale_only) != stale_only:
+        detail += f"; stale_only={bool(job.stale_only)} from the job applies, not the requested {stale_only}"
+    response = schemas.BackfillJobResponse.model_validate(job).model_copy(update={"resumed": True, "detail": detail})
+    retriage.retriage_runner.start(job.id, chunk_size, sleep_ms)
+    return response
+
+@app.get("/triage/backfill/{job_id}", response_model=schemas.BackfillJobResponse)
+def read_retriage_backfill(job_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(require_roles(admin_roles))):
+    job = db.query(models.BackfillJob).filter(models.BackfillJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return job
+
 # --- Analytics Endpoints ---
 
 @app.get("/analytics/stats")
@@ -648,6 +972,44 @@ def get_stats(db: Session = Depends(get_db)):
         "avg_resolution_minutes": avg_resolution,
     }
 
+@app.get("/analytics/heatmap")
+def analytics_heatmap(
+    min_lat: float,
+    min_lng: float,
+    max_lat: float,
+    max_lng: float,
+    zoom: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    if zoom < 0:
+        raise HTTPException(status_code=400, detail="zoom must be >= 0")
+    if start and end and start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    incident_heatmap.sync(db)
+    level, cells = incident_heatmap.cells(min_lat, min_lng, max_lat, max_lng, zoom, start, end)
+    return {
+        "zoom": level,
+        "bucket_seconds": BUCKET_SECONDS,
+        "max_count": max((c["count"] for c in cells), default=0),
+        "max_risk_sum": max((c["risk_sum"] for c in cells), default=0.0),
+        "cells": cells,
+    }
+
+@app.get("/analytics/districts")
+def analytics_districts(kind: str = "police", db: Session = Depends(get_db)):
+    column = getattr(models.Incident, f"{kind}_district", None) if kind in ("admin", "police", "fire") else None
+    if column is None:
+        raise HTTPException(status_code=400, detail="kind must be admin, police or fire")
+    rows = db.query(column, models.Incident.status, func.count(models.Incident.id)).group_by(column, models.Incident.status).all()
+    districts: dict = {}
+    for district, incident_status, count in rows:
+        entry = districts.setdefault(district, {"district": district, "total": 0, "by_status": {}})
+        entry["total"] += count
+        entry["by_status"][incident_status] = count
+    return {"kind": kind, "districts": sorted(districts.values(), key=lambda d: (d["district"] is None, d["district"] or ""))}
+
 @app.get("/analytics/export")
 def export_incidents_csv(db: Session = Depends(get_db)):
     incidents = db.query(models.Incident).all()
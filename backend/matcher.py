@@ -0,0 +1,67 @@
+"""
+Aho-Corasick multi-pattern matcher for keyword triage.
+
+Patterns are compiled once into a deterministic automaton; matching walks the
+text a single time and reports every label whose pattern occurs as a substring,
+which is the same answer as running `pattern in text` for each pattern.
+"""
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """
+    Compiled set of (pattern, label) pairs. Several patterns may share a label
+    and one pattern may carry several labels.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Hashable]]):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Set[Hashable]] = [set()]
+        for pattern, label in patterns:
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(label)
+
+        # Breadth-first failure links, folding each state's fallback
+        # transitions and outputs in so matching never has to backtrack.
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])]
+        delta.extend({} for _ in range(len(goto) - 1))
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            outputs[state] |= outputs[fail[state]]
+            transitions = dict(delta[fail[state]])
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0) if state else 0
+                transitions[ch] = nxt
+                queue.append(nxt)
+            delta[state] = transitions
+
+        self._delta = delta
+        self._outputs: List[FrozenSet[Hashable]] = [frozenset(o) for o in outputs]
+
+    def find(self, text: str) -> Set[Hashable]:
+        """
+        Labels of every pattern occurring in text (case-sensitive).
+        """
+        delta = self._delta
+        outputs = self._outputs
+        hits: Set[Hashable] = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                hits |= outputs[state]
+        return hits
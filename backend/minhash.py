@@ -0,0 +1,145 @@
+"""
+MinHash signatures and an LSH band index for near-duplicate report text.
+
+Text is normalized (NFKC, lowercase, punctuation and common English stopwords
+stripped) and split into character shingles: 3-grams for Latin script, 2-grams
+when Ethiopic (Ge'ez) script is present since each character is a syllable.
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+NUM_PERM = 32
+LSH_BANDS = 16  # 2 rows per band: candidates from ~0.25 Jaccard upward
+LATIN_SHINGLE = 3
+ETHIOPIC_SHINGLE = 2
+DENSIFY_OFFSET = 1 << 60
+
+_ETHIOPIC = re.compile(r"[\u1200-\u139f\u2d80-\u2ddf\uab00-\uab2f]")
+STOPWORDS = {"a", "an", "the", "at", "in", "on", "of", "near", "by", "to", "and", "is", "there", "around"}
+
+Signature = Tuple[int, ...]
+
+
+def normalize_text(text: Optional[str]) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = "".join(c if c.isalnum() else " " for c in text)
+    return " ".join(w for w in text.split() if w not in STOPWORDS)
+
+
+def shingles(text: Optional[str]) -> Set[str]:
+    text = normalize_text(text)
+    if not text:
+        return set()
+    k = ETHIOPIC_SHINGLE if _ETHIOPIC.search(text) else LATIN_SHINGLE
+    return {text[i:i + k] for i in range(max(1, len(text) - k + 1))}
+
+
+class MinHasher:
+    """
+    One-permutation MinHash: each shingle is hashed once and binned, with empty
+    bins filled by rotation densification. Keyed hashing keeps signatures
+    stable across processes and restarts.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        self.num_perm = num_perm
+        self._key = seed.to_bytes(8, "little")
+
+    def _hash(self, shingle: str) -> int:
+        return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8, key=self._key).digest(), "little")
+
+    def signature(self, text: Optional[str]) -> Optional[Signature]:
+        hashes = [self._hash(s) for s in shingles(text)]
+        if not hashes:
+            return None
+        k = self.num_perm
+        bins: list = [None] * k
+        for h in hashes:
+            b, v = h % k, h // k
+            if bins[b] is None or v < bins[b]:
+                bins[b] = v
+        if None in bins:
+            filled = list(bins)
+            for i in range(k):
+                if filled[i] is None:
+                    j = 1
+                    while filled[(i + j) % k] is None:
+                        j += 1
+                    bins[i] = filled[(i + j) % k] + j * DENSIFY_OFFSET
+        return tuple(bins)
+
+
+def similarity(a: Optional[Signature], b: Optional[Signature]) -> float:
+    """
+    Estimated Jaccard similarity of the underlying shingle sets.
+    """
+    if not a or not b:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class MinHashLSH:
+    """
+    Banded LSH over MinHash signatures. Buckets are optionally partitioned by a
+    scope key (e.g. a grid cell) so a query only sees entries in the scopes it
+    asks for. Not thread-safe on its own; callers hold their index lock.
+    """
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = LSH_BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: Dict[Tuple[Hashable, int, Signature], Set[Hashable]] = {}
+        self._keys: Dict[Hashable, Tuple[Hashable, Signature]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _bands(self, signature: Signature):
+        for i in range(self.bands):
+            yield i, signature[i * self.rows:(i + 1) * self.rows]
+
+    def add(self, key: Hashable, signature: Optional[Signature], scope: Hashable = None) -> None:
+        self.remove(key)
+        if not signature:
+            return
+        self._keys[key] = (scope, signature)
+        for i, band in self._bands(signature):
+            self._buckets.setdefault((scope, i, band), set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        stored = self._keys.pop(key, None)
+        if stored is None:
+            return
+        scope, signature = stored
+        for i, band in self._bands(signature):
+            bucket = self._buckets.get((scope, i, band))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[(scope, i, band)]
+
+    def signature_of(self, key: Hashable) -> Optional[Signature]:
+        stored = self._keys.get(key)
+        return stored[1] if stored else None
+
+    def query(self, signature: Optional[Signature], scopes: Iterable[Hashable] = (None,)) -> Set[Hashable]:
+        if not signature:
+            return set()
+        found: Set[Hashable] = set()
+        bands = list(self._bands(signature))
+        for scope in scopes:
+            for i, band in bands:
+                found.update(self._buckets.get((scope, i, band), ()))
+        return found
+
+    def clear(self) -> None:
+        self._buckets.clear()
+        self._keys.clear()
+
+
+# Shared hasher; signatures are only comparable when built with the same family
+minhasher = MinHasher()
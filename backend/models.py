@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -61,6 +61,17 @@ class UnitStatus(str, enum.Enum):
     BUSY = "busy"
     OFFLINE = "offline"
 
+class TicketStatus(str, enum.Enum):
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+class JobStatus(str, enum.Enum):
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
 # --- Database Models ---
 
 class User(Base):
@@ -113,6 +124,7 @@ class Incident(Base):
     flag_reason = Column(String, nullable=True)
     duplicate_of_id = Column(Integer, ForeignKey("incidents.id"), nullable=True)
     potential_duplicate_id = Column(Integer, ForeignKey("incidents.id"), nullable=True)
+    duplicate_score = Column(Float, nullable=True)  # text similarity to potential_duplicate
     
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -126,6 +138,7 @@ class Incident(Base):
     casualty_likelihood = Column(Float, nullable=True)
     crowd_size_estimate = Column(Integer, nullable=True)
     spatial_risk_index = Column(Float, nullable=True)
+    lexicon_version = Column(String, nullable=True, index=True)  # triage lexicon used, for targeted re-scoring
     
     # Foreign Keys
     reporter_id = Column(Integer, ForeignKey("users.id"))
@@ -138,6 +151,10 @@ class Incident(Base):
     suggested_unit_type = Column(String, nullable=True)
     routing_rationale = Column(String, nullable=True)
     mission_id = Column(Integer, ForeignKey("mission_threads.id"), nullable=True)
+    # Jurisdictions resolved from the district base layers at intake
+    admin_district = Column(String, nullable=True, index=True)
+    police_district = Column(String, nullable=True, index=True)
+    fire_district = Column(String, nullable=True, index=True)
     
     # Relationships
     reporter = relationship("User", back_populates="reports")
@@ -227,3 +244,73 @@ class MapAnnotation(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     created_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     mission_id = Column(Integer, ForeignKey("mission_threads.id"), nullable=True)
+
+
+class GeofenceHit(Base):
+    __tablename__ = "geofence_hits"
+
+    id = Column(Integer, primary_key=True, index=True)
+    incident_id = Column(Integer, ForeignKey("incidents.id"), nullable=False, index=True)
+    fence_kind = Column(String, nullable=False)  # alert, annotation
+    fence_id = Column(Integer, nullable=False, index=True)
+    fence_type = Column(String, nullable=True)  # annotation_type, or "alert"
+    label = Column(String, nullable=True)
+    distance_km = Column(Float, nullable=True)  # from the fence centre
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class UnitTrackChunk(Base):
+    __tablename__ = "unit_track_chunks"
+    __table_args__ = (Index("ix_unit_track_chunks_unit_hour", "unit_id", "hour"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    unit_id = Column(Integer, ForeignKey("units.id"), nullable=False)
+    hour = Column(Integer, nullable=False)  # epoch seconds // 3600
+    resolution_seconds = Column(Integer, nullable=False, default=0)  # 0 = every fix, else downsampled
+    point_count = Column(Integer, nullable=False)
+    start_ts = Column(Integer, nullable=False)  # epoch seconds of the first/last point
+    end_ts = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)  # delta + zigzag varint (second, lat e6, lng e6)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class IntakeTicket(Base):
+    __tablename__ = "intake_tickets"
+
+    id = Column(String, primary_key=True)  # uuid4 hex handed to the reporter
+    status = Column(Enum(TicketStatus), default=TicketStatus.QUEUED, index=True)
+    payload = Column(String, nullable=False)  # raw IncidentCreate JSON
+    source = Column(Enum(IncidentSource), default=IncidentSource.CITIZEN)
+    reporter_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    incident_id = Column(Integer, ForeignKey("incidents.id"), nullable=True)
+    error = Column(String, nullable=True)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)  # start of the current processing lease
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(String, primary_key=True)  # sha256 of principal, route and client key
+    request_hash = Column(String, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response = Column(String, nullable=False)  # stored response JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class BackfillJob(Base):
+    __tablename__ = "backfill_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, index=True)  # e.g. "retriage"
+    status = Column(Enum(JobStatus), default=JobStatus.RUNNING, index=True)
+    stale_only = Column(Integer, default=0)  # 0/1: only rows triaged with another lexicon version
+    last_id = Column(Integer, default=0)  # keyset cursor: highest id committed
+    max_id = Column(Integer, nullable=True)  # snapshot upper bound taken at job creation
+    processed = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,272 @@
+"""
+Minimal Mapbox Vector Tile (v2.1) encoder, pure Python.
+
+Writes the protobuf wire format directly: a tile is a sequence of layers, each
+with its own key/value tables and features whose geometry is a run of
+zigzag-encoded MoveTo/LineTo/ClosePath commands in tile coordinates
+(0..extent, y down). Encoded layers can be concatenated with layers from
+PostGIS ST_AsMVT into one tile.
+"""
+import struct
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .tiles import lnglat_to_world
+
+EXTENT = 4096
+BUFFER = 64
+
+POINT, LINESTRING, POLYGON = 1, 2, 3
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+
+TilePoint = Tuple[int, int]
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field: int, values: Iterable[int]) -> bytes:
+    return _bytes_field(field, b"".join(_varint(v) for v in values))
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def project(longitude: float, latitude: float, z: int, x: int, y: int, extent: int = EXTENT) -> TilePoint:
+    """
+    Tile-local integer coordinates of a WGS84 point.
+    """
+    wx, wy = lnglat_to_world(longitude, latitude)
+    n = 2 ** z
+    return round((wx * n - x) * extent), round((wy * n - y) * extent)
+
+
+def _encode_path(points: Sequence[TilePoint], cursor: List[int], close: bool) -> List[int]:
+    out = [_command(_MOVE_TO, 1), _zigzag(points[0][0] - cursor[0]), _zigzag(points[0][1] - cursor[1])]
+    cursor[0], cursor[1] = points[0]
+    rest = []
+    for px, py in points[1:]:
+        rest += [_zigzag(px - cursor[0]), _zigzag(py - cursor[1])]
+        cursor[0], cursor[1] = px, py
+    if rest:
+        out += [_command(_LINE_TO, len(rest) // 2)] + rest
+    if close:
+        out.append(_command(_CLOSE_PATH, 1))
+    return out
+
+
+def _dedupe(points: Sequence[TilePoint]) -> List[TilePoint]:
+    out: List[TilePoint] = []
+    for point in points:
+        if not out or out[-1] != point:
+            out.append(point)
+    return out
+
+
+def point_geometry(points: Sequence[TilePoint]) -> List[int]:
+    cursor = [0, 0]
+    out = [_command(_MOVE_TO, len(points))]
+    for px, py in points:
+        out += [_zigzag(px - cursor[0]), _zigzag(py - cursor[1])]
+        cursor = [px, py]
+    return out
+
+
+def linestring_geometry(points: Sequence[TilePoint]) -> Optional[List[int]]:
+    points = _dedupe(points)
+    if len(points) < 2:
+        return None
+    return _encode_path(points, [0, 0], close=False)
+
+
+def polygon_geometry(ring: Sequence[TilePoint]) -> Optional[List[int]]:
+    """
+    Single exterior ring. Winding is normalized to clockwise in tile
+    coordinates (positive shoelace area with y down), as the spec requires.
+    """
+    ring = _dedupe(ring)
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+    if len(ring) < 3:
+        return None
+    area = sum(ax * by - bx * ay for (ax, ay), (bx, by) in zip(ring, ring[1:] + ring[:1]))
+    if area == 0:
+        return None
+    if area < 0:
+        ring = ring[::-1]
+    return _encode_path(ring, [0, 0], close=True)
+
+
+class LayerBuilder:
+    """
+    Accumulates features for one layer, interning property keys and values.
+    """
+
+    def __init__(self, name: str, extent: int = EXTENT):
+        self.name = name
+        self.extent = extent
+        self._keys: Dict[str, int] = {}
+        self._values: Dict[Tuple[type, object], int] = {}
+        self._features: List[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def _tag(self, key: str, value) -> Tuple[int, int]:
+        key_index = self._keys.setdefault(key, len(self._keys))
+        value_index = self._values.setdefault((type(value), value), len(self._values))
+        return key_index, value_index
+
+    def add_feature(self, geom_type: int, geometry: Optional[List[int]], properties: Dict[str, object], feature_id: Optional[int] = None) -> None:
+        if not geometry:
+            return
+        tags: List[int] = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            tags.extend(self._tag(key, getattr(value, "value", value)))
+        payload = b""
+        if feature_id is not None and feature_id >= 0:
+            payload += _key(1, 0) + _varint(feature_id)
+        if tags:
+            payload += _packed(2, tags)
+        payload += _key(3, 0) + _varint(geom_type)
+        payload += _packed(4, geometry)
+        self._features.append(payload)
+
+    @staticmethod
+    def _encode_value(value) -> bytes:
+        if isinstance(value, bool):
+            return _key(7, 0) + _varint(int(value))
+        if isinstance(value, int):
+            return _key(6, 0) + _varint(_zigzag(value)) if value < 0 else _key(5, 0) + _varint(value)
+        if isinstance(value, float):
+            return _key(3, 1) + struct.pack("<d", value)
+        return _bytes_field(1, str(value).encode("utf-8"))
+
+    def encode(self) -> bytes:
+        if not self._features:
+            return b""
+        payload = _key(15, 0) + _varint(2)
+        payload += _bytes_field(1, self.name.encode("utf-8"))
+        payload += b"".join(_bytes_field(2, feature) for feature in self._features)
+        payload += b"".join(_bytes_field(3, key.encode("utf-8")) for key in self._keys)
+        payload += b"".join(_bytes_field(4, self._encode_value(value)) for _, value in self._values)
+        payload += _key(5, 0) + _varint(self.extent)
+        # Layer is field 3 of Tile
+        return _bytes_field(3, payload)
+
+
+# --- Decoding (tests and debugging) ---
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(data: bytes):
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = _read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        elif wire_type == 5:
+            value, pos = data[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        yield field, wire_type, value
+
+
+def _unpack(data: bytes) -> List[int]:
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = _read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def _decode_value(data: bytes):
+    for field, _, value in _fields(data):
+        if field == 1:
+            return value.decode("utf-8")
+        if field == 2:
+            return struct.unpack("<f", value)[0]
+        if field == 3:
+            return struct.unpack("<d", value)[0]
+        if field in (4, 5):
+            return value
+        if field == 6:
+            return (value >> 1) ^ -(value & 1)
+        if field == 7:
+            return bool(value)
+    return None
+
+
+def decode(data: bytes) -> Dict[str, List[dict]]:
+    """
+    {layer name: [{"id", "type", "properties", "geometry"}]} with geometry as
+    the raw command/parameter integers.
+    """
+    layers: Dict[str, List[dict]] = {}
+    for field, _, layer in _fields(data):
+        if field != 3:
+            continue
+        name, keys, values, features = "", [], [], []
+        for lfield, _, value in _fields(layer):
+            if lfield == 1:
+                name = value.decode("utf-8")
+            elif lfield == 2:
+                features.append(value)
+            elif lfield == 3:
+                keys.append(value.decode("utf-8"))
+            elif lfield == 4:
+                values.append(_decode_value(value))
+        decoded = []
+        for feature in features:
+            item = {"id": None, "type": None, "properties": {}, "geometry": []}
+            for ffield, _, value in _fields(feature):
+                if ffield == 1:
+                    item["id"] = value
+                elif ffield == 2:
+                    tags = _unpack(value)
+                    item["properties"] = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+                elif ffield == 3:
+                    item["type"] = value
+                elif ffield == 4:
+                    item["geometry"] = _unpack(value)
+            decoded.append(item)
+        layers.setdefault(name, []).extend(decoded)
+    return layers
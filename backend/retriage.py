@@ -0,0 +1,283 @@
+"""
+Resumable re-triage backfill: re-scores stored AI fields after triage logic,
+lexicon, spatial risk weights or district boundaries change.
+
+Incidents are walked in keyset order (id > cursor) in small chunks. Each chunk
+is triaged with AIEngine.analyze_batch and written with one bulk UPDATE in a
+short transaction that also advances the job cursor, so a crashed job resumes
+exactly where it stopped and no long locks are held on a live table.
+
+Rows nobody has verified get severity, type and confidence re-derived the way
+intake does, and are stamped with the current lexicon version. Human-verified
+rows keep their labels, confidence and lexicon version; only their risk cues,
+spatial risk index and routing are rebuilt from the stored labels.
+
+    python -m backend.retriage [--chunk-size 500] [--sleep-ms 50] [--stale-only] [--new]
+"""
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from . import database, intake, models
+from .ai_engine import ai_engine
+from .clusters import incident_clusters
+from .heatmap import incident_heatmap
+from .jurisdictions import jurisdictions
+from .vector_tiles import tile_cache
+
+logger = logging.getLogger("aegis.retriage")
+
+JOB_NAME = "retriage"
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_SLEEP_MS = 50
+
+SessionFactory = Callable[[], Session]
+
+
+def create_job(db: Session, stale_only: bool = False) -> models.BackfillJob:
+    job = models.BackfillJob(
+        name=JOB_NAME,
+        status=models.JobStatus.RUNNING,
+        stale_only=1 if stale_only else 0,
+        last_id=0,
+        max_id=db.query(func.max(models.Incident.id)).scalar() or 0,
+        processed=0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def latest_unfinished_job(db: Session) -> Optional[models.BackfillJob]:
+    """
+    Newest job that is still running or stopped on an error; both resume from their cursor.
+    """
+    return db.query(models.BackfillJob).filter(
+        models.BackfillJob.name == JOB_NAME,
+        models.BackfillJob.status.in_([models.JobStatus.RUNNING, models.JobStatus.FAILED]),
+    ).order_by(models.BackfillJob.id.desc()).first()
+
+
+def retriage_chunk(db: Session, job: models.BackfillJob, chunk_size: int, routing_cache: Dict) -> int:
+    """
+    Re-score the next chunk after the job cursor and commit it together with
+    the advanced cursor. Returns the number of incidents processed.
+    """
+    query = db.query(
+        models.Incident.id,
+        models.Incident.title,
+        models.Incident.description,
+        models.Incident.incident_type,
+        models.Incident.severity,
+        models.Incident.latitude,
+        models.Incident.longitude,
+        models.Incident.verified_by_id,
+    ).filter(models.Incident.id > job.last_id, models.Incident.id <= job.max_id)
+    if job.stale_only:
+        query = query.filter(or_(
+            models.Incident.lexicon_version.is_(None),
+            models.Incident.lexicon_version != ai_engine.lexicon_version,
+        ))
+    rows = query.order_by(models.Incident.id).limit(chunk_size).all()
+    if not rows:
+        return 0
+
+    triaged = ai_engine.analyze_batch([f"{r.title} {r.description}" for r in rows])
+    severities, types = [], []
+    for row, severity, incident_type in zip(rows, triaged.severity, triaged.incident_type):
+        if row.verified_by_id is not None:
+            severities.append(row.severity)
+            types.append(row.incident_type)
+        else:
+            # As at intake: the triaged type only replaces the stored one when specific
+            severities.append(severity)
+            types.append(incident_type if incident_type != models.IncidentType.OTHER else row.incident_type)
+    batch = triaged.relabel(severities, types)
+    risk_indices = intake.spatial_risk_indices(batch).tolist()
+    rederived, verified, relabeled = [], [], []
+    for row, ai_result, risk_index in zip(rows, batch.rows(), risk_indices):
+        key = (row.incident_type, ai_result["severity"], ai_result["incident_type"])
+        if key not in routing_cache:
+            routing_cache[key] = intake.routing_suggestions(*key)
+        agencies, unit_type, rationale = routing_cache[key]
+        values = {
+            "id": row.id,
+            "escalation_probability": ai_result["escalation_probability"],
+            "spread_risk": ai_result["spread_risk"],
+            "casualty_likelihood": ai_result["casualty_likelihood"],
+            "crowd_size_estimate": ai_result["crowd_size_estimate"],
+            "spatial_risk_index": risk_index,
+            "suggested_agencies": agencies,
+            "suggested_unit_type": unit_type,
+            "routing_rationale": rationale,
+            **jurisdictions.resolve(row.latitude, row.longitude),
+        }
+        if row.verified_by_id is not None:
+            verified.append(values)
+            continue
+        values.update(
+            severity=ai_result["severity"],
+            incident_type=ai_result["incident_type"],
+            ai_confidence=ai_result["confidence"],
+            lexicon_version=ai_result["lexicon_version"],
+        )
+        rederived.append(values)
+        if (ai_result["severity"], ai_result["incident_type"]) != (row.severity, row.incident_type):
+            relabeled.append((row, ai_result["severity"], ai_result["incident_type"]))
+    # One executemany per column set
+    for updates in (rederived, verified):
+        if updates:
+            db.execute(update(models.Incident), updates)
+    job.last_id = rows[-1].id
+    job.processed = (job.processed or 0) + len(rows)
+    db.commit()
+    incident_heatmap.update_risk((u["id"], u["spatial_risk_index"]) for u in rederived + verified)
+    for row, severity, incident_type in relabeled:
+        incident_clusters.add(row.id, row.latitude, row.longitude, severity, incident_type)
+        tile_cache.invalidate_point(row.latitude, row.longitude)
+    return len(rows)
+
+
+def run_retriage(
+    session_factory: SessionFactory = database.SessionLocal,
+    job_id: Optional[int] = None,
+    stale_only: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sleep_ms: float = DEFAULT_SLEEP_MS,
+    max_chunks: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Run (or resume) a re-triage job until it is done, `max_chunks` chunks have
+    been processed or `stop` is set. A failed job is resumed from its cursor;
+    a resumed job keeps its own `stale_only`. Returns the job id.
+    """
+    db = session_factory()
+    try:
+        if job_id is not None:
+            job = db.query(models.BackfillJob).filter(models.BackfillJob.id == job_id).first()
+            if job is None:
+                raise ValueError(f"Backfill job {job_id} not found")
+        else:
+            job = latest_unfinished_job(db)
+            if job is None:
+                job = create_job(db, stale_only)
+            elif bool(job.stale_only) != stale_only:
+                logger.warning("Resuming re-triage job %s with its own stale_only=%s", job.id, bool(job.stale_only))
+        job_id = job.id
+        if job.status == models.JobStatus.DONE:
+            return job_id
+        if job.status == models.JobStatus.FAILED:
+            logger.warning("Re-triage job %s failed earlier (%s); resuming after id %s", job.id, job.error, job.last_id)
+            job.status = models.JobStatus.RUNNING
+            job.error = None
+            db.commit()
+        logger.info("Re-triage job %s starting after id %s (up to %s)", job.id, job.last_id, job.max_id)
+
+        routing_cache: Dict = {}
+        started = time.perf_counter()
+        start_count = job.processed or 0
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            if stop is not None and stop.is_set():
+                break
+            try:
+                count = retriage_chunk(db, job, chunk_size, routing_cache)
+            except Exception as exc:
+                db.rollback()
+                job.status = models.JobStatus.FAILED
+                job.error = str(exc)[:500]
+                db.commit()
+                logger.exception("Re-triage job %s failed after id %s", job.id, job.last_id)
+                raise
+            if count == 0:
+                job.status = models.JobStatus.DONE
+                job.finished_at = datetime.now(timezone.utc)
+                db.commit()
+                break
+            chunks += 1
+            elapsed = time.perf_counter() - started
+            logger.info(
+                "Re-triage job %s: %s rows, cursor %s/%s, %.0f rows/sec",
+                job.id, job.processed, job.last_id, job.max_id, (job.processed - start_count) / elapsed if elapsed else 0.0,
+            )
+            # Throttle so the backfill yields to live traffic
+            if sleep_ms:
+                time.sleep(sleep_ms / 1000.0)
+        logger.info("Re-triage job %s %s: %s rows processed", job.id, job.status.value, job.processed)
+        return job_id
+    finally:
+        db.close()
+
+
+class RetriageRunner:
+    """
+    Runs at most one re-triage job in a background thread (admin endpoint).
+    """
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, job_id: int, chunk_size: int = DEFAULT_CHUNK_SIZE, sleep_ms: float = DEFAULT_SLEEP_MS) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(job_id, chunk_size, sleep_ms), name="retriage", daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, job_id: int, chunk_size: int, sleep_ms: float) -> None:
+        try:
+            run_retriage(job_id=job_id, chunk_size=chunk_size, sleep_ms=sleep_ms, stop=self._stop)
+        except Exception:
+            logger.exception("Re-triage job %s stopped", job_id)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+
+
+# Singleton instance
+retriage_runner = RetriageRunner()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.retriage", description="Re-score stored incident triage fields.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--sleep-ms", type=float, default=DEFAULT_SLEEP_MS, help="pause between chunks")
+    parser.add_argument("--stale-only", action="store_true", help="only incidents triaged with another lexicon version (new jobs)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--job", type=int, help="resume this job id (running or failed)")
+    group.add_argument("--new", action="store_true", help="start a new job instead of resuming the latest unfinished or failed one")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    job_id = args.job
+    if args.new:
+        db = database.SessionLocal()
+        try:
+            job_id = create_job(db, args.stale_only).id
+        finally:
+            db.close()
+    run_retriage(job_id=job_id, stale_only=args.stale_only, chunk_size=args.chunk_size, sleep_ms=args.sleep_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Road-graph travel times for unit ETAs.
+
+The graph is loaded from a GeoJSON extract of LineString/MultiLineString road
+features (e.g. `osmium export` of an OSM city extract, ROAD_GRAPH_PATH) and
+falls back to BASE_LAYERS["road_network"]. Vertices become nodes and
+consecutive vertices become edges weighted in minutes from the feature speed
+(`maxspeed`, else a default per OSM `highway` class); `oneway` is honoured.
+Edges live in compressed sparse row arrays, forward and reversed.
+
+Searches are vectorized delta-stepping: every node in the current
+SEARCH_BUCKET_MINUTES band of tentative travel times is relaxed in one numpy
+pass, so the Python loop runs once per band instead of once per node. A single
+unit is searched bidirectionally (from the unit and, over in-edges, from the
+incident, meeting in the middle); several units by one reverse search from the
+incident that stops once every candidate, or only the `limit` fastest, is
+settled. Road ETAs are cached per (origin cell, target cell) pair, so repeated
+dispatch queries around the same area skip snapping and search entirely.
+Points further than SNAP_MAX_KM from the network use the straight-line
+estimate.
+"""
+import json
+import logging
+import re
+from array import array
+from math import inf
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import get_settings
+from .layers import BASE_LAYERS
+from .lru import LRUCache
+from .routing import haversine
+from .spatial_index import PointGridIndex
+
+logger = logging.getLogger("aegis.road_graph")
+settings = get_settings()
+
+DEFAULT_SPEED_KMH = 30.0
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 100.0, "motorway_link": 60.0,
+    "trunk": 80.0, "trunk_link": 50.0,
+    "primary": 60.0, "primary_link": 40.0,
+    "secondary": 50.0, "secondary_link": 40.0,
+    "tertiary": 40.0, "tertiary_link": 30.0,
+    "unclassified": 30.0, "residential": 30.0,
+    "living_street": 10.0, "service": 20.0, "track": 15.0,
+}
+OFFROAD_SPEED_KMH = 15.0  # access leg between a point and its snapped node
+SNAP_MAX_KM = 2.0
+SNAP_CELL_DEG = 0.002  # ~220 m: a few nodes per cell even in dense street grids
+MAX_EDGE_KM = 0.25  # longer segments get intermediate nodes for snapping
+MAX_SEARCH_MINUTES = 180.0
+SEARCH_BUCKET_MINUTES = 3.0  # delta-stepping band width
+
+Line = Tuple[Sequence[Sequence[float]], float, int]  # ([lng, lat] coords, speed km/h, oneway: 0, 1 or -1)
+Eta = Tuple[float, str]  # (minutes, "road" or "straight_line")
+
+
+def straight_line_minutes(distance_km: float) -> float:
+    # Simple congestion stub: add 10% if distance > 10km
+    return distance_km / 0.5 * 1.1 if distance_km > 10 else distance_km / 0.5
+
+
+def parse_speed(properties: dict) -> float:
+    maxspeed = properties.get("maxspeed")
+    if maxspeed is not None:
+        match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", str(maxspeed))
+        if match:
+            speed = float(match.group(1)) * (1.609344 if match.group(2) else 1.0)
+            if speed > 0:
+                return speed
+    return HIGHWAY_SPEEDS_KMH.get(properties.get("highway"), DEFAULT_SPEED_KMH)
+
+
+def parse_oneway(properties: dict) -> int:
+    value = str(properties.get("oneway", "")).lower()
+    if value in ("yes", "true", "1"):
+        return 1
+    if value == "-1":
+        return -1
+    return 0
+
+
+def _densify(coords: List[Tuple[float, float]]) -> Iterable[Tuple[float, float]]:
+    """
+    Split long straight segments so every point on a road is near some node.
+    """
+    for i, (lng, lat) in enumerate(coords):
+        if i:
+            prev_lng, prev_lat = coords[i - 1]
+            steps = int(haversine(prev_lat, prev_lng, lat, lng) // MAX_EDGE_KM)
+            for step in range(1, steps + 1):
+                t = step / (steps + 1)
+                yield prev_lng + (lng - prev_lng) * t, prev_lat + (lat - prev_lat) * t
+        yield lng, lat
+
+
+class RoadGraph:
+    """
+    Immutable directed graph in CSR form: the out-edges of node i are
+    indices[indptr[i]:indptr[i + 1]] with weights in minutes.
+    """
+
+    def __init__(self, lats: np.ndarray, lngs: np.ndarray, sources: np.ndarray, targets: np.ndarray, minutes: np.ndarray):
+        self.lats = array("d", lats.astype(np.float64).tobytes())
+        self.lngs = array("d", lngs.astype(np.float64).tobytes())
+        self.node_count = len(lats)
+        self.edge_count = len(sources)
+        self.indptr, self.indices, self.minutes = self._csr(sources, targets, minutes)
+        self.rev_indptr, self.rev_indices, self.rev_minutes = self._csr(targets, sources, minutes)
+        # Both directions stacked for the vectorized searches: node i has its
+        # out-edges, node node_count + i the in-edges of i (reversed)
+        n, rev_indptr = self.node_count, np.frombuffer(self.rev_indptr, dtype=np.int64)
+        self._stacked_indptr = np.concatenate((np.frombuffer(self.indptr, dtype=np.int64), rev_indptr[1:] + self.edge_count))
+        self._stacked_indices = np.concatenate((
+            np.frombuffer(self.indices, dtype=np.int64), np.frombuffer(self.rev_indices, dtype=np.int64) + n,
+        ))
+        self._stacked_minutes = np.concatenate((np.frombuffer(self.minutes), np.frombuffer(self.rev_minutes)))
+        self._nodes = PointGridIndex(cell_size_deg=SNAP_CELL_DEG)
+        for node in range(self.node_count):
+            self._nodes.add(node, self.lats[node], self.lngs[node])
+
+    def _csr(self, sources: np.ndarray, targets: np.ndarray, minutes: np.ndarray) -> Tuple[array, array, array]:
+        order = np.argsort(sources, kind="stable")
+        indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.node_count), out=indptr[1:])
+        # array.array keeps the storage compact and indexes fast from Python loops
+        return (
+            array("q", indptr.tobytes()),
+            array("q", targets[order].astype(np.int64).tobytes()),
+            array("d", minutes[order].astype(np.float64).tobytes()),
+        )
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[Line]) -> "RoadGraph":
+        node_ids: Dict[Tuple[float, float], int] = {}
+        lats: List[float] = []
+        lngs: List[float] = []
+        sources: List[int] = []
+        targets: List[int] = []
+        minutes: List[float] = []
+        for coords, speed_kmh, oneway in lines:
+            previous = None
+            for lng, lat in _densify([(float(c[0]), float(c[1])) for c in coords]):
+                # Shared vertices (to ~1 cm) join segments into one network
+                key = (round(lat, 7), round(lng, 7))
+                node = node_ids.get(key)
+                if node is None:
+                    node = node_ids[key] = len(lats)
+                    lats.append(lat)
+                    lngs.append(lng)
+                if previous is not None and previous != node:
+                    cost = haversine(lats[previous], lngs[previous], lat, lng) / speed_kmh * 60.0
+                    if oneway >= 0:
+                        sources.append(previous)
+                        targets.append(node)
+                        minutes.append(cost)
+                    if oneway <= 0:
+                        sources.append(node)
+                        targets.append(previous)
+                        minutes.append(cost)
+                previous = node
+        return cls(
+            np.array(lats, dtype=np.float64),
+            np.array(lngs, dtype=np.float64),
+            np.array(sources, dtype=np.int64),
+            np.array(targets, dtype=np.int64),
+            np.array(minutes, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_geojson(cls, data: dict) -> "RoadGraph":
+        def lines():
+            for feature in data.get("features", []):
+                geometry = feature.get("geometry") or {}
+                properties = feature.get("properties") or {}
+                if geometry.get("type") == "LineString":
+                    parts = [geometry["coordinates"]]
+                elif geometry.get("type") == "MultiLineString":
+                    parts = geometry["coordinates"]
+                else:
+                    continue
+                speed, oneway = parse_speed(properties), parse_oneway(properties)
+                for part in parts:
+                    yield part, speed, oneway
+
+        return cls.from_lines(lines())
+
+    @classmethod
+    def from_file(cls, path: str) -> "RoadGraph":
+        with open(path, encoding="utf-8") as fh:
+            return cls.from_geojson(json.load(fh))
+
+    @classmethod
+    def from_base_layers(cls) -> "RoadGraph":
+        return cls.from_lines((item["coords"], DEFAULT_SPEED_KMH, 0) for item in BASE_LAYERS.get("road_network", []))
+
+    def snap(self, latitude: float, longitude: float) -> Optional[Tuple[int, float]]:
+        """
+        (nearest node, distance km) or None when no node is within SNAP_MAX_KM.
+        """
+        hits = self._nodes.nearest(latitude, longitude, 1, max_km=SNAP_MAX_KM)
+        if not hits:
+            return None
+        distance, node = hits[0]
+        return node, distance
+
+    def _relax(self, dist: np.ndarray, slot: np.ndarray, bucket: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Relax every stacked edge leaving `bucket`. Returns the nodes whose
+        distance improved, once each, with their new distances.
+        """
+        indptr = self._stacked_indptr
+        starts = indptr[bucket]
+        counts = indptr[bucket + 1] - starts
+        edges = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        edges += np.arange(edges.size)
+        nodes = self._stacked_indices[edges]
+        candidates = np.repeat(dist[bucket], counts) + self._stacked_minutes[edges]
+        better = candidates < dist[nodes]
+        nodes, candidates = nodes[better], candidates[better]
+        np.minimum.at(dist, nodes, candidates)
+        # One entry per node: keep a winning candidate
+        won = candidates == dist[nodes]
+        nodes, candidates = nodes[won], candidates[won]
+        order = np.arange(nodes.size)
+        slot[nodes] = order
+        first = slot[nodes] == order
+        return nodes[first], candidates[first]
+
+    def _bidirectional(self, source: int, target: int, max_minutes: float) -> float:
+        """
+        Minutes from source to target (inf when unreachable within max_minutes):
+        forward from the source and backward from the target, band by band.
+        """
+        n = self.node_count
+        dist = np.full(2 * n, inf)
+        slot = np.empty(2 * n, dtype=np.int64)
+        dist[source] = dist[n + target] = 0.0
+        frontier, keys = np.array([source, n + target], dtype=np.int64), np.zeros(2)
+        best = inf
+        while frontier.size:
+            low = keys.min()
+            # Both sides are settled below `low`, so any path not seen yet is at least 2 * low
+            if 2 * low >= best or 2 * low > max_minutes:
+                break
+            end = low + SEARCH_BUCKET_MINUTES
+            take = keys < end
+            bucket = frontier[take]
+            bucket = bucket[keys[take] == dist[bucket]]  # entries superseded by a shorter path are stale
+            frontier, keys = frontier[~take], keys[~take]
+            while bucket.size:
+                nodes, candidates = self._relax(dist, slot, bucket)
+                if nodes.size:
+                    # The twin of a node in the other search half: i <-> n + i
+                    best = min(best, float((candidates + dist[(nodes + n) % (2 * n)]).min()))
+                near = candidates < end
+                bucket = nodes[near]
+                frontier = np.concatenate((frontier, nodes[~near]))
+                keys = np.concatenate((keys, candidates[~near]))
+        return best
+
+    def _reverse(self, target: int, sources: Sequence[int], max_minutes: float, limit: Optional[int],
+                 extra: Optional[Dict[int, float]]) -> Dict[int, float]:
+        """
+        Minutes from each source to target by one search over in-edges; stops
+        once `limit` sources (all by default) are settled with their total,
+        including `extra`, below every unsettled source.
+        """
+        n = self.node_count
+        goals = np.array(sources, dtype=np.int64) + n
+        offsets = np.array([extra.get(source, 0.0) for source in sources]) if extra else 0.0
+        needed = goals.size if limit is None else min(limit, goals.size)
+        dist = np.full(2 * n, inf)
+        slot = np.empty(2 * n, dtype=np.int64)
+        dist[n + target] = 0.0
+        frontier, keys = np.array([n + target], dtype=np.int64), np.zeros(1)
+        settled_below = 0.0
+        while frontier.size:
+            low = keys.min()
+            if low > max_minutes:
+                break
+            end = low + SEARCH_BUCKET_MINUTES
+            take = keys < end
+            bucket = frontier[take]
+            bucket = bucket[keys[take] == dist[bucket]]
+            frontier, keys = frontier[~take], keys[~take]
+            while bucket.size:
+                nodes, candidates = self._relax(dist, slot, bucket)
+                near = candidates < end
+                bucket = nodes[near]
+                frontier = np.concatenate((frontier, nodes[~near]))
+                keys = np.concatenate((keys, candidates[~near]))
+            settled_below = end
+            if np.count_nonzero(dist[goals] + offsets < end) >= needed:
+                break
+        else:
+            settled_below = inf
+        minutes = dist[goals]
+        return {
+            int(goal) - n: float(value)
+            for goal, value in zip(goals, minutes)
+            if value < settled_below and value <= max_minutes
+        }
+
+    def minutes_to(self, target: int, sources: Iterable[int], max_minutes: float = MAX_SEARCH_MINUTES,
+                   limit: Optional[int] = None, extra: Optional[Dict[int, float]] = None) -> Dict[int, float]:
+        """
+        Travel minutes from each source node to `target`. Unreachable sources, or
+        ones beyond max_minutes, are omitted. With `limit` the search stops once
+        the `limit` fastest sources are settled, ranked by minutes plus `extra`
+        (e.g. access legs), so slower ones may be missing.
+        """
+        pending = set(sources)
+        result: Dict[int, float] = {}
+        if target in pending:
+            result[target] = 0.0
+            pending.discard(target)
+        if limit is not None:
+            limit -= len(result)
+        if not pending or (limit is not None and limit <= 0):
+            return result
+        if len(pending) == 1:
+            source = pending.pop()
+            minutes = self._bidirectional(source, target, max_minutes)
+            if minutes <= max_minutes:
+                result[source] = minutes
+            return result
+        result.update(self._reverse(target, list(pending), max_minutes, limit, extra))
+        return result
+
+
+class RoutingEngine:
+    """
+    Road ETAs with a grid-cell-pair cache in front of the graph search.
+    """
+
+    def __init__(self, graph: RoadGraph, cache_size: int = 50000, cell_size_deg: float = 0.005):
+        self.graph = graph
+        self.cell_size = cell_size_deg
+        self.cache = LRUCache(cache_size)
+
+    def load(self, graph: RoadGraph) -> None:
+        self.graph = graph
+        self.cache.clear()
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return int(latitude // self.cell_size), int(longitude // self.cell_size)
+
+    def etas_to(self, latitude: float, longitude: float, origins: Sequence[Tuple[float, float]],
+                limit: Optional[int] = None) -> List[Optional[Eta]]:
+        """
+        (minutes, source) from each origin to the point, in origin order. With
+        `limit` only the `limit` fastest uncached origins are searched for;
+        slower ones may come back None.
+        """
+        target_cell = self._cell(latitude, longitude)
+        etas: List[Optional[Eta]] = []
+        misses: List[int] = []
+        for position, (lat, lng) in enumerate(origins):
+            cached = self.cache.get((self._cell(lat, lng), target_cell))
+            etas.append((cached, "road") if cached is not None else None)
+            if cached is None:
+                misses.append(position)
+
+        if misses:
+            graph = self.graph
+            target = graph.snap(latitude, longitude)
+            by_node: Dict[int, List[Tuple[int, float]]] = {}
+            if target is not None:
+                for position in misses:
+                    origin = graph.snap(*origins[position])
+                    if origin is not None:
+                        by_node.setdefault(origin[0], []).append((position, origin[1]))
+            found = {}
+            if by_node:
+                access = {node: min(km for _, km in entries) / OFFROAD_SPEED_KMH * 60.0 for node, entries in by_node.items()}
+                found = graph.minutes_to(target[0], by_node, limit=limit, extra=access)
+            # A search stopped at the limit has not settled the slower origins
+            truncated = limit is not None and len(found) >= limit
+            for node, entries in by_node.items():
+                if node not in found:
+                    continue
+                for position, access_km in entries:
+                    # Access legs between each point and its snapped node
+                    minutes = found[node] + (access_km + target[1]) / OFFROAD_SPEED_KMH * 60.0
+                    self.cache.put((self._cell(*origins[position]), target_cell), minutes)
+                    etas[position] = (minutes, "road")
+            unsettled = {position for entries in by_node.values() for position, _ in entries} if truncated else ()
+            for position in misses:
+                if etas[position] is None and position not in unsettled:
+                    lat, lng = origins[position]
+                    etas[position] = (straight_line_minutes(haversine(lat, lng, latitude, longitude)), "straight_line")
+        return etas
+
+    def eta(self, from_lat: float, from_lng: float, to_lat: float, to_lng: float) -> Eta:
+        return self.etas_to(to_lat, to_lng, [(from_lat, from_lng)])[0]
+
+    def stats(self) -> dict:
+        return {"nodes": self.graph.node_count, "edges": self.graph.edge_count, "eta_cache": self.cache.stats()}
+
+
+def load_configured_graph(engine: RoutingEngine, path: str) -> None:
+    """
+    Swap in the ROAD_GRAPH_PATH extract; keeps the current graph if it cannot be read.
+    """
+    if not path:
+        return
+    try:
+        graph = RoadGraph.from_file(path)
+    except (OSError, ValueError, KeyError, TypeError):
+        logger.exception("Could not load road graph from %s; keeping the base layer network", path)
+        return
+    engine.load(graph)
+    logger.info("Road graph loaded from %s: %s nodes, %s edges", path, graph.node_count, graph.edge_count)
+
+
+# Singleton instance
+road_router = RoutingEngine(RoadGraph.from_base_layers(), settings.eta_cache_size, settings.eta_cache_cell_deg)
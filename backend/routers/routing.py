@@ -1,61 +1,148 @@
-from fastapi import APIRouter, Depends, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from .. import models, database
-from math import radians, sin, cos, sqrt, atan2
+from .. import geo, models, schemas, database
+from ..assignment import plan_assignments
+from ..coverage import coverage_index
+from ..rbac import dispatcher_roles, require_roles
+from ..spatial_index import hydrate
+from ..road_graph import road_router
+from ..telemetry import unit_positions
+from ..unit_index import idle_units
 
 router = APIRouter(prefix="/routing", tags=["routing"])
 
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
+MAX_UNIT_CANDIDATES = 50
+ETA_CANDIDATE_POOL = 10  # nearest units (by distance) re-ranked by road ETA
+ASSIGN_BATCH_MAX = 1000
 
 
 @router.get("/nearest_unit")
-def nearest_unit(lat: float, lng: float, unit_type: models.UserRole | None = None, db: Session = Depends(database.get_db)):
-    units = db.query(models.Unit).filter(models.Unit.status == models.UnitStatus.IDLE).all()
-    if unit_type:
-        units = [u for u in units if u.unit_type == unit_type]
-    if not units:
+def nearest_unit(lat: float, lng: float, unit_type: models.UserRole | None = None, k: int = 1, db: Session = Depends(database.get_db)):
+    if k < 1 or k > MAX_UNIT_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {MAX_UNIT_CANDIDATES}")
+    unit_positions.sync(db)
+    hits = idle_units.nearest(lat, lng, max(k, ETA_CANDIDATE_POOL), unit_type)
+    # Latest telemetry positions, not the (periodically flushed) table
+    units = {unit_id: unit_positions.get(unit_id) for _, unit_id in hits}
+    units = {unit_id: unit for unit_id, unit in units.items() if unit is not None}
+    hits = [(d, unit_id) for d, unit_id in hits if unit_id in units]
+    if not hits:
         raise HTTPException(status_code=404, detail="No idle units found")
-    scored = []
-    for u in units:
-        if u.latitude is None or u.longitude is None:
-            continue
-        distance_km = haversine(lat, lng, u.latitude, u.longitude)
-        # Simple congestion stub: add 10% if distance > 10km
-        eta_min = distance_km / 0.5 * 1.1 if distance_km > 10 else distance_km / 0.5
-        scored.append((distance_km, eta_min, u))
-    if not scored:
-        raise HTTPException(status_code=404, detail="No locatable units")
-    scored.sort(key=lambda x: x[0])
-    distance_km, eta_min, unit = scored[0]
-    return {
-        "unit_id": unit.id,
-        "callsign": unit.callsign,
-        "unit_type": unit.unit_type,
-        "distance_km": distance_km,
-        "eta_minutes": eta_min,
-    }
+    # Only the k fastest are ranked, so the road search can stop once k units are reached
+    etas = road_router.etas_to(lat, lng, [(units[i].latitude, units[i].longitude) for _, i in hits], limit=k)
+    # Closest by road first; distance breaks ties between equal ETAs
+    ranked = sorted(
+        ((eta, hit) for eta, hit in zip(etas, hits) if eta is not None), key=lambda pair: (pair[0][0], pair[1][0])
+    )[:k]
+    lats, lngs = geo.to_arrays([units[i].latitude for _, (_, i) in ranked], [units[i].longitude for _, (_, i) in ranked])
+    bearings = geo.bearing_deg(lat, lng, lats, lngs)
+    candidates = [
+        {
+            "unit_id": unit_id,
+            "callsign": units[unit_id].callsign,
+            "unit_type": units[unit_id].unit_type,
+            "distance_km": distance_km,
+            "bearing_deg": float(bearing),
+            "eta_minutes": eta_minutes,
+            "eta_source": eta_source,
+        }
+        for ((eta_minutes, eta_source), (distance_km, unit_id)), bearing in zip(ranked, bearings)
+    ]
+    # Best candidate at the top level, as before; all k under "candidates"
+    return {**candidates[0], "candidates": candidates}
+
+
+@router.post("/assign_batch", response_model=schemas.AssignBatchResponse)
+def assign_batch(
+    request: schemas.AssignBatchRequest,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(require_roles(dispatcher_roles)),
+):
+    """
+    Proposed unit-to-incident plan for open incidents, weighted by severity and
+    spatial_risk_index. Nothing is dispatched; apply it with PATCH /incidents/{id}.
+    """
+    if request.max_eta_minutes <= 0:
+        raise HTTPException(status_code=400, detail="max_eta_minutes must be positive")
+    incidents = db.query(models.Incident).filter(models.Incident.latitude.isnot(None), models.Incident.longitude.isnot(None))
+    if request.incident_ids is not None:
+        incidents = incidents.filter(models.Incident.id.in_(request.incident_ids))
+    else:
+        incidents = incidents.filter(
+            models.Incident.status.in_([models.IncidentStatus.PENDING, models.IncidentStatus.VERIFIED]),
+            models.Incident.assigned_unit_id.is_(None),
+            models.Incident.duplicate_of_id.is_(None),
+        )
+    unit_positions.sync(db)
+    wanted = set(request.unit_ids) if request.unit_ids is not None else None
+    units = [
+        u for u in unit_positions.list()
+        if u.status == models.UnitStatus.IDLE and u.latitude is not None and u.longitude is not None
+        and (wanted is None or u.id in wanted)
+    ]
+    incidents = incidents.order_by(models.Incident.id).limit(ASSIGN_BATCH_MAX + 1).all()
+    if len(incidents) > ASSIGN_BATCH_MAX or len(units) > ASSIGN_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ASSIGN_BATCH_MAX} incidents and units per batch")
+    return plan_assignments(incidents, units, request.max_eta_minutes)
+
+
+@router.get("/eta")
+def eta(from_lat: float, from_lng: float, to_lat: float, to_lng: float):
+    minutes, source = road_router.eta(from_lat, from_lng, to_lat, to_lng)
+    return {"eta_minutes": minutes, "eta_source": source}
+
+
+@router.get("/stats")
+def routing_stats():
+    return road_router.stats()
+
+
+@router.get("/coverage")
+def coverage(request: Request, response: Response, unit_type: models.UserRole | None = None, minutes: float = 10.0,
+             uncovered_only: bool = False, db: Session = Depends(database.get_db)):
+    """
+    GeoJSON grid of minutes to the nearest idle unit (of `unit_type`, else any
+    type); cells are `covered` within `minutes`. Served from the precomputed
+    raster, with an ETag for cheap polling.
+    """
+    if minutes <= 0 or minutes > coverage_index.max_minutes:
+        raise HTTPException(status_code=400, detail=f"minutes must be in (0, {coverage_index.max_minutes:g}]")
+    unit_positions.sync(db)
+    collection, tag = coverage_index.to_geojson(unit_type, minutes, uncovered_only)
+    etag = f'"{tag}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return collection
 
 
 @router.get("/proximity_alerts")
 def proximity_alerts(lat: float, lng: float, radius_km: float = 5.0, db: Session = Depends(database.get_db)):
-    incidents = db.query(models.Incident).all()
+    rows = db.query(models.Incident.id, models.Incident.latitude, models.Incident.longitude).filter(
+        models.Incident.severity.in_([models.IncidentSeverity.HIGH, models.IncidentSeverity.CRITICAL])
+    ).all()
+    if not rows:
+        return []
+    lats, lngs = geo.to_arrays([r.latitude for r in rows], [r.longitude for r in rows])
+    mask, distances = geo.within_radius(lat, lng, lats, lngs, radius_km)
+    hits = np.flatnonzero(mask)
+    if not hits.size:
+        return []
+    bearings = geo.bearing_deg(lat, lng, lats[hits], lngs[hits])
+    matched = {rows[i].id: (float(distances[i]), float(b)) for i, b in zip(hits, bearings)}
+    # Nearest first; only the matched incidents are loaded
     alerts = []
-    for inc in incidents:
-        d = haversine(lat, lng, inc.latitude, inc.longitude)
-        if d <= radius_km and inc.severity in [models.IncidentSeverity.HIGH, models.IncidentSeverity.CRITICAL]:
-            alerts.append({
-                "incident_id": inc.id,
-                "title": inc.title,
-                "severity": inc.severity,
-                "distance_km": d,
-                "recommended_action": "Avoid area" if inc.incident_type in [models.IncidentType.UNREST, models.IncidentType.CRIME] else "Seek shelter",
-                "spatial_risk_index": inc.spatial_risk_index or 0,
-            })
+    for inc in hydrate(db, sorted((d, incident_id) for incident_id, (d, _) in matched.items())):
+        d, bearing = matched[inc.id]
+        alerts.append({
+            "incident_id": inc.id,
+            "title": inc.title,
+            "severity": inc.severity,
+            "distance_km": d,
+            "bearing_deg": bearing,
+            "recommended_action": "Avoid area" if inc.incident_type in [models.IncidentType.UNREST, models.IncidentType.CRIME] else "Seek shelter",
+            "spatial_risk_index": inc.spatial_risk_index or 0,
+        })
     return alerts
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from .. import database
+from ..vector_tiles import MAX_TILE_ZOOM, get_tile
+
+router = APIRouter(prefix="/tiles", tags=["tiles"])
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+@router.get("/{z}/{x}/{y}.mvt")
+def vector_tile(z: int, x: int, y: int, request: Request, db: Session = Depends(database.get_db)):
+    if z < 0 or z > MAX_TILE_ZOOM:
+        raise HTTPException(status_code=400, detail=f"z must be between 0 and {MAX_TILE_ZOOM}")
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    content, etag = get_tile(db, z, x, y)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    # Revalidation: clients keep tiles in view and refetch only changed ones
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type=MVT_MEDIA_TYPE, headers=headers)
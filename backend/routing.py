@@ -1,6 +1,21 @@
 from typing import List, Dict
+from math import radians, sin, cos, sqrt, atan2
 from . import models
 
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance in km between two WGS84 points.
+    """
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+
 # Map incident types to preferred roles/unit types
 ROUTING_TABLE: Dict[models.IncidentType, List[models.UserRole]] = {
     models.IncidentType.FIRE: [models.UserRole.FIRE, models.UserRole.DISASTER],
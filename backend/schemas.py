@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
-from .models import IncidentType, IncidentSeverity, IncidentStatus, UserRole, UnitStatus, IncidentSource
+from .models import IncidentType, IncidentSeverity, IncidentStatus, UserRole, UnitStatus, IncidentSource, TicketStatus, JobStatus
+from .timeutil import as_utc
 
 # --- User Schemas ---
 class UserBase(BaseModel):
@@ -45,6 +46,37 @@ class UnitResponse(UnitBase):
     class Config:
         from_attributes = True
 
+class TelemetryFix(BaseModel):
+    unit_id: int
+    latitude: float = Field(ge=-90, le=90)
+    longitude: float = Field(ge=-180, le=180)
+    recorded_at: Optional[datetime] = None  # device time; defaults to receipt time
+
+    @field_validator("recorded_at")
+    @classmethod
+    def assume_utc(cls, value):
+        # Naive device timestamps are taken as UTC
+        return as_utc(value)
+
+class TelemetryBatch(BaseModel):
+    fixes: list[TelemetryFix]
+
+class TelemetryResult(BaseModel):
+    accepted: int
+    stale: int
+    unknown: int
+
+class TrackPoint(BaseModel):
+    recorded_at: datetime
+    latitude: float
+    longitude: float
+
+class UnitTrackResponse(BaseModel):
+    unit_id: int
+    start: datetime
+    end: datetime
+    points: list[TrackPoint]
+
 # --- Incident Schemas ---
 class IncidentBase(BaseModel):
     title: str
@@ -83,10 +115,94 @@ class IncidentResponse(IncidentBase):
     flagged_by_id: Optional[int] = None
     duplicate_of_id: Optional[int] = None
     potential_duplicate_id: Optional[int] = None
+    duplicate_score: Optional[float] = None
+    lexicon_version: Optional[str] = None
     suggested_agencies: Optional[list[str]] = None
     suggested_unit_type: Optional[str] = None
     routing_rationale: Optional[str] = None
     mission_id: Optional[int] = None
+    admin_district: Optional[str] = None
+    police_district: Optional[str] = None
+    fire_district: Optional[str] = None
+
+    @field_validator("suggested_agencies", mode="before")
+    @classmethod
+    def split_agencies(cls, value):
+        # Stored as comma-separated text on the model
+        if isinstance(value, str):
+            return [v for v in value.split(",") if v]
+        return value
+
+    class Config:
+        from_attributes = True
+
+class IncidentCluster(BaseModel):
+    cluster_id: str
+    count: int
+    latitude: float
+    longitude: float
+    severity_mix: dict[str, int]
+    type_mix: dict[str, int]
+    incident_id: Optional[int] = None
+
+class ClusteredBBoxResponse(BaseModel):
+    zoom: int
+    clustered: bool
+    clusters: list[IncidentCluster] = []
+    incidents: list[IncidentResponse] = []
+
+class BulkIncidentResult(BaseModel):
+    index: int
+    id: int
+    severity: IncidentSeverity
+    incident_type: IncidentType
+    potential_duplicate_id: Optional[int] = None
+    duplicate_score: Optional[float] = None
+    suggested_unit_type: Optional[str] = None
+    geofence_hits: int = 0
+
+class BulkIncidentResponse(BaseModel):
+    created: int
+    alerts_created: int
+    results: list[BulkIncidentResult]
+
+class StreamIntakeError(BaseModel):
+    line: int
+    error: str
+
+class StreamIntakeSummary(BaseModel):
+    received: int
+    created: int
+    rejected: int
+    alerts_created: int
+    batches: int
+    errors: list[StreamIntakeError]
+
+class IntakeTicketResponse(BaseModel):
+    id: str
+    status: TicketStatus
+    incident_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BackfillJobResponse(BaseModel):
+    id: int
+    name: str
+    status: JobStatus
+    stale_only: int
+    last_id: int
+    max_id: Optional[int] = None
+    processed: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    resumed: bool = False  # an unfinished or failed job was picked up instead of starting a new one
+    detail: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -162,7 +278,44 @@ class AlertCreate(AlertBase):
 class AlertResponse(AlertBase):
     id: int
     created_at: datetime
+    incident_id: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+# --- Batch Dispatch Schemas ---
+class AssignBatchRequest(BaseModel):
+    incident_ids: Optional[list[int]] = None  # default: all open, unassigned incidents
+    unit_ids: Optional[list[int]] = None  # default: all idle, located units
+    max_eta_minutes: float = 120.0
+
+class BatchAssignment(BaseModel):
     incident_id: int
+    unit_id: int
+    callsign: str
+    unit_type: UserRole
+    distance_km: float
+    eta_minutes: float
+    priority: float
+
+class AssignBatchResponse(BaseModel):
+    assignments: list[BatchAssignment]
+    unassigned_incident_ids: list[int]
+    idle_unit_ids: list[int]
+    total_weighted_eta: float
+    solve_ms: float
+
+class GeofenceMatch(BaseModel):
+    fence_kind: str
+    fence_id: int
+    fence_type: Optional[str] = None
+    label: Optional[str] = None
+    distance_km: Optional[float] = None
+
+class GeofenceHitResponse(GeofenceMatch):
+    id: int
+    incident_id: int
+    created_at: datetime
 
     class Config:
         from_attributes = True
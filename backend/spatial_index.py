@@ -0,0 +1,224 @@
+"""
+In-memory grid index of incident coordinates for radius and k-nearest queries
+on deployments without PostGIS.
+
+Points are bucketed into fixed-size lat/lng cells. A radius query only scans
+the cells overlapping the query circle; k-nearest expands rings of cells
+outward and stops once no unvisited ring can hold a closer point. Only the ids
+that match are hydrated from the database.
+"""
+import threading
+from math import ceil, cos, floor, radians
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from . import geo, models
+from .geo import KM_PER_DEG_LAT
+
+CELL_SIZE_DEG = 0.05  # ~5.5 km of latitude
+HYDRATE_CHUNK = 500
+
+Cell = Tuple[int, int]
+Hit = Tuple[float, int]  # (distance km, incident id)
+
+
+class PointGridIndex:
+    """
+    Thread-safe grid of (id -> lat/lng). `sync()` catches up on rows inserted
+    by other processes since the last seen id, so every API worker converges
+    on the table without a full reload.
+    """
+
+    def __init__(self, cell_size_deg: float = CELL_SIZE_DEG):
+        self.cell_size_deg = cell_size_deg
+        self._cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._max_id = 0
+        self._bounds: Optional[Tuple[int, int, int, int]] = None  # cell extent, grows only
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return floor(latitude / self.cell_size_deg), floor(longitude / self.cell_size_deg)
+
+    def _discard(self, incident_id: int) -> None:
+        point = self._points.pop(incident_id, None)
+        if point is None:
+            return
+        key = self._cell(*point)
+        cell = self._cells.get(key)
+        if cell is not None:
+            cell.pop(incident_id, None)
+            if not cell:
+                del self._cells[key]
+
+    def add(self, incident_id: Optional[int], latitude: Optional[float], longitude: Optional[float]) -> None:
+        """
+        Insert or move a point (upsert by id).
+        """
+        if incident_id is None:
+            return
+        with self._lock:
+            self._discard(incident_id)
+            self._max_id = max(self._max_id, incident_id)
+            if latitude is None or longitude is None:
+                return
+            key = self._cell(latitude, longitude)
+            self._points[incident_id] = (latitude, longitude)
+            self._cells.setdefault(key, {})[incident_id] = (latitude, longitude)
+            if self._bounds is None:
+                self._bounds = (key[0], key[1], key[0], key[1])
+            else:
+                x0, y0, x1, y1 = self._bounds
+                self._bounds = (min(x0, key[0]), min(y0, key[1]), max(x1, key[0]), max(y1, key[1]))
+
+    def remove(self, incident_id: int) -> None:
+        with self._lock:
+            self._discard(incident_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            self._max_id = 0
+            self._bounds = None
+
+    def rebuild(self, db: Session) -> None:
+        self.clear()
+        self.sync(db)
+
+    def sync(self, db: Session) -> None:
+        """
+        Index rows with ids above the highest id seen (primary-key range scan).
+        """
+        rows = db.query(models.Incident.id, models.Incident.latitude, models.Incident.longitude).filter(
+            models.Incident.id > self._max_id
+        ).all()
+        for incident_id, latitude, longitude in rows:
+            self.add(incident_id, latitude, longitude)
+
+    def _spans(self, latitude: float, radius_km: float) -> Tuple[int, int]:
+        lat_span = ceil(radius_km / (KM_PER_DEG_LAT * self.cell_size_deg))
+        # Widest longitude span is at the edge of the circle nearest a pole
+        edge = min(abs(latitude) + radius_km / KM_PER_DEG_LAT, 89.0)
+        lng_span = ceil(radius_km / (KM_PER_DEG_LAT * cos(radians(edge)) * self.cell_size_deg))
+        return lat_span, lng_span
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Hit]:
+        """
+        (distance, id) of every point within radius_km, nearest first.
+        """
+        cx, cy = self._cell(latitude, longitude)
+        lat_span, lng_span = self._spans(latitude, radius_km)
+        with self._lock:
+            if (2 * lat_span + 1) * (2 * lng_span + 1) > len(self._cells):
+                # Query covers more cells than are occupied: walk occupied ones
+                cells = [
+                    cell for key, cell in self._cells.items()
+                    if abs(key[0] - cx) <= lat_span and abs(key[1] - cy) <= lng_span
+                ]
+            else:
+                cells = [
+                    self._cells[key]
+                    for key in ((cx + dx, cy + dy) for dx in range(-lat_span, lat_span + 1) for dy in range(-lng_span, lng_span + 1))
+                    if key in self._cells
+                ]
+            ids = [incident_id for cell in cells for incident_id in cell]
+            points = [point for cell in cells for point in cell.values()]
+        if not ids:
+            return []
+        lats, lngs = np.array(points, dtype=np.float64).T
+        mask, distances = geo.within_radius(latitude, longitude, lats, lngs, radius_km)
+        hits: List[Hit] = [(float(distances[i]), ids[i]) for i in np.flatnonzero(mask)]
+        hits.sort()
+        return hits
+
+    def in_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[int]:
+        """
+        Ids of points inside the box (edges inclusive).
+        """
+        x0, y0 = self._cell(min_lat, min_lng)
+        x1, y1 = self._cell(max_lat, max_lng)
+        with self._lock:
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+                cells = [cell for key, cell in self._cells.items() if x0 <= key[0] <= x1 and y0 <= key[1] <= y1]
+            else:
+                cells = [self._cells[(x, y)] for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in self._cells]
+            return [
+                incident_id
+                for cell in cells
+                for incident_id, (lat, lng) in cell.items()
+                if min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+            ]
+
+    def nearest(self, latitude: float, longitude: float, k: int, max_km: Optional[float] = None) -> List[Hit]:
+        """
+        Up to k (distance, id) pairs, nearest first, optionally only within max_km.
+        """
+        if k <= 0:
+            return []
+        cx, cy = self._cell(latitude, longitude)
+        best: List[Hit] = []
+        with self._lock:
+            if not self._cells:
+                return []
+            x0, y0, x1, y1 = self._bounds
+            max_ring = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+            ring = 0
+            while ring <= max_ring:
+                cells = [self._cells[key] for key in self._ring(cx, cy, ring) if key in self._cells]
+                if cells:
+                    ids = [incident_id for cell in cells for incident_id in cell]
+                    lats, lngs = np.array([p for cell in cells for p in cell.values()], dtype=np.float64).T
+                    distances = geo.haversine_km(latitude, longitude, lats, lngs)
+                    # Only this ring's k nearest can enter the result
+                    take = np.argpartition(distances, k - 1)[:k] if len(ids) > k else range(len(ids))
+                    best = sorted(best + [(float(distances[i]), ids[i]) for i in take])[:k]
+                # Anything outside this ring is at least `ring` cells away
+                floor_km = self._ring_floor_km(latitude, ring)
+                if len(best) == k and best[-1][0] <= floor_km:
+                    break
+                if max_km is not None and floor_km > max_km:
+                    break
+                ring += 1
+        if max_km is not None:
+            best = [hit for hit in best if hit[0] <= max_km]
+        return best
+
+    @staticmethod
+    def _ring(cx: int, cy: int, ring: int):
+        if ring == 0:
+            yield cx, cy
+            return
+        for dx in range(-ring, ring + 1):
+            yield cx + dx, cy - ring
+            yield cx + dx, cy + ring
+        for dy in range(-ring + 1, ring):
+            yield cx - ring, cy + dy
+            yield cx + ring, cy + dy
+
+    def _ring_floor_km(self, latitude: float, ring: int) -> float:
+        # Conservative lower bound on the distance to cells beyond `ring`
+        edge = min(abs(latitude) + (ring + 1) * self.cell_size_deg, 89.0)
+        return ring * self.cell_size_deg * KM_PER_DEG_LAT * cos(radians(edge))
+
+
+def hydrate(db: Session, hits: List[Hit]) -> List[models.Incident]:
+    """
+    Load only the matched incidents, preserving the hit order.
+    """
+    ids = [incident_id for _, incident_id in hits]
+    loaded: Dict[int, models.Incident] = {}
+    for start in range(0, len(ids), HYDRATE_CHUNK):
+        chunk = ids[start:start + HYDRATE_CHUNK]
+        for incident in db.query(models.Incident).filter(models.Incident.id.in_(chunk)):
+            loaded[incident.id] = incident
+    return [loaded[i] for i in ids if i in loaded]
+
+
+# Singleton instance
+incident_points = PointGridIndex()
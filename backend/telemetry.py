@@ -0,0 +1,251 @@
+"""
+In-memory latest-position store for units, fed by high-rate GPS telemetry.
+
+Fixes are applied to the store and the idle-unit index immediately (and
+queued for the coverage raster), but only the newest pending position per
+unit is kept for the database: a background flusher writes the pending set in
+one executemany UPDATE every TELEMETRY_FLUSH_SECONDS, so a unit reporting
+every second costs one row update per interval instead of one ORM round trip
+per fix. Unit rows changed
+elsewhere (create, PATCH, dispatch, other processes) are picked up by `sync()`
+on the `last_updated` watermark; a pending fix keeps precedence over the
+older database position until it is flushed.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .coverage import coverage_index
+from .timeutil import as_utc
+from .unit_index import idle_units
+
+logger = logging.getLogger("aegis.telemetry")
+
+PendingFix = Tuple[float, float]  # (latitude, longitude)
+
+
+class UnitState:
+    """
+    Latest known state of a unit; attribute-compatible with models.Unit for
+    the response schemas and the routing indexes.
+    """
+
+    __slots__ = ("id", "callsign", "unit_type", "status", "latitude", "longitude", "last_updated", "fixed_at")
+
+    def __init__(self, unit_id: int, callsign: str, unit_type: Optional[models.UserRole],
+                 status: Optional[models.UnitStatus], latitude: Optional[float], longitude: Optional[float],
+                 last_updated: Optional[datetime]):
+        self.id = unit_id
+        self.callsign = callsign
+        self.unit_type = unit_type
+        self.status = status
+        self.latitude = latitude
+        self.longitude = longitude
+        self.last_updated = last_updated
+        self.fixed_at = 0.0  # epoch seconds of the newest telemetry fix applied
+
+
+class UnitPositionStore:
+    """
+    Thread-safe. `record()` applies telemetry, `flush()` persists the coalesced
+    pending positions, `sync()` merges unit rows changed in the database.
+    """
+
+    def __init__(self):
+        self._units: Dict[int, UnitState] = {}
+        self._pending: Dict[int, PendingFix] = {}
+        self._watermark: Optional[datetime] = None
+        self._counters = {"accepted": 0, "stale": 0, "unknown": 0, "flushed": 0, "flushes": 0}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def _merge_locked(self, unit, keep_pending_position: bool) -> UnitState:
+        state = self._units.get(unit.id)
+        if state is None:
+            state = UnitState(unit.id, unit.callsign, unit.unit_type, unit.status, unit.latitude, unit.longitude, as_utc(unit.last_updated))
+            self._units[unit.id] = state
+            return state
+        state.callsign = unit.callsign
+        state.unit_type = unit.unit_type
+        state.status = unit.status
+        last_updated = as_utc(unit.last_updated)
+        if state.last_updated is None or (last_updated is not None and last_updated > state.last_updated):
+            state.last_updated = last_updated
+        if keep_pending_position and unit.id in self._pending:
+            return state
+        # An explicit position update supersedes any fix still waiting to be flushed
+        self._pending.pop(unit.id, None)
+        state.latitude = unit.latitude
+        state.longitude = unit.longitude
+        return state
+
+    def update_unit(self, unit: models.Unit, position_changed: bool = True) -> None:
+        """
+        Apply a committed unit row. With position_changed=False (status-only
+        changes) a pending telemetry fix keeps precedence over the row's position.
+        """
+        with self._lock:
+            state = self._merge_locked(unit, keep_pending_position=not position_changed)
+            idle_units.update_unit(state)
+            coverage_index.notify([state])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._units.clear()
+            self._pending.clear()
+            self._watermark = None
+
+    def rebuild(self, db: Session) -> None:
+        """
+        Reload every unit; also reloads the idle-unit index and coverage.
+        """
+        self.clear()
+        idle_units.clear()
+        coverage_index.clear()
+        self.sync(db)
+
+    def sync(self, db: Session) -> None:
+        query = db.query(models.Unit)
+        if self._watermark is not None:
+            # >= so rows sharing the watermark's (second-resolution) timestamp are not missed
+            query = query.filter(models.Unit.last_updated >= self._watermark)
+        rows = query.all()
+        if not rows:
+            return
+        with self._lock:
+            states = []
+            for row in rows:
+                # Our own flushes come back here too: their positions are not newer than the store's
+                states.append(self._merge_locked(row, keep_pending_position=True))
+                if row.last_updated is not None and (self._watermark is None or row.last_updated > self._watermark):
+                    self._watermark = row.last_updated
+            idle_units.update_units(states)
+            coverage_index.notify(states)
+
+    def record(self, fixes: Iterable[Tuple[int, float, float, Optional[datetime]]]) -> Dict[str, int]:
+        """
+        Apply (unit id, latitude, longitude, recorded_at) fixes. Fixes older than
+        the unit's newest applied fix are ignored as stale; unknown ids are counted.
+        """
+        now = time.time()
+        received = datetime.now(timezone.utc)
+        result = {"accepted": 0, "stale": 0, "unknown": 0}
+        with self._lock:
+            moved: Dict[int, UnitState] = {}
+            for unit_id, latitude, longitude, recorded_at in fixes:
+                state = self._units.get(unit_id)
+                if state is None:
+                    result["unknown"] += 1
+                    continue
+                fixed_at = min(as_utc(recorded_at).timestamp(), now) if recorded_at is not None else now
+                if fixed_at < state.fixed_at:
+                    result["stale"] += 1
+                    continue
+                state.fixed_at = fixed_at
+                state.latitude = latitude
+                state.longitude = longitude
+                state.last_updated = received
+                self._pending[unit_id] = (latitude, longitude)
+                moved[unit_id] = state
+                result["accepted"] += 1
+            idle_units.update_units(moved.values())
+            coverage_index.notify(moved.values())
+            for key, value in result.items():
+                self._counters[key] += value
+        return result
+
+    def flush(self, db: Session, final: bool = False) -> int:
+        """
+        Write the newest pending position of every moved unit in one statement
+        (every tick, so `final` changes nothing). Entries stay pending until the
+        commit succeeds, so a failed flush is retried on the next tick.
+        """
+        with self._lock:
+            batch = dict(self._pending)
+        if not batch:
+            return 0
+        statement = (
+            update(models.Unit.__table__)
+            .where(models.Unit.__table__.c.id == bindparam("unit_id"))
+            .values(latitude=bindparam("lat"), longitude=bindparam("lng"), last_updated=func.now())
+        )
+        db.execute(statement, [{"unit_id": unit_id, "lat": lat, "lng": lng} for unit_id, (lat, lng) in batch.items()])
+        db.commit()
+        with self._lock:
+            for unit_id, fix in batch.items():
+                # A newer fix that arrived during the write stays pending
+                if self._pending.get(unit_id) is fix:
+                    del self._pending[unit_id]
+            self._counters["flushed"] += len(batch)
+            self._counters["flushes"] += 1
+        return len(batch)
+
+    def get(self, unit_id: int) -> Optional[UnitState]:
+        with self._lock:
+            return self._units.get(unit_id)
+
+    def list(self, skip: int = 0, limit: Optional[int] = None) -> List[UnitState]:
+        with self._lock:
+            ids = sorted(self._units)
+            ids = ids[skip:] if limit is None else ids[skip:skip + limit]
+            return [self._units[unit_id] for unit_id in ids]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"units": len(self._units), "pending": len(self._pending), **self._counters}
+
+
+class TelemetryFlusher:
+    """
+    Background thread flushing the telemetry stores (anything with
+    `flush(db, final)`) every interval, and once more with final=True on stop.
+    """
+
+    def __init__(self, stores: Sequence, session_factory: Callable[[], Session], interval_seconds: float):
+        self.stores = list(stores)
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush(final=True)
+
+    def flush(self, final: bool = False) -> None:
+        db = self.session_factory()
+        try:
+            for store in self.stores:
+                try:
+                    store.flush(db, final=final)
+                except Exception:
+                    db.rollback()
+                    logger.exception("Telemetry flush failed for %s; data stays pending", type(store).__name__)
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.flush()
+
+
+# Singleton instance
+unit_positions = UnitPositionStore()
@@ -7,6 +7,7 @@ from sqlalchemy.orm import sessionmaker
 # Point the app to an in-memory DB before imports
 os.environ["DATABASE_URL"] = "sqlite:///:memory:"
 os.environ["APP_ENV"] = "test"
+os.environ["INTAKE_WORKERS"] = "0"
 
 from backend.database import Base, get_db  # noqa: E402
 from backend.main import app  # noqa: E402
@@ -170,6 +170,84 @@ def test_dedup_sets_potential_duplicate(client):
     assert body["potential_duplicate_id"] == first_id
 
 
+def test_dedup_matches_reworded_report(client):
+    first_resp = client.post(
+        "/incidents/",
+        json={
+            "title": "Fire at Merkato market",
+            "description": "Smoke rising over the stalls",
+            "latitude": 4.0,
+            "longitude": 4.0,
+            "incident_type": models.IncidentType.FIRE.value,
+            "severity": models.IncidentSeverity.MEDIUM.value,
+        },
+    )
+    first_id = first_resp.json()["id"]
+
+    second_resp = client.post(
+        "/incidents/",
+        json={
+            "title": "fire in merkato mkt",
+            "description": "flames",
+            "latitude": 4.0005,
+            "longitude": 4.0005,
+            "incident_type": models.IncidentType.FIRE.value,
+            "severity": models.IncidentSeverity.MEDIUM.value,
+        },
+    )
+    assert second_resp.status_code == 200
+    body = second_resp.json()
+    assert body["potential_duplicate_id"] == first_id
+    assert 0.5 <= body["duplicate_score"] <= 1.0
+
+
+def test_dedup_ignores_distant_same_title(client):
+    first_resp = client.post(
+        "/incidents/",
+        json={
+            "title": "Distant Title",
+            "description": "Smoke visible",
+            "latitude": 3.0,
+            "longitude": 3.0,
+            "incident_type": models.IncidentType.FIRE.value,
+            "severity": models.IncidentSeverity.MEDIUM.value,
+        },
+    )
+    assert first_resp.status_code == 200
+
+    # ~2 km north: outside the 0.5 km dedup radius
+    second_resp = client.post(
+        "/incidents/",
+        json={
+            "title": "Distant Title",
+            "description": "Another report",
+            "latitude": 3.018,
+            "longitude": 3.0,
+            "incident_type": models.IncidentType.FIRE.value,
+            "severity": models.IncidentSeverity.MEDIUM.value,
+        },
+    )
+    assert second_resp.status_code == 200
+    assert second_resp.json()["potential_duplicate_id"] is None
+
+
+def test_dedup_matches_titles_without_shingles(client):
+    # Emoji and one-letter titles have no MinHash signature; they still match on the exact title
+    for n, (title, repeat) in enumerate([("🔥", "🔥"), ("A", "a")]):
+        payload = {
+            "title": title,
+            "description": "",
+            "latitude": -5.0 - n * 0.01,
+            "longitude": 5.0,
+            "incident_type": models.IncidentType.FIRE.value,
+            "severity": models.IncidentSeverity.MEDIUM.value,
+        }
+        first_id = client.post("/incidents/", json=payload).json()["id"]
+        second_resp = client.post("/incidents/", json={**payload, "title": repeat, "latitude": payload["latitude"] + 0.0002})
+        assert second_resp.status_code == 200
+        assert second_resp.json()["potential_duplicate_id"] == first_id
+
+
 def test_bbox_and_near_queries(client):
     # Seed two incidents
     client.post(
@@ -204,6 +282,224 @@ def test_bbox_and_near_queries(client):
     assert len(near_resp.json()) >= 1
 
 
+def test_spatial_index_radius_and_nearest(client):
+    import random
+    from backend.ai_engine import ai_engine
+    from backend.routing import haversine
+    from backend.spatial_index import PointGridIndex
+
+    rng = random.Random(7)
+    index = PointGridIndex()
+    points = {i: (rng.uniform(8.8, 9.2), rng.uniform(38.6, 39.0)) for i in range(1, 400)}
+    for i, (lat, lng) in points.items():
+        index.add(i, lat, lng)
+    index.add(5, 9.0, 38.8)  # moved point
+    points[5] = (9.0, 38.8)
+
+    brute = sorted((haversine(9.0, 38.8, lat, lng), i) for i, (lat, lng) in points.items())
+    assert [i for _, i in index.within(9.0, 38.8, 3.0)] == [i for d, i in brute if d <= 3.0]
+    assert [i for _, i in index.nearest(9.0, 38.8, 10)] == [i for _, i in brute[:10]]
+    assert index.nearest(9.0, 38.8, 1)[0][1] == 5
+
+    # Rows written outside this process are picked up on the next query
+    db = next(get_db())
+    reporter = create_user(db, "index_reporter", models.UserRole.CITIZEN)
+    outside = models.Incident(
+        title="Written elsewhere",
+        reporter_id=reporter.id,
+        description="Test",
+        latitude=-40.0,
+        longitude=-40.0,
+        incident_type=models.IncidentType.FIRE,
+        severity=models.IncidentSeverity.LOW,
+        lexicon_version=ai_engine.lexicon_version,
+    )
+    db.add(outside)
+    db.commit()
+    outside_id = outside.id
+
+    nearest_resp = client.get("/incidents/nearest?lat=-40.01&lng=-40.01&k=1")
+    assert nearest_resp.status_code == 200
+    assert [i["id"] for i in nearest_resp.json()] == [outside_id]
+    near_resp = client.get("/incidents/near?lat=-40&lng=-40&radius_km=1")
+    assert [i["id"] for i in near_resp.json()] == [outside_id]
+    assert client.get("/incidents/nearest?lat=0&lng=0&k=0").status_code == 400
+
+
+def test_bbox_zoom_clusters(client):
+    for n, (lat, lng, severity) in enumerate([(-30.0, 120.0, "high"), (-30.001, 120.001, "low"), (-31.5, 121.5, "low")]):
+        resp = client.post("/incidents/", json={
+            "title": f"Cluster {n}",
+            "description": "Test",
+            "latitude": lat,
+            "longitude": lng,
+            "incident_type": models.IncidentType.FLOOD.value,
+            "severity": severity,
+        })
+        assert resp.status_code == 200
+    bbox = "min_lat=-32&max_lat=-29&min_lng=119&max_lng=122"
+
+    coarse = client.get(f"/incidents/bbox?{bbox}&zoom=3").json()
+    assert coarse["clustered"] is True and coarse["incidents"] == []
+    assert sum(c["count"] for c in coarse["clusters"]) == 3
+    assert coarse["clusters"][0]["type_mix"] == {"flood": coarse["clusters"][0]["count"]}
+
+    mid = client.get(f"/incidents/bbox?{bbox}&zoom=9").json()
+    counts = sorted(c["count"] for c in mid["clusters"])
+    assert counts == [1, 2]
+    pair = mid["clusters"][-1] if mid["clusters"][-1]["count"] == 2 else mid["clusters"][0]
+    assert sum(pair["severity_mix"].values()) == 2 and pair["incident_id"] is None
+    assert abs(pair["latitude"] - -30.0005) < 1e-6
+    single = next(c for c in mid["clusters"] if c["count"] == 1)
+    assert single["incident_id"] is not None
+
+    fine = client.get(f"/incidents/bbox?{bbox}&zoom=16").json()
+    assert fine["clustered"] is False and len(fine["incidents"]) == 3
+    assert len(client.get(f"/incidents/bbox?{bbox}").json()) == 3
+
+
+def test_cluster_keeps_remaining_incident_id():
+    from backend.clusters import ClusterIndex
+
+    index = ClusterIndex()
+    index.add(7, -33.0, 125.0, "high", "flood")
+    index.add(8, -33.001, 125.001, "low", "flood")
+    # Moving incident 7 away leaves incident 8 alone in its old cells
+    index.add(7, -35.0, 127.0, "high", "flood")
+    clusters = index.clusters(-33.5, 124.5, -32.5, 125.5, 9)
+    assert [(c["count"], c["incident_id"]) for c in clusters] == [(1, 8)]
+    assert index.clusters(-35.5, 126.5, -34.5, 127.5, 9)[0]["incident_id"] == 7
+
+
+def test_vector_tiles_and_invalidation(client):
+    from backend import mvt
+    from backend.tiles import lnglat_to_world
+
+    def tile_of(lat, lng, z):
+        wx, wy = lnglat_to_world(lng, lat)
+        return z, int(wx * 2 ** z), int(wy * 2 ** z)
+
+    def report(title, lat, lng):
+        return client.post("/incidents/", json={
+            "title": title,
+            "description": "Test",
+            "latitude": lat,
+            "longitude": lng,
+            "incident_type": models.IncidentType.HAZARD.value,
+            "severity": models.IncidentSeverity.MEDIUM.value,
+        }).json()["id"]
+
+    first = report("Tile A", 25.0, 55.0)
+    z, x, y = tile_of(25.0, 55.0, 16)
+    resp = client.get(f"/tiles/{z}/{x}/{y}.mvt")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    features = mvt.decode(resp.content)["incidents"]
+    assert [(f["id"], f["type"], f["properties"]["status"]) for f in features] == [(first, mvt.POINT, "pending")]
+    command, px, py = features[0]["geometry"]
+    assert command == (1 | 1 << 3) and 0 <= px >> 1 <= mvt.EXTENT and 0 <= py >> 1 <= mvt.EXTENT
+
+    etag = resp.headers["etag"]
+    assert client.get(f"/tiles/{z}/{x}/{y}.mvt", headers={"If-None-Match": etag}).status_code == 304
+
+    # A new incident in the same tile invalidates it at every zoom
+    second = report("Tile B", 25.0001, 55.0001)
+    updated = client.get(f"/tiles/{z}/{x}/{y}.mvt")
+    assert updated.headers["etag"] != etag
+    assert sorted(f["id"] for f in mvt.decode(updated.content)["incidents"]) == [first, second]
+
+    cz, cx, cy = tile_of(25.0, 55.0, 6)
+    clusters = mvt.decode(client.get(f"/tiles/{cz}/{cx}/{cy}.mvt").content)["incident_clusters"]
+    assert clusters[0]["properties"]["count"] == 2
+    assert clusters[0]["properties"]["top_type"] == "hazard"
+    assert client.get("/tiles/3/8/0.mvt").status_code == 404
+
+    # An in-flight render is dropped only when its own tile is invalidated
+    from backend.vector_tiles import TileCache
+    cache = TileCache(maxsize=16, ttl_seconds=60)
+    far = tile_of(-40.0, -70.0, 16)
+    own, other = cache.begin(z, x, y), cache.begin(*far)
+    cache.invalidate_point(25.0, 55.0)
+    cache.put(z, x, y, (b"a", "a"), own)
+    cache.put(*far, (b"b", "b"), other)
+    assert cache.get(z, x, y) is None
+    assert cache.get(*far) == (b"b", "b")
+
+
+def test_heatmap_aggregates(client):
+    from datetime import datetime, timedelta, timezone
+    from backend.heatmap import incident_heatmap
+
+    ids = []
+    for n, (lat, lng) in enumerate([(40.0, -100.0), (40.0005, -100.0005), (38.5, -101.5)]):
+        resp = client.post("/incidents/", json={
+            "title": f"Heat {n}",
+            "description": "Smoke and flames",
+            "latitude": lat,
+            "longitude": lng,
+            "incident_type": models.IncidentType.FIRE.value,
+        })
+        ids.append(resp.json()["id"])
+    db = next(get_db())
+    risks = {i.id: i.spatial_risk_index for i in db.query(models.Incident).filter(models.Incident.id.in_(ids))}
+    bbox = "min_lat=38&max_lat=41&min_lng=-102&max_lng=-99"
+
+    coarse = client.get(f"/analytics/heatmap?{bbox}&zoom=1").json()
+    assert [c["count"] for c in coarse["cells"]] == [3]
+    assert abs(coarse["cells"][0]["risk_sum"] - round(sum(risks.values()), 4)) < 1e-3
+
+    fine = client.get(f"/analytics/heatmap?{bbox}&zoom=10").json()
+    assert sorted(c["count"] for c in fine["cells"]) == [1, 2]
+    assert fine["max_count"] == 2
+
+    future = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    assert client.get(f"/analytics/heatmap?{bbox}&zoom=1", params={"start": future}).json()["cells"] == []
+    past = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    assert client.get(f"/analytics/heatmap?{bbox}&zoom=1", params={"start": past}).json()["max_count"] == 3
+
+    incident_heatmap.update_risk([(ids[2], risks[ids[2]] + 1.0)])
+    updated = client.get(f"/analytics/heatmap?{bbox}&zoom=1").json()
+    assert abs(updated["cells"][0]["risk_sum"] - coarse["cells"][0]["risk_sum"] - 1.0) < 1e-3
+
+
+def test_incident_districts(client):
+    from backend.jurisdictions import JurisdictionIndex
+
+    inside = client.post("/incidents/", json={
+        "title": "District check",
+        "description": "Smoke",
+        "latitude": 9.0,
+        "longitude": 38.77,
+        "incident_type": models.IncidentType.FIRE.value,
+    }).json()
+    assert (inside["admin_district"], inside["police_district"], inside["fire_district"]) == ("ADM-ADDIS-CENTRAL", "PD-1", "FD-1")
+    outside = client.post("/incidents/", json={
+        "title": "District check",
+        "description": "Smoke",
+        "latitude": 8.96,
+        "longitude": 38.745,
+        "incident_type": models.IncidentType.FIRE.value,
+    }).json()
+    assert (outside["admin_district"], outside["police_district"]) == ("ADM-ADDIS-CENTRAL", None)
+
+    queue = client.get("/incidents/?police_district=PD-1&limit=1000").json()
+    ids = {i["id"] for i in queue}
+    assert inside["id"] in ids and outside["id"] not in ids
+    stats = client.get("/analytics/districts?kind=police").json()
+    pd1 = next(d for d in stats["districts"] if d["district"] == "PD-1")
+    assert pd1["total"] == len(ids)
+    assert client.get("/analytics/districts?kind=county").status_code == 400
+
+    index = JurisdictionIndex()
+    index.load({"police_districts": [
+        {"id": "BIG", "bbox": [0.0, 0.0, 1.0, 1.0]},
+        {"id": "TRI", "polygon": [[0.1, 0.1], [0.5, 0.1], [0.1, 0.5]]},
+    ]})
+    assert index.resolve(0.15, 0.15)["police_district"] == "TRI"
+    assert index.resolve(0.45, 0.45)["police_district"] == "BIG"
+    assert index.resolve(2.0, 2.0)["police_district"] is None
+
+
 def test_nearest_unit_and_proximity_alerts(client):
     db = next(get_db())
     u = models.Unit(
@@ -240,6 +536,269 @@ def test_nearest_unit_and_proximity_alerts(client):
     assert body["unit_id"] == u.id
 
 
+def test_nearest_unit_candidates_follow_unit_changes(client):
+    db = next(get_db())
+    admin = create_user(db, "unitadmin", models.UserRole.SYS_ADMIN)
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    ids = []
+    for n, offset in enumerate([0.01, 0.02, 0.03]):
+        resp = client.post("/units/", headers=headers, json={
+            "callsign": f"KD-{n}", "unit_type": "fire", "latitude": 50.0 + offset, "longitude": 50.0,
+        })
+        ids.append(resp.json()["id"])
+
+    body = client.get("/routing/nearest_unit?lat=50&lng=50&unit_type=fire&k=3").json()
+    assert body["unit_id"] == ids[0]
+    assert [c["unit_id"] for c in body["candidates"]] == ids
+    assert body["candidates"][0]["distance_km"] < body["candidates"][1]["distance_km"]
+
+    client.patch(f"/units/{ids[0]}", headers=headers, json={"status": "busy"})
+    client.patch(f"/units/{ids[2]}", headers=headers, json={"latitude": 50.001})
+    body = client.get("/routing/nearest_unit?lat=50&lng=50&unit_type=fire&k=2").json()
+    assert [c["unit_id"] for c in body["candidates"]] == [ids[2], ids[1]]
+
+    incident = client.post("/incidents/", json={
+        "title": "Unit dispatch", "description": "Smoke", "latitude": 50.0, "longitude": 50.0, "incident_type": "fire",
+    }).json()
+    client.patch(f"/incidents/{incident['id']}?status=dispatched&unit_id={ids[2]}", headers=headers)
+    assert client.get("/routing/nearest_unit?lat=50&lng=50&unit_type=fire").json()["unit_id"] == ids[1]
+    client.patch(f"/incidents/{incident['id']}?status=resolved", headers=headers)
+    assert client.get("/routing/nearest_unit?lat=50&lng=50&unit_type=fire").json()["unit_id"] == ids[2]
+    assert client.get("/routing/nearest_unit?lat=50&lng=50&k=0").status_code == 400
+
+
+def test_nearest_unit_ranks_by_road_eta(client):
+    from backend.road_graph import RoadGraph, road_router
+
+    db = next(get_db())
+    admin = create_user(db, "roadadmin", models.UserRole.SYS_ADMIN)
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    road_router.load(RoadGraph.from_geojson({"type": "FeatureCollection", "features": [
+        # Closer unit on a slow street, farther unit on a fast road, third behind a one-way
+        {"type": "Feature", "properties": {"highway": "living_street", "maxspeed": "5"},
+         "geometry": {"type": "LineString", "coordinates": [[60.02, 60.0], [60.0, 60.0]]}},
+        {"type": "Feature", "properties": {"highway": "primary", "maxspeed": "100"},
+         "geometry": {"type": "LineString", "coordinates": [[59.97, 60.0], [60.0, 60.0]]}},
+        {"type": "Feature", "properties": {"oneway": "yes"},
+         "geometry": {"type": "LineString", "coordinates": [[60.0, 60.0], [60.0, 59.99]]}},
+    ]}))
+    try:
+        # Stopped at the fastest origin, the slower one is left unsettled
+        etas = road_router.etas_to(60.0, 60.0, [(60.0, 60.02), (60.0, 59.97)], limit=1)
+        assert etas[0] is None and etas[1][1] == "road"
+        road_router.cache.clear()
+
+        ids = []
+        for n, lng in enumerate([60.02, 59.97]):
+            ids.append(client.post("/units/", headers=headers, json={
+                "callsign": f"ROAD-{n}", "unit_type": "police", "latitude": 60.0, "longitude": lng,
+            }).json()["id"])
+        body = client.get("/routing/nearest_unit?lat=60&lng=60&unit_type=police&k=2").json()
+        assert [c["unit_id"] for c in body["candidates"]] == [ids[1], ids[0]]
+        assert body["candidates"][0]["distance_km"] > body["candidates"][1]["distance_km"]
+        assert body["eta_source"] == "road"
+        assert abs(body["candidates"][1]["eta_minutes"] - body["candidates"][1]["distance_km"] / 5 * 60) < 0.1
+        assert client.get("/routing/nearest_unit?lat=60&lng=60&unit_type=police&k=1").json()["unit_id"] == ids[1]
+
+        # Against the one-way direction there is no road path
+        assert client.get("/routing/eta?from_lat=59.99&from_lng=60&to_lat=60&to_lng=60").json()["eta_source"] == "straight_line"
+        assert client.get("/routing/eta?from_lat=60&from_lng=60&to_lat=59.99&to_lng=60").json()["eta_source"] == "road"
+        assert client.get("/routing/stats").json()["eta_cache"]["hits"] >= 0
+    finally:
+        road_router.load(RoadGraph.from_base_layers())
+
+
+def test_assign_batch_prefers_urgent_incidents(client):
+    db = next(get_db())
+    admin = create_user(db, "batchadmin", models.UserRole.SYS_ADMIN)
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    incident_ids = []
+    for lng, incident_type, severity in [
+        (70.0, "fire", models.IncidentSeverity.LOW),
+        (70.01, "fire", models.IncidentSeverity.CRITICAL),
+        (70.1, "crime", models.IncidentSeverity.MEDIUM),
+    ]:
+        incident_id = client.post("/incidents/", json={
+            "title": "Batch", "description": "Batch", "latitude": 70.0, "longitude": lng, "incident_type": incident_type,
+        }).json()["id"]
+        db.query(models.Incident).filter(models.Incident.id == incident_id).update({"severity": severity})
+        incident_ids.append(incident_id)
+    db.commit()
+    unit_ids = [
+        client.post("/units/", headers=headers, json={
+            "callsign": callsign, "unit_type": unit_type, "latitude": 70.0, "longitude": lng,
+        }).json()["id"]
+        for callsign, unit_type, lng in [("BATCH-F", "fire", 70.001), ("BATCH-P", "police", 70.002)]
+    ]
+
+    resp = client.post("/routing/assign_batch", headers=headers, json={"incident_ids": incident_ids, "unit_ids": unit_ids})
+    assert resp.status_code == 200
+    plan = resp.json()
+    # The only fire unit goes to the critical fire even though the low one is closer
+    pairs = {(a["incident_id"], a["unit_id"]) for a in plan["assignments"]}
+    assert pairs == {(incident_ids[1], unit_ids[0]), (incident_ids[2], unit_ids[1])}
+    assert plan["unassigned_incident_ids"] == [incident_ids[0]]
+    assert plan["idle_unit_ids"] == []
+
+    tight = client.post("/routing/assign_batch", headers=headers, json={
+        "incident_ids": incident_ids, "unit_ids": unit_ids, "max_eta_minutes": 1,
+    }).json()
+    assert {a["incident_id"] for a in tight["assignments"]} == {incident_ids[1]}
+
+
+def test_unit_telemetry_updates_store_and_flushes(client):
+    from backend.telemetry import unit_positions
+
+    db = next(get_db())
+    admin = create_user(db, "gpsadmin", models.UserRole.SYS_ADMIN)
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    unit_id = client.post("/units/", headers=headers, json={
+        "callsign": "GPS-1", "unit_type": "medical", "latitude": 75.0, "longitude": 75.0,
+    }).json()["id"]
+
+    resp = client.post("/units/telemetry", headers=headers, json={"fixes": [
+        {"unit_id": unit_id, "latitude": 75.01, "longitude": 75.0, "recorded_at": "2026-01-01T10:00:00Z"},
+        {"unit_id": unit_id, "latitude": 75.02, "longitude": 75.0, "recorded_at": "2026-01-01T10:00:05Z"},
+        {"unit_id": unit_id, "latitude": 75.0, "longitude": 75.0, "recorded_at": "2026-01-01T09:59:00Z"},
+        {"unit_id": 999999, "latitude": 75.0, "longitude": 75.0},
+    ]})
+    assert resp.json() == {"accepted": 2, "stale": 1, "unknown": 1}
+    assert client.post("/units/telemetry", json={"fixes": []}).status_code == 401
+
+    # Served from the store before anything reaches the table
+    listed = {u["id"]: u for u in client.get("/units/?limit=1000").json()}
+    assert listed[unit_id]["latitude"] == 75.02
+    assert db.query(models.Unit.latitude).filter(models.Unit.id == unit_id).scalar() == 75.0
+    nearest = client.get("/routing/nearest_unit?lat=75.02&lng=75&unit_type=medical").json()
+    assert nearest["unit_id"] == unit_id and nearest["distance_km"] < 0.01
+
+    # A status-only change keeps the pending position
+    client.patch(f"/units/{unit_id}", headers=headers, json={"status": "offline"})
+    assert unit_positions.get(unit_id).latitude == 75.02
+    assert unit_positions.flush(db) >= 1
+    db.expire_all()
+    assert db.query(models.Unit.latitude).filter(models.Unit.id == unit_id).scalar() == 75.02
+    assert unit_positions.stats()["pending"] == 0
+
+
+def test_unit_track_storage_and_downsampling(client):
+    from backend.tracks import decode_points, encode_points, unit_tracks
+
+    points = [(7200, 9_000_000, 38_700_000), (7201, 9_000_135, 38_699_990), (7199, -1, 0)]
+    assert decode_points(encode_points(points, 7200), 7200) == points
+
+    db = next(get_db())
+    admin = create_user(db, "trackadmin", models.UserRole.SYS_ADMIN)
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    unit_id = client.post("/units/", headers=headers, json={
+        "callsign": "TRACK-1", "unit_type": "police", "latitude": 76.0, "longitude": 76.0,
+    }).json()["id"]
+
+    # Three minutes at 1 Hz, sent newest batch first
+    fixes = [
+        {"unit_id": unit_id, "latitude": 76.0 + i * 1e-4, "longitude": 76.0, "recorded_at": f"2026-01-01T10:{i // 60:02d}:{i % 60:02d}Z"}
+        for i in range(180)
+    ]
+    client.post("/units/telemetry", headers=headers, json={"fixes": fixes[90:]})
+    client.post("/units/telemetry", headers=headers, json={"fixes": fixes[:90]})
+    client.post("/units/telemetry", headers=headers, json={"fixes": [{"unit_id": unit_id, "latitude": 76.5, "longitude": 76.0}]})
+
+    window = "start=2026-01-01T09:59:00Z&end=2026-01-01T10:05:00Z"
+    track = client.get(f"/units/{unit_id}/track?{window}", headers=headers).json()["points"]
+    assert len(track) == 180
+    assert track[1]["latitude"] == 76.0001 and track[1]["recorded_at"].startswith("2026-01-01T10:00:01")
+    recent = client.get(f"/units/{unit_id}/track", headers=headers).json()["points"]
+    assert [p["latitude"] for p in recent] == [76.5]
+
+    # Writing the chunks also compacts hours older than the raw retention
+    unit_tracks.flush(db, final=True)
+    unit_tracks.compact(db)
+    assert unit_tracks.pending() == 0
+    chunks = db.query(models.UnitTrackChunk).filter(models.UnitTrackChunk.unit_id == unit_id).all()
+    assert {c.resolution_seconds for c in chunks} == {0, 60}
+    downsampled = client.get(f"/units/{unit_id}/track?{window}", headers=headers).json()["points"]
+    assert [p["recorded_at"][11:19] for p in downsampled] == ["10:00:00", "10:01:00", "10:02:00"]
+
+    assert client.get(f"/units/{unit_id}/track?start=2026-01-01T00:00:00Z&end=2026-02-01T00:00:00Z", headers=headers).status_code == 400
+    assert client.get("/units/999999/track", headers=headers).status_code == 404
+
+
+def test_coverage_grid_follows_unit_changes(client):
+    from backend.road_graph import RoadGraph, road_router
+
+    db = next(get_db())
+    admin = create_user(db, "coveradmin", models.UserRole.SYS_ADMIN)
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    # ~3.9 km of 60 km/h road: about 4 minutes end to end
+    road_router.load(RoadGraph.from_geojson({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"maxspeed": "60"},
+         "geometry": {"type": "LineString", "coordinates": [[80.0, 80.0], [80.2, 80.0]]}},
+    ]}))
+    try:
+        unit_id = client.post("/units/", headers=headers, json={
+            "callsign": "COVER-1", "unit_type": "fire", "latitude": 80.0, "longitude": 80.0,
+        }).json()["id"]
+
+        def cells(**params):
+            resp = client.get("/routing/coverage", params={"unit_type": "fire", "minutes": 2, **params})
+            assert resp.status_code == 200
+            return {
+                round(f["geometry"]["coordinates"][0][0][0], 3): f["properties"]
+                for f in resp.json()["features"] if abs(f["geometry"]["coordinates"][0][0][1] - 80.0) < 1e-6
+            }
+
+        row = cells()
+        assert row[80.0]["covered"] and row[80.0]["eta_minutes"] < 2
+        assert not row[80.195]["covered"] and 4 < row[80.195]["eta_minutes"] < 6
+        resp = client.get("/routing/coverage?unit_type=fire&minutes=2")
+        assert client.get("/routing/coverage?unit_type=fire&minutes=2", headers={"If-None-Match": resp.headers["etag"]}).status_code == 304
+
+        # Busy: the unit's catchment empties
+        client.patch(f"/units/{unit_id}", headers=headers, json={"status": "busy"})
+        assert all(p["eta_minutes"] is None for p in cells().values())
+
+        # Idle again at the far end: coverage moves with it
+        client.patch(f"/units/{unit_id}", headers=headers, json={"status": "idle"})
+        client.post("/units/telemetry", headers=headers, json={"fixes": [{"unit_id": unit_id, "latitude": 80.0, "longitude": 80.2}]})
+        row = cells()
+        assert row[80.195]["covered"] and not row[80.0]["covered"]
+        assert set(cells(uncovered_only="true")) == {k for k, p in row.items() if not p["covered"]}
+        assert client.get("/routing/coverage?minutes=0").status_code == 400
+    finally:
+        road_router.load(RoadGraph.from_base_layers())
+
+
 def test_command_overview_and_proximity_alert_creation(client):
     db = next(get_db())
     admin = create_user(db, "cmdadmin", models.UserRole.SYS_ADMIN)
@@ -335,3 +894,469 @@ def test_mission_and_annotation_flow(client):
     list_ann = client.get("/annotations/")
     assert list_ann.status_code == 200
     assert len(list_ann.json()) >= 1
+
+
+def test_geofence_hits_at_intake(client):
+    from datetime import datetime
+    from types import SimpleNamespace
+    from backend.geofences import GeofenceIndex
+
+    db = next(get_db())
+    admin = create_user(db, "fenceadmin", models.UserRole.SYS_ADMIN)
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    zone = client.post("/annotations/", headers=headers, json={
+        "annotation_type": "safe_zone", "label": "Stadium", "latitude": 30.0, "longitude": 30.0, "radius_m": 500,
+    }).json()
+    alert = client.post("/alerts/proximity?lat=30.0&lng=30.01&radius_km=2", headers=headers).json()
+
+    inside_both = client.post("/incidents/", json={
+        "title": "Fence check", "description": "Crowd", "incident_type": "other", "latitude": 30.001, "longitude": 30.001,
+    }).json()
+    hits = client.get(f"/incidents/{inside_both['id']}/geofences").json()
+    assert {(h["fence_kind"], h["fence_id"]) for h in hits} == {("annotation", zone["id"]), ("alert", alert["id"])}
+    assert hits[0]["fence_type"] == "safe_zone"
+
+    alert_only = client.post("/incidents/", json={
+        "title": "Fence check", "description": "Crowd", "incident_type": "other", "latitude": 30.0, "longitude": 30.025,
+    }).json()
+    assert [h["fence_kind"] for h in client.get(f"/incidents/{alert_only['id']}/geofences").json()] == ["alert"]
+    zone_hits = client.get(f"/geofences/hits?fence_kind=annotation&fence_id={zone['id']}").json()
+    assert [h["incident_id"] for h in zone_hits] == [inside_both["id"]]
+    assert client.get("/geofences/match?lat=30.2&lng=30.2").json() == []
+
+    index = GeofenceIndex(cell_size_deg=0.01, alert_ttl_hours=1)
+    index.add_annotation(SimpleNamespace(id=1, annotation_type="staging_area", label=None, latitude=0.0, longitude=0.0, radius_m=500_000))
+    index.add_alert(SimpleNamespace(id=1, title="Old", latitude=0.0, longitude=0.0, radius_km=5, created_at=datetime(2000, 1, 1)))
+    assert [h["fence_id"] for h in index.match(3.0, 3.0)] == [1]
+    assert len(index) == 1
+
+
+def test_bulk_incident_ingestion(client):
+    db = next(get_db())
+    admin = create_user(db, "feedadmin", models.UserRole.SYS_ADMIN)
+    token_resp = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    token = token_resp.json()["access_token"]
+
+    items = [
+        {
+            "title": "River gauge flood warning",
+            "description": "Water level rising fast",
+            "latitude": 6.0,
+            "longitude": 6.0,
+            "incident_type": models.IncidentType.FLOOD.value,
+            "source": models.IncidentSource.SENSOR.value,
+        },
+        {
+            "title": "River gauge flood warning",
+            "description": "Water level rising fast",
+            "latitude": 6.0001,
+            "longitude": 6.0001,
+            "incident_type": models.IncidentType.FLOOD.value,
+            "source": models.IncidentSource.SENSOR.value,
+        },
+        {
+            "title": "Heavy rain cell",
+            "description": "Rain expected",
+            "latitude": 7.0,
+            "longitude": 7.0,
+            "incident_type": models.IncidentType.OTHER.value,
+            "source": models.IncidentSource.WEATHER.value,
+        },
+    ]
+    resp = client.post("/incidents/bulk", json=items, headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["created"] == 3
+    results = body["results"]
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[1]["potential_duplicate_id"] == results[0]["id"]
+    assert body["alerts_created"] >= 2
+
+    listed = {i["id"]: i for i in client.get("/incidents/?limit=1000").json()}
+    assert listed[results[0]["id"]]["source"] == models.IncidentSource.SENSOR.value
+    assert isinstance(listed[results[0]["id"]]["suggested_agencies"], list)
+
+    anon = client.post("/incidents/bulk", json=items)
+    assert anon.status_code == 401
+
+
+def test_stream_incident_ingestion(client):
+    import json
+
+    db = next(get_db())
+    admin = create_user(db, "streamadmin", models.UserRole.SYS_ADMIN)
+    token_resp = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    token = token_resp.json()["access_token"]
+
+    lines = [
+        json.dumps({
+            "title": f"Sensor {i}",
+            "description": "Smoke detector triggered",
+            "latitude": 8.0 + i * 0.01,
+            "longitude": 8.0,
+            "incident_type": models.IncidentType.FIRE.value,
+            "source": models.IncidentSource.SENSOR.value,
+        })
+        for i in range(5)
+    ]
+    lines.insert(2, "{not json")
+    body = ("\n".join(lines) + "\n").encode()
+    resp = client.post(
+        "/incidents/stream",
+        content=body,
+        headers={"Authorization": f"Bearer {token}", "content-type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    summary = resp.json()
+    assert summary["received"] == 6
+    assert summary["created"] == 5
+    assert summary["rejected"] == 1
+    assert summary["errors"][0]["line"] == 3
+
+
+def test_async_intake_ticket(client):
+    import time
+
+    resp = client.post(
+        "/incidents/async",
+        json={
+            "title": "Async Report",
+            "description": "Car crash on ring road",
+            "latitude": 9.5,
+            "longitude": 9.5,
+            "incident_type": models.IncidentType.ACCIDENT.value,
+        },
+    )
+    assert resp.status_code == 202
+    ticket = resp.json()
+    assert ticket["status"] in ["queued", "processing", "done"]
+
+    for _ in range(50):
+        status_resp = client.get(f"/incidents/tickets/{ticket['id']}")
+        assert status_resp.status_code == 200
+        if status_resp.json()["status"] == "done":
+            break
+        time.sleep(0.1)
+    body = status_resp.json()
+    assert body["status"] == "done"
+    assert body["incident_id"] is not None
+
+    assert client.get("/incidents/tickets/does-not-exist").status_code == 404
+
+
+def test_intake_ticket_claim_is_exclusive(client):
+    from datetime import datetime, timedelta, timezone
+    from backend import schemas
+    from backend.intake_queue import IntakeWorkerPool, create_ticket
+
+    db = next(get_db())
+    report = schemas.IncidentCreate(
+        title="Claimed ticket", description="Smoke from a shed", latitude=-7.0, longitude=7.0,
+        incident_type=models.IncidentType.FIRE,
+    )
+    ticket = create_ticket(db, report, None, models.IncidentSource.CITIZEN)
+    pool = IntakeWorkerPool(workers=0, lease_seconds=60)
+
+    # Another process holds the claim: this worker skips the ticket and a live lease is not requeued
+    other_claim = pool._claim(db, ticket.id)
+    assert other_claim is not None and pool._claim(db, ticket.id) is None
+    pool.process(ticket.id)
+    pool._requeue_pending()
+    db.refresh(ticket)
+    assert ticket.status == models.TicketStatus.PROCESSING and ticket.incident_id is None
+
+    # Past the lease the ticket is released and enriched once; the old holder can no longer complete it
+    db.query(models.IntakeTicket).filter(models.IntakeTicket.id == ticket.id).update(
+        {"claimed_at": datetime.now(timezone.utc) - timedelta(seconds=120)}, synchronize_session=False
+    )
+    db.commit()
+    pool._requeue_pending()
+    db.refresh(ticket)
+    assert ticket.status == models.TicketStatus.DONE and ticket.incident_id is not None
+    assert not pool._finish(db, ticket.id, other_claim, status=models.TicketStatus.FAILED)
+    db.rollback()
+    assert db.query(models.Incident).filter(models.Incident.title == "Claimed ticket").count() == 1
+
+
+def test_idempotent_report_replay(client):
+    db = next(get_db())
+    user = create_user(db, "pwa_citizen", models.UserRole.CITIZEN)
+    token_resp = client.post(
+        "/token",
+        data={"username": user.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    token = token_resp.json()["access_token"]
+
+    payload = {
+        "title": "Offline Report",
+        "description": "Flooding on the bridge",
+        "latitude": 11.5,
+        "longitude": 11.5,
+        "incident_type": models.IncidentType.FLOOD.value,
+    }
+    headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "pwa-sync-1"}
+    first = client.post("/incidents/", json=payload, headers=headers)
+    assert first.status_code == 200
+    count = db.query(models.Incident).count()
+
+    replay = client.post("/incidents/", json=payload, headers=headers)
+    assert replay.status_code == 200
+    assert replay.headers.get("Idempotent-Replayed") == "true"
+    assert replay.json()["id"] == first.json()["id"]
+    assert db.query(models.Incident).count() == count
+
+    # Same key with a different body is rejected
+    changed = client.post("/incidents/", json={**payload, "title": "Other"}, headers=headers)
+    assert changed.status_code == 422
+
+    incident_id = first.json()["id"]
+    comment_headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "pwa-comment-1"}
+    c1 = client.post(f"/incidents/{incident_id}/comments/", json={"content": "Water rising"}, headers=comment_headers)
+    c2 = client.post(f"/incidents/{incident_id}/comments/", json={"content": "Water rising"}, headers=comment_headers)
+    assert c1.status_code == c2.status_code == 200
+    assert c1.json()["id"] == c2.json()["id"]
+    assert len(client.get(f"/incidents/{incident_id}/comments/").json()) == 1
+
+
+def test_triage_matcher_matches_substring_scan():
+    from backend.ai_engine import ai_engine
+
+    def expected(text):
+        text = text.lower()
+        severity = models.IncidentSeverity.LOW
+        for level, keywords in [
+            (models.IncidentSeverity.CRITICAL, ai_engine.critical_keywords),
+            (models.IncidentSeverity.HIGH, ai_engine.high_keywords),
+            (models.IncidentSeverity.MEDIUM, ai_engine.medium_keywords),
+        ]:
+            if any(k in text for k in keywords):
+                severity = level
+                break
+        incident_type = next((t for t, ks in ai_engine.type_map.items() if any(k in text for k in ks)), models.IncidentType.OTHER)
+        return severity, incident_type
+
+    samples = [
+        "Building BURNING after the crash",  # overlapping burn/burning, fire listed before accident
+        "Abuse reported at the bus stop",
+        "Car hit a pole, wire down",
+        "ጎርፍ በመንገድ ላይ",
+        "loud noise",
+        "nothing to see",
+        "",
+    ]
+    for text in samples:
+        result = ai_engine.analyze(text)
+        assert (result["severity"], result["incident_type"]) == expected(text)
+
+    # Batch triage returns the same per-text results
+    assert ai_engine.analyze_batch(samples).rows() == [ai_engine.analyze(text) for text in samples]
+
+
+def test_triage_cache_counters_and_invalidation(client):
+    from backend.ai_engine import AIEngine
+
+    engine = AIEngine(cache_size=2)
+    first = engine.analyze("Fire at Bole")
+    assert engine.analyze("  fire at bole") == first
+    assert (engine.cache.hits, engine.cache.misses) == (1, 1)
+    engine.analyze("crash")
+    engine.analyze("flood")
+    assert engine.cache.evictions == 1
+
+    # A lexicon change bumps the version, so old entries are never served
+    version = engine.lexicon_version
+    engine.medium_keywords.append("bole")
+    engine.compile()
+    assert engine.lexicon_version != version
+    assert engine.analyze("Fire at Bole")["severity"] == first["severity"]
+    assert engine.analyze("quiet bole street")["severity"] == models.IncidentSeverity.MEDIUM
+
+    db = next(get_db())
+    admin = create_user(db, "triage_admin", models.UserRole.SYS_ADMIN)
+    token_resp = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    token = token_resp.json()["access_token"]
+    stats = client.get("/triage/stats", headers={"Authorization": f"Bearer {token}"})
+    assert stats.status_code == 200
+    assert {"hits", "misses", "evictions"} <= set(stats.json()["cache"])
+
+
+def test_classifier_pool_and_keyword_fallback(tmp_path):
+    import time
+    from backend.ai_engine import AIEngine
+    from backend.classifier import ClassifierPool, NaiveBayesClassifier
+
+    texts = ["smoke from the roof", "house burning", "man collapsed not breathing", "patient needs ambulance"]
+    labels = ["fire", "fire", "medical", "medical"]
+    model_path = tmp_path / "nb.json"
+    NaiveBayesClassifier.train(texts, labels, version="test").save(str(model_path))
+
+    pool = ClassifierPool(str(model_path), workers=1, budget_ms=10000)
+    pool.start()
+    try:
+        engine = AIEngine(cache_size=0)
+        engine.use_classifier(pool)
+        # Keywords alone say OTHER; the model recognises the medical report
+        assert engine.analyze("collapsed, not breathing")["incident_type"] == models.IncidentType.MEDICAL
+        batch = engine.analyze_batch(["house burning", "collapsed, not breathing"])
+        assert list(batch.incident_type) == [models.IncidentType.FIRE, models.IncidentType.MEDICAL]
+        # Batches larger than one chunk come back whole, in order
+        predictions = pool.predict_batch(["house burning"] * 250 + ["patient needs ambulance"] * 200)
+        assert len(predictions) == 450
+        assert predictions[0][0] == "fire" and predictions[-1][0] == "medical"
+
+        # Over budget: the caller gives up while the job keeps the only worker busy,
+        # so the next live report falls back to keywords at once instead of queueing
+        pool.budget_ms = 1
+        assert pool.predict(["vehicle collision " * 200] * 2000) is None
+        pool.budget_ms = 10000
+        started = time.perf_counter()
+        assert engine.analyze("vehicle collision on the ring road")["incident_type"] == models.IncidentType.ACCIDENT
+        assert time.perf_counter() - started < 0.5
+        stats = engine.metrics.stats()
+        assert stats["fallbacks"] == 1
+        assert stats["compared"] == 3
+        assert "naive_bayes" in stats["backends"] and "keyword" in stats["backends"]
+    finally:
+        pool.stop()
+
+
+def test_lexicon_hot_reload(client, tmp_path):
+    import json
+    import os
+    import time
+    from backend.ai_engine import AIEngine, ai_engine
+    from backend.lexicon import DEFAULT_LEXICON_PATH, LexiconWatcher
+
+    resp = client.post("/incidents/", json={
+        "title": "Lexicon Report",
+        "description": "Smoke over the depot",
+        "latitude": 12.5,
+        "longitude": 12.5,
+        "incident_type": models.IncidentType.FIRE.value,
+    })
+    assert resp.json()["lexicon_version"] == ai_engine.lexicon_version
+
+    with open(DEFAULT_LEXICON_PATH, encoding="utf-8") as fh:
+        data = json.load(fh)
+    path = tmp_path / "lexicon.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    engine = AIEngine(cache_size=10, lexicon_path=str(path))
+    assert engine.analyze("sinkhole on main street")["severity"] == models.IncidentSeverity.LOW
+    assert engine.reload() is False
+
+    watcher = LexiconWatcher(engine, 0.05)
+    watcher.start()
+    try:
+        data["version"] = "2"
+        data["severity"]["high"].append("sinkhole")
+        path.write_text(json.dumps(data), encoding="utf-8")
+        os.utime(path, (time.time() + 5, time.time() + 5))
+        for _ in range(100):
+            if engine.lexicon_version == "2":
+                break
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+    result = engine.analyze("sinkhole on main street")
+    assert (result["severity"], result["lexicon_version"]) == (models.IncidentSeverity.HIGH, "2")
+
+
+def test_retriage_backfill_resumes_from_cursor(client):
+    from backend import database, retriage
+    from backend.ai_engine import AIEngine
+
+    db = next(get_db())
+    ids = []
+    for n in range(3):
+        resp = client.post("/incidents/", json={
+            "title": f"Backfill {n}",
+            "description": "Smoke and flames from a warehouse",
+            "latitude": 13.0 + n,
+            "longitude": 13.0,
+            "incident_type": models.IncidentType.FIRE.value,
+        })
+        ids.append(resp.json()["id"])
+    first = db.query(models.Incident).filter(models.Incident.id == ids[0]).first()
+    expected, triaged_severity = first.spread_risk, first.severity
+    # Simulate stale triage output
+    db.query(models.Incident).filter(models.Incident.id.in_(ids)).update(
+        {"spread_risk": 0.0, "lexicon_version": "old", "ai_confidence": 0.01}, synchronize_session=False
+    )
+    # Severities the text alone would not give: re-derived unless a human verified the row
+    admin = create_user(db, "retriageadmin", models.UserRole.SYS_ADMIN)
+    db.query(models.Incident).filter(models.Incident.id.in_(ids[1:])).update(
+        {"severity": models.IncidentSeverity.CRITICAL}, synchronize_session=False
+    )
+    db.query(models.Incident).filter(models.Incident.id == ids[2]).update(
+        {"verified_by_id": admin.id}, synchronize_session=False
+    )
+    db.commit()
+
+    # Completed jobs are not resumed, so the run below starts a fresh job
+    db.query(models.BackfillJob).update({"status": models.JobStatus.DONE})
+    db.commit()
+
+    # One chunk then "crash": the cursor is persisted with the chunk
+    job_id = retriage.run_retriage(database.SessionLocal, stale_only=True, chunk_size=2, sleep_ms=0, max_chunks=1)
+    job = db.query(models.BackfillJob).filter(models.BackfillJob.id == job_id).first()
+    db.refresh(job)
+    assert job.status == models.JobStatus.RUNNING
+    assert job.processed == 2
+
+    # A chunk that raised leaves the job failed; the next run resumes it from the cursor
+    job.status, job.error = models.JobStatus.FAILED, "database is locked"
+    db.commit()
+    assert retriage.latest_unfinished_job(db).id == job_id
+    assert retriage.run_retriage(database.SessionLocal, chunk_size=2, sleep_ms=0) == job_id
+    db.refresh(job)
+    assert job.status == models.JobStatus.DONE and job.error is None
+    assert job.processed == 3
+    db.expire_all()
+    for incident in db.query(models.Incident).filter(models.Incident.id.in_(ids[:2])):
+        assert incident.lexicon_version != "old" and incident.ai_confidence != 0.01
+        assert incident.severity == triaged_severity
+        assert incident.spread_risk == expected
+    critical = db.query(models.Incident).filter(models.Incident.id == ids[2]).first()
+    cues = AIEngine.risk_cues(critical.incident_type, models.IncidentSeverity.CRITICAL)
+    assert critical.severity == models.IncidentSeverity.CRITICAL
+    # Labels kept, so the row is not stamped as re-derived under the current lexicon
+    assert critical.lexicon_version == "old" and critical.ai_confidence == 0.01
+    assert critical.spread_risk == cues["spread_risk"]
+    risk_index = 0.4 * cues["escalation_probability"] + 0.3 * cues["spread_risk"] + 0.3 * cues["casualty_likelihood"]
+    assert abs(critical.spatial_risk_index - risk_index) < 1e-9
+
+    # The endpoint says when it resumes a failed job instead of starting the requested one
+    failed = models.BackfillJob(name=retriage.JOB_NAME, status=models.JobStatus.FAILED, stale_only=1,
+                                last_id=ids[-1], max_id=ids[-1], processed=3, error="timeout")
+    db.add(failed)
+    db.commit()
+    token = client.post(
+        "/token",
+        data={"username": admin.username, "password": "testpass"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    ).json()["access_token"]
+    body = client.post("/triage/backfill?stale_only=false", headers={"Authorization": f"Bearer {token}"}).json()
+    retriage.retriage_runner.stop()
+    assert body["id"] == failed.id and body["resumed"] is True
+    assert "stale_only=True" in body["detail"]
+    db.refresh(failed)
+    assert failed.status == models.JobStatus.DONE
@@ -0,0 +1,51 @@
+"""
+Web Mercator (EPSG:3857) helpers shared by map clustering and tile serving.
+
+World coordinates are normalized to [0, 1) on both axes, with y growing south,
+so the tile/cell containing a point at zoom z is floor(world * 2**z * cells).
+"""
+from math import atan, exp, floor, log, pi, radians, tan, degrees
+from typing import Iterator, Tuple
+
+MAX_LATITUDE = 85.05112878
+TILE_SIZE = 256
+
+
+def lnglat_to_world(longitude: float, latitude: float) -> Tuple[float, float]:
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    x = (longitude + 180.0) / 360.0
+    y = 0.5 - log(tan(pi / 4 + radians(latitude) / 2)) / (2 * pi)
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def world_to_lnglat(x: float, y: float) -> Tuple[float, float]:
+    longitude = x * 360.0 - 180.0
+    latitude = degrees(2 * atan(exp((0.5 - y) * 2 * pi)) - pi / 2)
+    return longitude, latitude
+
+
+def world_to_cell(x: float, y: float, divisions: int) -> Tuple[int, int]:
+    return floor(x * divisions), floor(y * divisions)
+
+
+def tile_bounds(z: int, x: int, y: int, buffer: float = 0.0) -> Tuple[float, float, float, float]:
+    """
+    (min_lng, min_lat, max_lng, max_lat) of an XYZ tile, optionally grown by
+    `buffer` tile widths on every side.
+    """
+    n = 2 ** z
+    min_lng, max_lat = world_to_lnglat(max(x - buffer, 0) / n, max(y - buffer, 0) / n)
+    max_lng, min_lat = world_to_lnglat(min(x + 1 + buffer, n) / n, min(y + 1 + buffer, n) / n)
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def tiles_covering(longitude: float, latitude: float, max_zoom: int, buffer: float = 0.0) -> Iterator[Tuple[int, int, int]]:
+    """
+    Every (z, x, y) for zooms 0..max_zoom whose (buffered) extent contains the point.
+    """
+    wx, wy = lnglat_to_world(longitude, latitude)
+    for z in range(max_zoom + 1):
+        n = 2 ** z
+        for x in range(max(floor(wx * n - buffer), 0), min(floor(wx * n + buffer), n - 1) + 1):
+            for y in range(max(floor(wy * n - buffer), 0), min(floor(wy * n + buffer), n - 1) + 1):
+                yield z, x, y
@@ -0,0 +1,25 @@
+"""
+Timestamp helpers shared by the in-memory indexes and request handlers.
+
+SQLite returns naive timestamps; they are stored as UTC, and naive
+timestamps from clients are taken as UTC too.
+"""
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    The timestamp with naive values taken as UTC; None stays None.
+    """
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def epoch_seconds(value: Optional[datetime]) -> float:
+    """
+    Epoch seconds of the timestamp (naive taken as UTC), or now when None.
+    """
+    return as_utc(value).timestamp() if value is not None else time.time()
@@ -0,0 +1,235 @@
+"""
+Unit movement history: append-only track chunks, one or more per unit and hour.
+
+Fixes are buffered per (unit, hour) and written as a chunk row once the hour
+is over, the buffer is TRACK_SEGMENT_SECONDS old, or it holds
+MAX_SEGMENT_POINTS points. A chunk stores its points as zigzag varints of the
+deltas between consecutive (second, latitude e6, longitude e6) triples, so a
+vehicle reporting at 1 Hz costs about 5 bytes per point. Chunks older than
+TRACK_RAW_RETENTION_HOURS are compacted to one point per
+TRACK_DOWNSAMPLE_SECONDS (one chunk per unit and hour). A track query reads
+only the chunks of the requested unit and hours through the
+(unit_id, hour) index.
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import get_settings
+
+settings = get_settings()
+
+COORD_SCALE = 1e6  # 1e-6 deg is ~0.11 m
+MAX_SEGMENT_POINTS = 3600
+COMPACT_INTERVAL_SECONDS = 600.0
+COMPACT_MAX_GROUPS = 500  # (unit, hour) groups per compaction pass
+RAW = 0  # resolution_seconds of chunks that hold every fix
+
+TrackPoint = Tuple[int, float, float]  # (epoch seconds, latitude, longitude)
+_Encoded = Tuple[int, int, int]  # (epoch seconds, latitude e6, longitude e6)
+BufferKey = Tuple[int, int]  # (unit id, epoch hour)
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    value = (value << 1) ^ (value >> 63)  # zigzag: small negatives stay short
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_points(points: List[_Encoded], base_ts: int) -> bytes:
+    """
+    Delta + zigzag varint encoding of time-ordered points; the first point is
+    relative to (base_ts, 0, 0).
+    """
+    out = bytearray()
+    prev_t, prev_lat, prev_lng = base_ts, 0, 0
+    for t, lat, lng in points:
+        _write_varint(out, t - prev_t)
+        _write_varint(out, lat - prev_lat)
+        _write_varint(out, lng - prev_lng)
+        prev_t, prev_lat, prev_lng = t, lat, lng
+    return bytes(out)
+
+
+def decode_points(data: bytes, base_ts: int) -> List[_Encoded]:
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append((value >> 1) ^ -(value & 1))
+        value = shift = 0
+    points = []
+    t, lat, lng = base_ts, 0, 0
+    for i in range(0, len(values) - 2, 3):
+        t += values[i]
+        lat += values[i + 1]
+        lng += values[i + 2]
+        points.append((t, lat, lng))
+    return points
+
+
+def downsample(points: List[_Encoded], step_seconds: int) -> List[_Encoded]:
+    """
+    First point of every step_seconds bucket of time-ordered points.
+    """
+    kept = []
+    last_bucket = None
+    for point in points:
+        bucket = point[0] // step_seconds
+        if bucket != last_bucket:
+            kept.append(point)
+            last_bucket = bucket
+    return kept
+
+
+def _chunk(unit_id: int, hour: int, points: List[_Encoded], resolution_seconds: int) -> models.UnitTrackChunk:
+    points.sort()
+    return models.UnitTrackChunk(
+        unit_id=unit_id,
+        hour=hour,
+        resolution_seconds=resolution_seconds,
+        point_count=len(points),
+        start_ts=points[0][0],
+        end_ts=points[-1][0],
+        data=encode_points(points, hour * 3600),
+    )
+
+
+class TrackStore:
+    """
+    Thread-safe buffer in front of the unit_track_chunks table.
+    """
+
+    def __init__(self, segment_seconds: float = 300.0, raw_retention_hours: float = 24.0, downsample_seconds: int = 60):
+        self.segment_seconds = segment_seconds
+        self.raw_retention_seconds = raw_retention_hours * 3600.0
+        self.downsample_seconds = downsample_seconds
+        self._buffers: Dict[BufferKey, List[_Encoded]] = {}
+        self._opened: Dict[BufferKey, float] = {}
+        self._next_compact = 0.0
+        self._lock = threading.Lock()
+
+    def append(self, fixes: Iterable[Tuple[int, float, float, float]]) -> int:
+        """
+        Buffer (unit id, latitude, longitude, epoch seconds) fixes.
+        """
+        opened = time.monotonic()
+        count = 0
+        with self._lock:
+            for unit_id, latitude, longitude, ts in fixes:
+                t = int(ts)
+                key = (unit_id, t // 3600)
+                buffer = self._buffers.get(key)
+                if buffer is None:
+                    buffer = self._buffers[key] = []
+                    self._opened[key] = opened
+                buffer.append((t, round(latitude * COORD_SCALE), round(longitude * COORD_SCALE)))
+                count += 1
+        return count
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(buffer) for buffer in self._buffers.values())
+
+    def _take_due_locked(self, final: bool) -> Dict[BufferKey, List[_Encoded]]:
+        current_hour = int(time.time()) // 3600
+        stale_before = time.monotonic() - self.segment_seconds
+        due = [
+            key for key, buffer in self._buffers.items()
+            if final or key[1] < current_hour or self._opened[key] <= stale_before or len(buffer) >= MAX_SEGMENT_POINTS
+        ]
+        taken = {}
+        for key in due:
+            taken[key] = self._buffers.pop(key)
+            del self._opened[key]
+        return taken
+
+    def flush(self, db: Session, final: bool = False) -> int:
+        """
+        Write every due buffer as a raw chunk (all of them when final), then
+        run a compaction pass if one is due. Returns the points written.
+        """
+        with self._lock:
+            taken = self._take_due_locked(final)
+        if taken:
+            try:
+                db.add_all([_chunk(unit_id, hour, points, RAW) for (unit_id, hour), points in taken.items()])
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Put the points back so the next tick retries them
+                with self._lock:
+                    for key, points in taken.items():
+                        self._buffers.setdefault(key, []).extend(points)
+                        self._opened.setdefault(key, time.monotonic())
+                raise
+        if time.monotonic() >= self._next_compact:
+            self._next_compact = time.monotonic() + COMPACT_INTERVAL_SECONDS
+            self.compact(db)
+        return sum(len(points) for points in taken.values())
+
+    def compact(self, db: Session, now: Optional[float] = None, max_groups: int = COMPACT_MAX_GROUPS) -> int:
+        """
+        Merge the chunks of each (unit, hour) that still holds raw points and is
+        older than the raw retention into one downsampled chunk. Returns the
+        number of groups compacted.
+        """
+        now = time.time() if now is None else now
+        cutoff_hour = int(now - self.raw_retention_seconds) // 3600
+        groups = db.query(models.UnitTrackChunk.unit_id, models.UnitTrackChunk.hour).filter(
+            models.UnitTrackChunk.resolution_seconds == RAW,
+            models.UnitTrackChunk.hour < cutoff_hour,
+        ).distinct().limit(max_groups).all()
+        for unit_id, hour in groups:
+            chunks = db.query(models.UnitTrackChunk).filter(
+                models.UnitTrackChunk.unit_id == unit_id,
+                models.UnitTrackChunk.hour == hour,
+            ).all()
+            points = []
+            for chunk in chunks:
+                points.extend(decode_points(chunk.data, hour * 3600))
+                db.delete(chunk)
+            points.sort()
+            db.add(_chunk(unit_id, hour, downsample(points, self.downsample_seconds), self.downsample_seconds))
+        if groups:
+            db.commit()
+        return len(groups)
+
+    def query(self, db: Session, unit_id: int, start_ts: float, end_ts: float) -> List[TrackPoint]:
+        """
+        Time-ordered (epoch seconds, latitude, longitude) of a unit within
+        [start_ts, end_ts], including points not yet written.
+        """
+        start, end = int(start_ts), int(end_ts)
+        chunks = db.query(models.UnitTrackChunk.hour, models.UnitTrackChunk.data).filter(
+            models.UnitTrackChunk.unit_id == unit_id,
+            models.UnitTrackChunk.hour >= start // 3600,
+            models.UnitTrackChunk.hour <= end // 3600,
+            models.UnitTrackChunk.start_ts <= end,
+            models.UnitTrackChunk.end_ts >= start,
+        ).all()
+        points = []
+        for hour, data in chunks:
+            points.extend(decode_points(data, hour * 3600))
+        with self._lock:
+            for (buffered_unit, hour), buffer in self._buffers.items():
+                if buffered_unit == unit_id and start // 3600 <= hour <= end // 3600:
+                    points.extend(buffer)
+        points.sort()
+        return [(t, lat / COORD_SCALE, lng / COORD_SCALE) for t, lat, lng in points if start <= t <= end]
+
+
+# Singleton instance
+unit_tracks = TrackStore(
+    segment_seconds=settings.track_segment_seconds,
+    raw_retention_hours=settings.track_raw_retention_hours,
+    downsample_seconds=settings.track_downsample_seconds,
+)
@@ -0,0 +1,205 @@
+"""
+Per-unit-type k-d trees over idle units, for nearest-unit dispatch queries.
+
+Positions are stored as 3-D unit vectors on the sphere, so straight-line
+(chord) distance orders points exactly like great-circle distance and there
+is no longitude wrap or latitude distortion to correct for. Each unit type
+has a balanced static tree plus a small insert buffer (scanned linearly, kept
+around sqrt(n)) and a set of removed ids; the tree is rebuilt when either
+outgrows its bound, which keeps queries near O(log n) with cheap amortized
+updates.
+"""
+import heapq
+import threading
+from math import asin, cos, isqrt, radians, sin
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import models
+from .routing import EARTH_RADIUS_KM
+
+Point = Tuple[float, float, float]
+Hit = Tuple[float, int]  # (distance km, unit id)
+
+REBUILD_FRACTION = 0.25
+MIN_REBUILD = 32
+
+
+def to_xyz(latitude: float, longitude: float) -> Point:
+    phi, lmb = radians(latitude), radians(longitude)
+    return cos(phi) * cos(lmb), cos(phi) * sin(lmb), sin(phi)
+
+
+def chord_to_km(squared_chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * asin(min(squared_chord ** 0.5 / 2.0, 1.0))
+
+
+def _sq(a: Point, b: Point) -> float:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+def _offer(heap: List[Tuple[float, int]], k: int, d: float, unit_id: int) -> None:
+    # Max-heap of the k best as (-squared distance, id)
+    if len(heap) < k:
+        heapq.heappush(heap, (-d, unit_id))
+    elif d < -heap[0][0]:
+        heapq.heapreplace(heap, (-d, unit_id))
+
+
+class _KDTree:
+    """
+    Static balanced 3-d tree in flat arrays: the node for [lo, hi) sits at the
+    median index, its children cover [lo, mid) and [mid + 1, hi).
+    """
+
+    def __init__(self, items: List[Tuple[int, Point]]):
+        items = list(items)
+        self._build(items, 0, len(items), 0)
+        self.ids = [item[0] for item in items]
+        self.points = [item[1] for item in items]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _build(self, items: List[Tuple[int, Point]], lo: int, hi: int, depth: int) -> None:
+        if hi - lo <= 1:
+            return
+        axis = depth % 3
+        items[lo:hi] = sorted(items[lo:hi], key=lambda item: item[1][axis])
+        mid = (lo + hi) // 2
+        self._build(items, lo, mid, depth + 1)
+        self._build(items, mid + 1, hi, depth + 1)
+
+    def search(self, target: Point, k: int, removed: Set[int], heap: List[Tuple[float, int]],
+               lo: int = 0, hi: Optional[int] = None, depth: int = 0) -> None:
+        if hi is None:
+            hi = len(self.ids)
+        if lo >= hi:
+            return
+        mid = (lo + hi) // 2
+        point = self.points[mid]
+        if self.ids[mid] not in removed:
+            _offer(heap, k, _sq(target, point), self.ids[mid])
+        axis = depth % 3
+        diff = target[axis] - point[axis]
+        if diff < 0:
+            near, far = (lo, mid), (mid + 1, hi)
+        else:
+            near, far = (mid + 1, hi), (lo, mid)
+        self.search(target, k, removed, heap, near[0], near[1], depth + 1)
+        # The far side can only hold closer points if the splitting plane is in range
+        if len(heap) < k or diff * diff < -heap[0][0]:
+            self.search(target, k, removed, heap, far[0], far[1], depth + 1)
+
+
+class _TypeIndex:
+    def __init__(self):
+        self.tree = _KDTree([])
+        self.buffer: Dict[int, Point] = {}  # inserted since the last rebuild
+        self.removed: Set[int] = set()  # tree entries no longer idle/moved
+        self.live: Dict[int, Point] = {}
+
+    def upsert(self, unit_id: int, point: Point) -> None:
+        if unit_id in self.live and unit_id not in self.buffer:
+            self.removed.add(unit_id)
+        self.live[unit_id] = point
+        self.buffer[unit_id] = point
+
+    def discard(self, unit_id: int) -> None:
+        if self.live.pop(unit_id, None) is None:
+            return
+        if self.buffer.pop(unit_id, None) is None:
+            # Still in the tree (a buffered re-insert already tombstoned it)
+            self.removed.add(unit_id)
+
+    def maybe_rebuild(self) -> None:
+        # The buffer is scanned linearly on every query, so it stays ~sqrt(n);
+        # tombstones only cost a skipped node and may grow to a fraction of n
+        size = len(self.tree)
+        if len(self.buffer) > max(MIN_REBUILD, isqrt(size)) or len(self.removed) > max(MIN_REBUILD, REBUILD_FRACTION * size):
+            self.tree = _KDTree(list(self.live.items()))
+            self.buffer.clear()
+            self.removed.clear()
+
+    def search(self, target: Point, k: int, heap: List[Tuple[float, int]]) -> None:
+        self.tree.search(target, k, self.removed, heap)
+        for unit_id, point in self.buffer.items():
+            _offer(heap, k, _sq(target, point), unit_id)
+
+
+class IdleUnitIndex:
+    """
+    Idle, located units keyed by unit type. Thread-safe. Fed only by the unit
+    position store (telemetry.UnitPositionStore), which also picks up units
+    changed by other processes.
+    """
+
+    def __init__(self):
+        self._types: Dict[models.UserRole, _TypeIndex] = {}
+        self._unit_types: Dict[int, models.UserRole] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._unit_types)
+
+    def _discard_locked(self, unit_id: int) -> None:
+        unit_type = self._unit_types.pop(unit_id, None)
+        if unit_type is not None:
+            self._types[unit_type].discard(unit_id)
+
+    def _update_locked(self, unit_id: int, unit_type: Optional[models.UserRole], status: Optional[models.UnitStatus],
+                       latitude: Optional[float], longitude: Optional[float]) -> None:
+        if status != models.UnitStatus.IDLE or latitude is None or longitude is None or unit_type is None:
+            self._discard_locked(unit_id)
+            return
+        if self._unit_types.get(unit_id) not in (None, unit_type):
+            self._discard_locked(unit_id)
+        self._unit_types[unit_id] = unit_type
+        self._types.setdefault(unit_type, _TypeIndex()).upsert(unit_id, to_xyz(latitude, longitude))
+
+    def update(self, unit_id: int, unit_type: Optional[models.UserRole], status: Optional[models.UnitStatus],
+               latitude: Optional[float], longitude: Optional[float]) -> None:
+        """
+        Track a unit's latest state: indexed while IDLE and located, dropped otherwise.
+        """
+        with self._lock:
+            self._update_locked(unit_id, unit_type, status, latitude, longitude)
+            for index in self._types.values():
+                index.maybe_rebuild()
+
+    def update_unit(self, unit: models.Unit) -> None:
+        self.update(unit.id, unit.unit_type, unit.status, unit.latitude, unit.longitude)
+
+    def update_units(self, units: Iterable[models.Unit]) -> None:
+        """
+        Batched update_unit(): one rebuild check for the whole batch.
+        """
+        with self._lock:
+            for unit in units:
+                self._update_locked(unit.id, unit.unit_type, unit.status, unit.latitude, unit.longitude)
+            for index in self._types.values():
+                index.maybe_rebuild()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._types.clear()
+            self._unit_types.clear()
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1,
+                unit_type: Optional[models.UserRole] = None) -> List[Hit]:
+        """
+        Up to k (distance km, unit id) pairs, nearest first.
+        """
+        target = to_xyz(latitude, longitude)
+        heap: List[Tuple[float, int]] = []
+        with self._lock:
+            if unit_type is None:
+                indexes = list(self._types.values())
+            else:
+                indexes = [self._types[unit_type]] if unit_type in self._types else []
+            for index in indexes:
+                index.search(target, k, heap)
+        return sorted((chord_to_km(-d), unit_id) for d, unit_id in heap)
+
+
+# Singleton instance
+idle_units = IdleUnitIndex()
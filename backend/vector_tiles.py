@@ -0,0 +1,264 @@
+"""
+Vector tile rendering and caching for the map dashboard.
+
+A tile holds up to four layers:
+  incident_clusters  zoom <= CLUSTER_MAX_ZOOM, from the in-memory cluster index
+  incidents          finer zooms; ST_AsMVT on Postgres, grid index + encoder otherwise
+  annotations        map annotations (ST_AsMVT on Postgres)
+  base               static GIS base layers
+
+Rendered tiles are kept in an LRU cache. Writes invalidate every cached tile
+(at every zoom) whose buffered extent contains the changed point, including
+renders of those tiles still in flight; a TTL bounds staleness from writes
+made by other API workers.
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from . import models, mvt
+from .clusters import incident_clusters
+from .config import get_settings
+from .layers import BASE_LAYERS
+from .lru import LRUCache
+from .spatial_index import HYDRATE_CHUNK, incident_points
+from .tiles import tile_bounds, tiles_covering
+
+settings = get_settings()
+
+MAX_TILE_ZOOM = 20
+BUFFER_FRACTION = mvt.BUFFER / mvt.EXTENT
+SEVERITY_RANK = {s.value: rank for rank, s in enumerate(models.IncidentSeverity)}
+
+Tile = Tuple[bytes, str]  # (content, etag)
+TileKey = Tuple[int, int, int]  # (z, x, y)
+
+
+class TileCache:
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._cache = LRUCache(maxsize)
+        # Tiles with renders in flight: key -> [renders, invalidation version]
+        self._rendering: Dict[TileKey, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, z: int, x: int, y: int) -> Optional[Tile]:
+        entry = self._cache.get((z, x, y))
+        if entry is None:
+            return None
+        expires_at, tile = entry
+        if expires_at < time.monotonic():
+            self._cache.pop((z, x, y))
+            return None
+        return tile
+
+    def begin(self, z: int, x: int, y: int) -> int:
+        """
+        Register a render of the tile; pass the returned version to `put()`.
+        """
+        with self._lock:
+            entry = self._rendering.setdefault((z, x, y), [0, 0])
+            entry[0] += 1
+            return entry[1]
+
+    def put(self, z: int, x: int, y: int, tile: Optional[Tile], version: int) -> None:
+        """
+        End a render started with `begin()` and cache its tile, unless that tile
+        was invalidated in the meantime (the render may be stale). tile=None
+        (a failed render) only ends it.
+        """
+        key = (z, x, y)
+        with self._lock:
+            entry = self._rendering[key]
+            entry[0] -= 1
+            current = entry[1] == version
+            if entry[0] == 0:
+                del self._rendering[key]
+            if tile is not None and current:
+                self._cache.put(key, (time.monotonic() + self.ttl_seconds, tile))
+
+    def invalidate_point(self, latitude: Optional[float], longitude: Optional[float]) -> None:
+        if latitude is None or longitude is None:
+            return
+        with self._lock:
+            for key in tiles_covering(longitude, latitude, MAX_TILE_ZOOM, BUFFER_FRACTION):
+                self._cache.pop(key)
+                entry = self._rendering.get(key)
+                if entry is not None:
+                    entry[1] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            for entry in self._rendering.values():
+                entry[1] += 1
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+# Singleton instance
+tile_cache = TileCache(settings.tile_cache_size, settings.tile_cache_ttl_seconds)
+
+
+def _intersects(bounds: Tuple[float, float, float, float], min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> bool:
+    return not (max_lng < bounds[0] or min_lng > bounds[2] or max_lat < bounds[1] or min_lat > bounds[3])
+
+
+def _base_layer(z: int, x: int, y: int, bounds: Tuple[float, float, float, float]) -> bytes:
+    layer = mvt.LayerBuilder("base")
+    for layer_name, items in BASE_LAYERS.items():
+        for item in items:
+            props = {"layer": layer_name, "name": item.get("name") or item.get("type")}
+            if "bbox" in item:
+                w, s, e, n = item["bbox"]
+                if _intersects(bounds, w, s, e, n):
+                    ring = [mvt.project(lng, lat, z, x, y) for lng, lat in ((w, s), (e, s), (e, n), (w, n))]
+                    layer.add_feature(mvt.POLYGON, mvt.polygon_geometry(ring), props)
+            elif "coords" in item:
+                lngs = [c[0] for c in item["coords"]]
+                lats = [c[1] for c in item["coords"]]
+                if _intersects(bounds, min(lngs), min(lats), max(lngs), max(lats)):
+                    line = [mvt.project(lng, lat, z, x, y) for lng, lat in item["coords"]]
+                    layer.add_feature(mvt.LINESTRING, mvt.linestring_geometry(line), props)
+            else:
+                if "center" in item:
+                    lat, lng = item["center"]
+                    props["radius_km"] = item.get("radius_km")
+                else:
+                    lat, lng = item["lat"], item["lng"]
+                if _intersects(bounds, lng, lat, lng, lat):
+                    layer.add_feature(mvt.POINT, mvt.point_geometry([mvt.project(lng, lat, z, x, y)]), props)
+    return layer.encode()
+
+
+def _cluster_layer(z: int, x: int, y: int) -> bytes:
+    layer = mvt.LayerBuilder("incident_clusters")
+    min_lng, min_lat, max_lng, max_lat = tile_bounds(z, x, y)
+    per_tile = incident_clusters.cells_per_tile
+    for cluster in incident_clusters.clusters(min_lat, min_lng, max_lat, max_lng, z):
+        _, cx, cy = (int(part) for part in cluster["cluster_id"].split("/"))
+        # Edge cells of neighbouring tiles can fall inside an inclusive bbox
+        if cx // per_tile != x or cy // per_tile != y:
+            continue
+        point = mvt.project(cluster["longitude"], cluster["latitude"], z, x, y)
+        layer.add_feature(mvt.POINT, mvt.point_geometry([point]), {
+            "count": cluster["count"],
+            "max_severity": max(cluster["severity_mix"], key=SEVERITY_RANK.get),
+            "top_type": max(cluster["type_mix"], key=cluster["type_mix"].get),
+            "incident_id": cluster["incident_id"],
+        })
+    return layer.encode()
+
+
+def _incident_layer(db: Session, z: int, x: int, y: int, bounds: Tuple[float, float, float, float]) -> bytes:
+    incident_points.sync(db)
+    ids = incident_points.in_bbox(bounds[1], bounds[0], bounds[3], bounds[2])
+    layer = mvt.LayerBuilder("incidents")
+    for start in range(0, len(ids), HYDRATE_CHUNK):
+        rows = db.query(
+            models.Incident.id,
+            models.Incident.latitude,
+            models.Incident.longitude,
+            models.Incident.severity,
+            models.Incident.incident_type,
+            models.Incident.status,
+        ).filter(models.Incident.id.in_(ids[start:start + HYDRATE_CHUNK])).order_by(models.Incident.id)
+        for row in rows:
+            point = mvt.project(row.longitude, row.latitude, z, x, y)
+            layer.add_feature(mvt.POINT, mvt.point_geometry([point]), {
+                "severity": row.severity,
+                "incident_type": row.incident_type,
+                "status": row.status,
+            }, feature_id=row.id)
+    return layer.encode()
+
+
+def _annotation_layer(db: Session, z: int, x: int, y: int, bounds: Tuple[float, float, float, float]) -> bytes:
+    rows = db.query(models.MapAnnotation).filter(
+        models.MapAnnotation.longitude >= bounds[0],
+        models.MapAnnotation.latitude >= bounds[1],
+        models.MapAnnotation.longitude <= bounds[2],
+        models.MapAnnotation.latitude <= bounds[3],
+    ).order_by(models.MapAnnotation.id)
+    layer = mvt.LayerBuilder("annotations")
+    for ann in rows:
+        point = mvt.project(ann.longitude, ann.latitude, z, x, y)
+        layer.add_feature(mvt.POINT, mvt.point_geometry([point]), {
+            "annotation_type": ann.annotation_type,
+            "label": ann.label,
+            "radius_m": ann.radius_m,
+            "mission_id": ann.mission_id,
+        }, feature_id=ann.id)
+    return layer.encode()
+
+
+_PG_INCIDENTS = text("""
+    WITH bounds AS (SELECT ST_TileEnvelope(:z, :x, :y) AS geom)
+    SELECT ST_AsMVT(t.*, 'incidents', :extent, 'geom', 'id') FROM (
+        SELECT i.id,
+               lower(i.severity::text) AS severity,
+               lower(i.incident_type::text) AS incident_type,
+               lower(i.status::text) AS status,
+               ST_AsMVTGeom(ST_Transform(i.geometry, 3857), bounds.geom, :extent, :buffer, true) AS geom
+        FROM incidents i, bounds
+        WHERE i.geometry && ST_Transform(ST_TileEnvelope(:z, :x, :y, margin => :margin), 4326)
+    ) t
+""")
+
+_PG_ANNOTATIONS = text("""
+    WITH bounds AS (SELECT ST_TileEnvelope(:z, :x, :y) AS geom)
+    SELECT ST_AsMVT(t.*, 'annotations', :extent, 'geom', 'id') FROM (
+        SELECT a.id, a.annotation_type, a.label, a.radius_m, a.mission_id,
+               ST_AsMVTGeom(ST_Transform(ST_SetSRID(ST_MakePoint(a.longitude, a.latitude), 4326), 3857),
+                            bounds.geom, :extent, :buffer, true) AS geom
+        FROM map_annotations a, bounds
+        WHERE a.longitude BETWEEN :min_lng AND :max_lng AND a.latitude BETWEEN :min_lat AND :max_lat
+    ) t
+""")
+
+
+def _pg_layer(db: Session, query, params: Dict) -> bytes:
+    content = db.execute(query, params).scalar()
+    return bytes(content) if content else b""
+
+
+def render_tile(db: Session, z: int, x: int, y: int) -> bytes:
+    bounds = tile_bounds(z, x, y, BUFFER_FRACTION)
+    layers: List[bytes] = []
+    if z <= incident_clusters.max_zoom:
+        incident_clusters.sync(db)
+        layers.append(_cluster_layer(z, x, y))
+    if models.IS_POSTGRES:
+        params = {
+            "z": z, "x": x, "y": y, "extent": mvt.EXTENT, "buffer": mvt.BUFFER, "margin": BUFFER_FRACTION,
+            "min_lng": bounds[0], "min_lat": bounds[1], "max_lng": bounds[2], "max_lat": bounds[3],
+        }
+        if z > incident_clusters.max_zoom:
+            layers.append(_pg_layer(db, _PG_INCIDENTS, params))
+        layers.append(_pg_layer(db, _PG_ANNOTATIONS, params))
+    else:
+        if z > incident_clusters.max_zoom:
+            layers.append(_incident_layer(db, z, x, y, bounds))
+        layers.append(_annotation_layer(db, z, x, y, bounds))
+    layers.append(_base_layer(z, x, y, bounds))
+    # Tile messages concatenate: each encoded layer is a repeated field 3
+    return b"".join(layers)
+
+
+def get_tile(db: Session, z: int, x: int, y: int) -> Tile:
+    tile = tile_cache.get(z, x, y)
+    if tile is not None:
+        return tile
+    version = tile_cache.begin(z, x, y)
+    tile = None
+    try:
+        content = render_tile(db, z, x, y)
+        tile = (content, hashlib.blake2b(content, digest_size=8).hexdigest())
+    finally:
+        tile_cache.put(z, x, y, tile, version)
+    return tile
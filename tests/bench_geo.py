@@ -0,0 +1,79 @@
+"""
+Benchmark: per-row scalar haversine loops (the previous nearest_unit,
+proximity_alerts and incidents_near implementations) vs. the vectorized
+kernels in backend.geo, plus the grid index radius query. Also checks that
+distances and radius masks agree.
+
+Run from the repo root:
+    python tests/bench_geo.py [--points 1000 10000 100000 1000000] [--radius-km 5]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import geo  # noqa: E402
+from backend.routing import haversine  # noqa: E402
+from backend.spatial_index import PointGridIndex  # noqa: E402
+
+ORIGIN = (9.03, 38.74)  # Addis Ababa
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="*", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--radius-km", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    lat, lng = ORIGIN
+    for n in args.points:
+        rng = np.random.default_rng(args.seed)
+        # Country-sized spread with a dense cluster around the origin
+        lats = np.concatenate([rng.uniform(3.4, 14.9, n - n // 5), rng.normal(lat, 0.05, n // 5)])
+        lngs = np.concatenate([rng.uniform(33.0, 48.0, n - n // 5), rng.normal(lng, 0.05, n // 5)])
+        lat_list, lng_list = lats.tolist(), lngs.tolist()
+
+        scalar = np.array([haversine(lat, lng, a, b) for a, b in zip(lat_list, lng_list)])
+        if not np.allclose(scalar, geo.haversine_km(lat, lng, lats, lngs), rtol=1e-9, atol=1e-9):
+            raise SystemExit(f"vectorized distances disagree at {n} points")
+        mask, _ = geo.within_radius(lat, lng, lats, lngs, args.radius_km)
+        if not np.array_equal(mask, scalar <= args.radius_km):
+            raise SystemExit(f"radius mask disagrees at {n} points")
+        index = PointGridIndex()
+        for i, (a, b) in enumerate(zip(lat_list, lng_list)):
+            index.add(i, a, b)
+        if sorted(i for _, i in index.within(lat, lng, args.radius_km)) != np.flatnonzero(mask).tolist():
+            raise SystemExit(f"grid index radius query disagrees at {n} points")
+
+        loop = timed(lambda: [i for i, (a, b) in enumerate(zip(lat_list, lng_list)) if haversine(lat, lng, a, b) <= args.radius_km], 1)
+        kernel = timed(lambda: geo.within_radius(lat, lng, lats, lngs, args.radius_km))
+        nearest = timed(lambda: geo.nearest(lat, lng, lats, lngs, 10))
+        bearings = timed(lambda: geo.bearing_deg(lat, lng, lats, lngs))
+        grid = timed(lambda: index.within(lat, lng, args.radius_km))
+        print(
+            f"{n:>8} points, {int(mask.sum()):>6} within {args.radius_km:g} km: "
+            f"scalar loop {loop * 1e3:8.2f} ms, "
+            f"within_radius {kernel * 1e3:7.2f} ms, "
+            f"nearest(10) {nearest * 1e3:7.2f} ms, "
+            f"bearings {bearings * 1e3:7.2f} ms, "
+            f"grid index {grid * 1e3:6.2f} ms, "
+            f"speedup {loop / kernel:5.1f}x, results identical"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark: road-graph ETAs on a synthetic city grid (residential streets with
+a primary road every tenth line). Reports graph build time, cold single-unit
+(bidirectional) queries between random points, multi-unit queries over the
+nearest units of a fleet (as /routing/nearest_unit does, all candidates and
+top-1 only), and cached lookups, and checks both searches against a plain
+heap Dijkstra. Also times a batch dispatch plan (assign_batch) of N incidents x N
+units, and the coverage raster: a full build from the fleet and incremental
+updates as single units move.
+
+Run from the repo root:
+    python tests/bench_routing.py [--size 300] [--queries 50] [--fleet 300] [--batch 300]
+"""
+import argparse
+import heapq
+import random
+import sys
+import time
+from math import inf
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend import models  # noqa: E402
+from backend.assignment import plan_assignments  # noqa: E402
+from backend.coverage import CoverageIndex  # noqa: E402
+from backend.road_graph import RoadGraph, RoutingEngine, road_router  # noqa: E402
+from backend.routing import haversine  # noqa: E402
+
+ORIGIN = (8.90, 38.60)  # south-west corner, Addis Ababa
+SPACING_DEG = 0.001  # ~110 m blocks
+
+
+def grid_lines(size: int):
+    lat0, lng0 = ORIGIN
+    for i in range(size):
+        speed = 60.0 if i % 10 == 0 else 30.0
+        yield [[lng0 + j * SPACING_DEG, lat0 + i * SPACING_DEG] for j in range(size)], speed, 0
+        yield [[lng0 + i * SPACING_DEG, lat0 + j * SPACING_DEG] for j in range(size)], speed, 0
+
+
+def reference_minutes(graph: RoadGraph, source: int, target: int) -> float:
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        cost, node = heapq.heappop(heap)
+        if node == target:
+            return cost
+        if cost > dist[node]:
+            continue
+        for edge in range(graph.indptr[node], graph.indptr[node + 1]):
+            candidate = cost + graph.minutes[edge]
+            if candidate < dist.get(graph.indices[edge], inf):
+                dist[graph.indices[edge]] = candidate
+                heapq.heappush(heap, (candidate, graph.indices[edge]))
+    return inf
+
+
+def random_point(rng: random.Random, size: int):
+    extent = (size - 1) * SPACING_DEG
+    return ORIGIN[0] + rng.uniform(0, extent), ORIGIN[1] + rng.uniform(0, extent)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=300, help="grid lines per axis")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--units", type=int, default=10, help="candidate units per multi-unit query")
+    parser.add_argument("--fleet", type=int, default=300, help="idle units spread over the city")
+    parser.add_argument("--batch", type=int, default=300, help="incidents and units in the batch dispatch plan")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    graph = RoadGraph.from_lines(grid_lines(args.size))
+    print(f"graph: {graph.node_count} nodes, {graph.edge_count} edges, built in {time.perf_counter() - start:.2f}s")
+    engine = RoutingEngine(graph, cache_size=100000)
+
+    pairs = [(random_point(rng, args.size), random_point(rng, args.size)) for _ in range(args.queries)]
+    start = time.perf_counter()
+    single = [engine.eta(*a, *b)[0] for a, b in pairs]
+    print(f"single-unit (cold):         {(time.perf_counter() - start) / len(pairs) * 1000:8.2f} ms/query")
+
+    # Parity: bidirectional (one source) and reverse (two sources) searches against a heap Dijkstra
+    mismatches = 0
+    for a, b in pairs[:10]:
+        target, source = graph.snap(*b), graph.snap(*a)
+        other = graph.snap(*random_point(rng, args.size))
+        exact = reference_minutes(graph, source[0], target[0])
+        single = graph.minutes_to(target[0], [source[0]])[source[0]]
+        multi = graph.minutes_to(target[0], [source[0], other[0]])[source[0]]
+        if abs(single - exact) > 1e-9 or abs(multi - exact) > 1e-9:
+            mismatches += 1
+    print(f"search vs Dijkstra mismatches: {mismatches}")
+
+    engine.cache.clear()
+    # Like /routing/nearest_unit: the nearest units by straight-line distance from a fleet
+    fleet = [random_point(rng, args.size) for _ in range(args.fleet)]
+    queries = []
+    for _ in range(args.queries):
+        target = random_point(rng, args.size)
+        fleet.sort(key=lambda p: haversine(p[0], p[1], *target))
+        queries.append((target, fleet[:args.units]))
+    start = time.perf_counter()
+    for target, origins in queries:
+        engine.etas_to(*target, origins, limit=1)
+    print(f"{args.units}-unit top-1 (cold):      {(time.perf_counter() - start) / len(queries) * 1000:8.2f} ms/query")
+
+    engine.cache.clear()
+    start = time.perf_counter()
+    for target, origins in queries:
+        engine.etas_to(*target, origins)
+    print(f"{args.units}-unit all (cold):        {(time.perf_counter() - start) / len(queries) * 1000:8.2f} ms/query")
+
+    start = time.perf_counter()
+    for target, origins in queries:
+        engine.etas_to(*target, origins)
+    print(f"{args.units}-unit cached:            {(time.perf_counter() - start) / len(queries) * 1000:8.2f} ms/query")
+    print(f"cache: {engine.cache.stats()}")
+
+    # Batch dispatch plan (straight-line ETA matrix + Hungarian solve)
+    severities = list(models.IncidentSeverity)
+    incident_types = [models.IncidentType.FIRE, models.IncidentType.MEDICAL, models.IncidentType.CRIME]
+    unit_types = [models.UserRole.FIRE, models.UserRole.MEDICAL, models.UserRole.POLICE]
+    incidents = [
+        SimpleNamespace(id=n, latitude=lat, longitude=lng, severity=rng.choice(severities),
+                        incident_type=rng.choice(incident_types), spatial_risk_index=rng.random())
+        for n, (lat, lng) in enumerate(random_point(rng, args.size) for _ in range(args.batch))
+    ]
+    units = [
+        SimpleNamespace(id=n, callsign=f"U-{n}", latitude=lat, longitude=lng, unit_type=rng.choice(unit_types))
+        for n, (lat, lng) in enumerate(random_point(rng, args.size) for _ in range(args.batch))
+    ]
+    plan = plan_assignments(incidents, units)
+    print(f"assign_batch {args.batch}x{args.batch}:      {plan['solve_ms']:8.2f} ms ({len(plan['assignments'])} assigned)")
+
+    # Coverage raster: full multi-source build, then incremental single-unit moves
+    road_router.load(graph)
+    index = CoverageIndex(cell_size_deg=0.0025, max_minutes=30)
+    fleet_units = [
+        SimpleNamespace(id=n, unit_type=models.UserRole.FIRE, status=models.UnitStatus.IDLE, latitude=lat, longitude=lng)
+        for n, (lat, lng) in enumerate(fleet)
+    ]
+    start = time.perf_counter()
+    index.notify(fleet_units)
+    index.refresh()
+    grid, _, _ = index.raster(models.UserRole.FIRE)
+    print(f"coverage build ({len(grid)} cells): {(time.perf_counter() - start) * 1000:8.2f} ms")
+    moves = fleet_units[:args.queries]
+    start = time.perf_counter()
+    for unit in moves:
+        unit.latitude, unit.longitude = random_point(rng, args.size)
+        index.notify([unit])
+        index.refresh()
+    print(f"coverage unit move:           {(time.perf_counter() - start) / len(moves) * 1000:8.2f} ms/update")
+    start = time.perf_counter()
+    index.to_geojson(models.UserRole.FIRE, 10.0)
+    print(f"coverage GeoJSON:             {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: compiled keyword matcher vs. the original per-keyword substring scans
+in AIEngine.analyze, plus AIEngine.analyze_batch and the memoized analyze()
+on a warm cache. Also checks that the matcher paths produce identical results.
+
+Run from the repo root:
+    python tests/bench_triage.py [--reports 5000] [--extra-keywords 0 200]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.ai_engine import AIEngine  # noqa: E402
+from backend.lru import LRUCache  # noqa: E402
+from backend.models import IncidentSeverity, IncidentType  # noqa: E402
+
+FILLER = [
+    "near", "the", "market", "road", "people", "outside", "reported", "by", "resident", "two", "kilometres",
+    "from", "bole", "school", "morning", "ብዙ", "ሰዎች", "አካባቢ", "ዛሬ", "ጠዋት", "please", "send", "help",
+]
+
+
+def legacy_analyze(engine: AIEngine, text: str) -> dict:
+    """
+    The pre-matcher implementation of AIEngine.analyze, kept for comparison.
+    """
+    text = text.lower()
+
+    result = {
+        "severity": IncidentSeverity.LOW,
+        "incident_type": IncidentType.OTHER,
+        "confidence": 0.3,
+        "escalation_probability": 0.1,
+        "spread_risk": 0.1,
+        "casualty_likelihood": 0.1,
+        "crowd_size_estimate": 0
+    }
+
+    if any(k in text for k in engine.critical_keywords):
+        result["severity"] = IncidentSeverity.CRITICAL
+        result["confidence"] = 0.85
+    elif any(k in text for k in engine.high_keywords):
+        result["severity"] = IncidentSeverity.HIGH
+        result["confidence"] = 0.7
+    elif any(k in text for k in engine.medium_keywords):
+        result["severity"] = IncidentSeverity.MEDIUM
+        result["confidence"] = 0.5
+
+    for type_, keywords in engine.type_map.items():
+        if any(k in text for k in keywords):
+            result["incident_type"] = type_
+            result["confidence"] = max(result["confidence"], 0.6)
+            break
+
+    if result["incident_type"] in [IncidentType.FIRE, IncidentType.FLOOD, IncidentType.UNREST]:
+        result["escalation_probability"] = 0.6 if result["severity"] in [IncidentSeverity.MEDIUM, IncidentSeverity.HIGH] else 0.8
+        result["spread_risk"] = 0.7 if result["severity"] in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 0.4
+    if result["incident_type"] in [IncidentType.MEDICAL, IncidentType.CRIME, IncidentType.ACCIDENT]:
+        result["casualty_likelihood"] = 0.6 if result["severity"] in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 0.3
+    if result["incident_type"] in [IncidentType.CROWD, IncidentType.UNREST]:
+        result["crowd_size_estimate"] = 50 if result["severity"] in [IncidentSeverity.HIGH, IncidentSeverity.CRITICAL] else 20
+    if result["severity"] == IncidentSeverity.CRITICAL:
+        result["escalation_probability"] = max(result["escalation_probability"], 0.85)
+        result["spread_risk"] = max(result["spread_risk"], 0.8)
+        result["casualty_likelihood"] = max(result["casualty_likelihood"], 0.7)
+
+    return result
+
+
+def all_keywords(engine: AIEngine) -> list:
+    keywords = engine.critical_keywords + engine.high_keywords + engine.medium_keywords
+    for words in engine.type_map.values():
+        keywords += words
+    return keywords
+
+
+def make_reports(engine: AIEngine, count: int, rng: random.Random) -> list:
+    keywords = all_keywords(engine)
+    reports = []
+    for _ in range(count):
+        words = rng.choices(FILLER, k=rng.randint(4, 40))
+        for _ in range(rng.randint(0, 3)):
+            word = rng.choice(keywords)
+            # Embed some keywords inside other words and vary the case
+            if rng.random() < 0.2:
+                word = rng.choice(FILLER) + word
+            words.insert(rng.randrange(len(words) + 1), word.upper() if rng.random() < 0.2 else word)
+        reports.append(" ".join(words))
+    return reports
+
+
+def extend_lexicon(engine: AIEngine, extra: int, rng: random.Random) -> None:
+    """
+    Pad every keyword list with synthetic Ethiopic terms to model lexicon growth.
+    """
+    def term():
+        return "".join(chr(rng.randint(0x1200, 0x135A)) for _ in range(rng.randint(2, 5)))
+
+    for words in [engine.critical_keywords, engine.high_keywords, engine.medium_keywords, *engine.type_map.values()]:
+        words.extend(term() for _ in range(extra))
+    engine.compile()
+
+
+def timed(fn, reports: list) -> float:
+    start = time.perf_counter()
+    for text in reports:
+        fn(text)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--extra-keywords", type=int, nargs="*", default=[0, 50, 200])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for extra in args.extra_keywords:
+        rng = random.Random(args.seed)
+        # Uncached, so every call pays for matching
+        engine = AIEngine(cache_size=0)
+        extend_lexicon(engine, extra, rng)
+        reports = make_reports(engine, args.reports, rng)
+
+        mismatches = sum(
+            1 for text in reports
+            if {k: v for k, v in engine.analyze(text).items() if k != "lexicon_version"} != legacy_analyze(engine, text)
+        )
+        if mismatches:
+            raise SystemExit(f"{mismatches} reports classified differently with +{extra} keywords/list")
+
+        if engine.analyze_batch(reports).rows() != [engine.analyze(text) for text in reports]:
+            raise SystemExit(f"analyze_batch disagrees with analyze with +{extra} keywords/list")
+
+        legacy = timed(lambda t: legacy_analyze(engine, t), reports)
+        compiled = timed(engine.analyze, reports)
+        start = time.perf_counter()
+        engine.analyze_batch(reports)
+        batched = time.perf_counter() - start
+        engine.cache = LRUCache(len(reports))
+        timed(engine.analyze, reports)
+        cached = timed(engine.analyze, reports)
+        print(
+            f"+{extra:>4} keywords/list ({len(all_keywords(engine))} total): "
+            f"legacy {legacy / len(reports) * 1e6:7.1f} us/report, "
+            f"matcher {compiled / len(reports) * 1e6:7.1f} us/report, "
+            f"batch {batched / len(reports) * 1e6:7.1f} us/report, "
+            f"cache hit {cached / len(reports) * 1e6:5.1f} us/report, "
+            f"speedup {legacy / compiled:4.1f}x, results identical"
+        )
+
+
+if __name__ == "__main__":
+    main()